@@ -21,6 +21,15 @@ pluginManager = PluginManager()
 menuItems = []
 currentTraceBack = None
 
+# copy-on-write snapshots of WORKINGMATRIX, see 
+# libHercMatrix.hercMatrix.snapshot(). A snapshot is pushed onto undoStack 
+# before each command which changes WORKINGMATRIX, at most undoLimit are kept
+undoStack = []
+redoStack = []
+undoLimit = 32
+# snapshots saved by name with the snapshot command
+namedSnapshots = {}
+
 
 def loadPlugins():
     global pluginManager
@@ -41,6 +50,9 @@ def main(override=None):
     global menuItems
     global pluginManager
     global currentTraceBack
+    global undoStack
+    global redoStack
+    global namedSnapshots
 
     if override is None:
         usrIn = input("> ")
@@ -83,6 +95,14 @@ def main(override=None):
         print("-" * 20)
         print("traceback - print the traceback for the most recent failed ")
         print("command")
+        print("-" * 20)
+        print("undo (name) - revert the most recent change to the working ")
+        print("matrix, or revert to the snapshot saved as name")
+        print("-" * 20)
+        print("redo - reapply the most recently undone change")
+        print("-" * 20)
+        print("snapshot (name) - save the working matrix as name, or list ")
+        print("saved snapshots")
 
         return
 
@@ -105,6 +125,40 @@ def main(override=None):
             print(currentTraceBack)
         return
 
+    elif command == 'undo':
+        if len(arguments) == 1:
+            if arguments[0] not in namedSnapshots:
+                print("ERROR: no snapshot named {0}".format(arguments[0]))
+                return
+            pushUndo(WORKINGMATRIX.snapshot())
+            redoStack = []
+            # restore a snapshot of the snapshot, so it can be restored again
+            WORKINGMATRIX = namedSnapshots[arguments[0]].snapshot()
+        elif len(undoStack) == 0:
+            print("Nothing to undo")
+        else:
+            redoStack.append(WORKINGMATRIX)
+            WORKINGMATRIX = undoStack.pop()
+        return
+
+    elif command == 'redo':
+        if len(redoStack) == 0:
+            print("Nothing to redo")
+        else:
+            pushUndo(WORKINGMATRIX)
+            WORKINGMATRIX = redoStack.pop()
+        return
+
+    elif command == 'snapshot':
+        if len(arguments) == 1:
+            namedSnapshots[arguments[0]] = WORKINGMATRIX.snapshot()
+        elif len(namedSnapshots) == 0:
+            print("No snapshots have been saved")
+        else:
+            for name in sorted(namedSnapshots):
+                print(name)
+        return
+
     # resolve alises
     for item in menuItems:
         if item.aliases is not None:
@@ -119,6 +173,10 @@ def main(override=None):
                 print("ERROR: one or more missing or incorrect arguments")
                 return
             if item.validate(arguments, WORKINGMATRIX):
+                # taking a snapshot does not copy the matrix, so this is 
+                # cheap even if the command turns out not to change anything
+                SNAPSHOT = WORKINGMATRIX.snapshot()
+                previousState = matrixState(WORKINGMATRIX)
                 try:
                     NEWWM = item.execute(arguments, WORKINGMATRIX)
                 except KeyboardInterrupt:
@@ -131,6 +189,13 @@ def main(override=None):
                 if NEWWM is not None:  # ugly workaround because python refuses
                                       # to pass WORKINGMATRIX by reference
                     WORKINGMATRIX = NEWWM
+                if matrixState(WORKINGMATRIX) != previousState:
+                    pushUndo(SNAPSHOT)
+                    redoStack = []
+                else:
+                    # nothing changed, so WORKINGMATRIX need not keep saving
+                    # what it overwrites for the snapshot
+                    SNAPSHOT.release()
             else:
                 print("ERROR: command validation failed")
             return
@@ -139,6 +204,26 @@ def main(override=None):
         print("ERROR: command '{0}' not found!".format(command))
 
 
+## push a snapshot onto the undo stack
+# discards the oldest snapshot once there are more than undoLimit 
+
+def pushUndo(SNAPSHOT):
+    global undoStack
+
+    undoStack.append(SNAPSHOT)
+    if len(undoStack) > undoLimit:
+        undoStack.pop(0).release()
+
+
+## summarize a matrix so changes to it can be detected
+# returns a tuple which changes whenever the matrix is replaced or modified
+
+def matrixState(MATRIX):
+    return (id(MATRIX), MATRIX.version, MATRIX.height, MATRIX.width,
+            MATRIX.symmetry, MATRIX.nzentries, MATRIX.verification,
+            tuple(MATRIX.remarks))
+
+
 def runMain():
     while True:
         main()
@@ -8,6 +8,7 @@ import os
 import textwrap
 import pprint
 import libBXF
+import numpy
 
 ## @package MatrixUtils provides matrix utilities
 #
@@ -63,24 +64,31 @@ def displayMatrix(HERCMATRIX, maxHeight=10, maxWidth=10):
         raise ValueError("maxWidth must be an even number")
 
 
-    row = 0
-    while row < HERCMATRIX.height:
-        if (row == (maxHeight / 2)) and (HERCMATRIX.height > maxHeight):
-            row = HERCMATRIX.height - (maxHeight / 2)
+    # work out which rows and columns will actually be shown, so their values
+    # can be fetched in one batch per row
+    rows = list(range(0, HERCMATRIX.height))
+    if HERCMATRIX.height > maxHeight:
+        rows = rows[:maxHeight // 2] + rows[-(maxHeight // 2):]
+    cols = list(range(0, HERCMATRIX.width))
+    if HERCMATRIX.width > maxWidth:
+        cols = cols[:maxWidth // 2] + cols[-(maxWidth // 2):]
+
+    for rowNumber, row in enumerate(rows):
+        if (rowNumber == (maxHeight // 2)) and (HERCMATRIX.height > maxHeight):
             print("\n", end="")
-        col = 0
-        while col < HERCMATRIX.width:
-            if (col == (maxWidth / 2)) and (HERCMATRIX.width > maxWidth):
-                col = HERCMATRIX.width - (maxWidth / 2)
+        try:
+            values = HERCMATRIX.getValues([row] * len(cols), cols)
+        except IndexError:
+            values = [None] * len(cols)
+        for colNumber, value in enumerate(values):
+            if (colNumber == (maxWidth // 2)) and \
+                    (HERCMATRIX.width > maxWidth):
                 print(" ... ", end="")
-            try:
-                print('{:9.3g} '
-                      .format(round(HERCMATRIX.getValue(row, col), 3)), end="")
-            except IndexError:
+            if value is None:
                 print('   EE   ', end="")
-            col += 1
+            else:
+                print('{:9.3g} '.format(round(value, 3)), end="")
         print("")
-        row += 1
 
 
 ## Print the matrix converted to CSR format
@@ -251,19 +259,19 @@ def printRange(row1, row2, col1, col2, HERCMATRIX):
 
     if row1 < 0:
         raise IndexError("row1 may not be less than zero")
-    if row1 > HERCMATRIX.height:
+    if row1 >= HERCMATRIX.height:
         raise IndexError("row1 is out of bounds")
     if row2 < 0:
         raise IndexError("row2 may not be less than zero")
-    if row2 > HERCMATRIX.height:
+    if row2 >= HERCMATRIX.height:
         raise IndexError("row2 is out of bounds")
     if col1 < 0:
         raise IndexError("col1 may not be less than zero")
-    if col1 > HERCMATRIX.width:
+    if col1 >= HERCMATRIX.width:
         raise IndexError("col1 is out of bounds")
     if col2 < 0:
         raise IndexError("col2 may not be less than zero")
-    if col2 > HERCMATRIX.width:
+    if col2 >= HERCMATRIX.width:
         raise IndexError("col2 is out of bounds")
 
     if row1 > row2:
@@ -271,33 +279,7 @@ def printRange(row1, row2, col1, col2, HERCMATRIX):
     if col1 > col2:
         raise ValueError("col1 larger than col2")
 
-    TMPMATRIX = libHercMatrix.hercMatrix()
-    TMPMATRIX.height = abs(row2 - row1 + 1)
-    TMPMATRIX.width = abs(col2 - col1 + 1)
-
-    width = HERCMATRIX.width
-    height = HERCMATRIX.height
-
-    for element in HERCMATRIX.elements:
-        row = element[0]
-        col = element[1]
-        val = element[2]
-
-        if (row >= row1) and (row <= row2):
-            if (col >= col1) and (col <= col2):
-                try:
-                    TMPMATRIX.setValue(row - row1,
-                                       col - col1,
-                                       val)
-                except IndexError as e:
-                    logging.warning("encountered error {0}".format(e))
-                    logging.warning("writing to row {0} col {1} of "
-                                    .format(row - row1, col - col1))
-                    logging.warning("row {0} col {1}"
-                                    .format(TMPMATRIX.height, TMPMATRIX.width))
-
-    TMPMATRIX.makeRowMajor()
-    displayMatrix(TMPMATRIX)
+    displayMatrix(HERCMATRIX.getBlock(row1, row2, col1, col2))
 
 ## Paint a value over all elements in a rectangular range of elements
 #
@@ -318,13 +300,11 @@ def printRange(row1, row2, col1, col2, HERCMATRIX):
 
 
 def paint(row1, row2, col1, col2, val, HERCMATRIX):
-    width = HERCMATRIX.width
-    height = HERCMATRIX.height
-    for row in range(0, height):
-        for col in range(0, width):
-            if col >= col1 and col <= col2:
-                if row >= row1 and row <= row2:
-                    HERCMATRIX.setValue(row, col, val)
+    # parts of the box which fall outside of the matrix are ignored
+    rows = numpy.arange(max(row1, 0), min(row2, HERCMATRIX.height - 1) + 1)
+    cols = numpy.arange(max(col1, 0), min(col2, HERCMATRIX.width - 1) + 1)
+    rows, cols = numpy.meshgrid(rows, cols, indexing='ij')
+    HERCMATRIX.setValues(rows, cols, val)
 
 ## Paints values along a diagonal
 #
@@ -345,15 +325,16 @@ def paint(row1, row2, col1, col2, val, HERCMATRIX):
 
 def paintDiagonal(begin, end, spread, val, HERCMATRIX, offset=0):
 
-    for i in range(begin, end+1):
-        for j in range(0, spread):
-            try:
-                col = offset + i + j  # right side
-                HERCMATRIX.setValue(i, col, val)
-                col = offset + i - j  # left side
-                HERCMATRIX.setValue(i, col, val)
-            except IndexError:
-                pass  # out of bounds
+    rows = numpy.repeat(numpy.arange(begin, end + 1), spread)
+    distance = numpy.tile(numpy.arange(0, spread), end + 1 - begin)
+    rows = numpy.concatenate((rows, rows))
+    cols = numpy.concatenate((offset + rows[:len(distance)] + distance,
+                              offset + rows[:len(distance)] - distance))
+
+    # values which fall outside of the matrix are skipped
+    inBounds = (rows >= 0) & (rows < HERCMATRIX.height) & \
+        (cols >= 0) & (cols < HERCMATRIX.width)
+    HERCMATRIX.setValues(rows[inBounds], cols[inBounds], val)
 
 ## Alters the dimensions of the matrix
 # Sets the dimensions of the matrix to `width` columns and `height` rows.
@@ -368,13 +349,12 @@ def paintDiagonal(begin, end, spread, val, HERCMATRIX, offset=0):
 def setDims(height, width, HERCMATRIX):
 
     # remove elements which are out of bounds
-    for i in reversed(range(0, HERCMATRIX.nzentries)):
-        if HERCMATRIX.elements['row'][i] >= height:
-            HERCMATRIX.setValue(HERCMATRIX.elements['row'][i],
-                                HERCMATRIX.elements['col'][i], 0)
-        elif HERCMATRIX.elements['col'][i] >= width:
-            HERCMATRIX.setValue(HERCMATRIX.elements['row'][i],
-                                HERCMATRIX.elements['col'][i], 0)
+    if HERCMATRIX.elements is not None:
+        rows = HERCMATRIX.elements['row']
+        cols = HERCMATRIX.elements['col']
+        outOfBounds = (rows >= height) | (cols >= width)
+        HERCMATRIX.setValues(rows[outOfBounds], cols[outOfBounds], 0,
+                             extrapolate=False)
 
     HERCMATRIX.height = height
     HERCMATRIX.width = width
@@ -404,9 +384,10 @@ def initialize(height, width, HERCMATRIX, val=0):
     HERCMATRIX.width = width 
     HERCMATRIX.symmetry = "ASYM"
 
-    for i in range(0, height):  # this is faster than using paint
-        for j in range(0, width):
-            HERCMATRIX.setValue(i, j, val)
+    # painting zeros over a matrix with no elements changes nothing, and would
+    # build height x width coordinate arrays
+    if val != 0:
+        paint(0, height - 1, 0, width - 1, val, HERCMATRIX)
     if HERCMATRIX.elements is None:
         HERCMATRIX.nzentries = 0
     else:
@@ -495,8 +476,13 @@ def changeDirectory(newDir):
 # @param destination absolute or relative path to destination file
 # @param sourceFormat string indicating the format of the source file
 # @param destinationFormat string indicating the format of the destination file
+# @param compressionLevel compression level of the destination, if it is 
+# compressed, see libHercmIO.writeMatrix()
+# @param workers number of worker processes to write the destination with, 
+# see libHercmIO.writeMatrix()
 
-def convert(source, destination, sourceFormat, destinationFormat):
+def convert(source, destination, sourceFormat, destinationFormat,
+            compressionLevel=None, workers=None):
     # converts the matrix at source in sourceFormat to destinationFormat
     # then writes out at destination
 
@@ -509,4 +495,5 @@ def convert(source, destination, sourceFormat, destinationFormat):
     HERCMATRIX = libHercmIO.readMatrix(source, sourceFormat)
 
     HERCMATRIX.verification = libBXF.generateVerificationSum(HERCMATRIX)
-    libHercmIO.writeMatrix(destination, destinationFormat, HERCMATRIX)
+    libHercmIO.writeMatrix(destination, destinationFormat, HERCMATRIX,
+                           compressionLevel, workers)
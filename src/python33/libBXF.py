@@ -1,4 +1,5 @@
 import libHercMatrix
+import libCompressedIO
 import scipy
 import numpy
 import scipy.io
@@ -7,6 +8,8 @@ import traceback
 import pprint
 import os
 import logging
+import struct
+import sys
 
 ## @package libBXF
 #
@@ -17,160 +20,136 @@ import logging
 #
 # Supports all versions of the BXF file format, including HERCM, BXF, and BXF21
 #
+# The file may be compressed, see libCompressedIO. It is streamed (and 
+# decompressed) in large chunks, and the contents of each field are
+# parsed by numpy straight into typed arrays, see _readFields(). The elements
+# are then added to the matrix in one operation, and are row major, with no
+# zeros. 
+#
+# If the file ends with an INDEX field, see _readIndex(), the reader seeks
+# straight to each field it needs rather than reading past the others. 
+#
 # @param filename absolute or relative path to the file to read
+# @param backend storage backend for the returned matrix, `coo` (default) or
+# `csr`, see libHercMatrix.hercMatrix
+# @param duplicates how to merge elements which share coordinates, see 
+# libHercMatrix.hercMatrix.coalesce(). Default is `sum`. If `None`, 
+# duplicates are kept, and the elements are only sorted row major. 
+# @param indexType passed through to libHercMatrix.hercMatrix, `None` 
+# (default) chooses from the dimensions of the matrix
+# @param valueType passed through to libHercMatrix.hercMatrix, default is
+# float64
+# @param structureOnly if `True`, the VAL field is not parsed, and every 
+# element has the value 1 (before duplicates are merged). This is much faster
+# for uses which only need the positions of the elements, such as plotting. 
 #
 # @exception OSError file does not exist, permission error, or other IO error
 # @exception ValueError file header is mangled, or one or more COO vectors
-# is a different length than the others
-# @exception TypeError one or more fields could not be typecast to required
-# types
+# is a different length than the others, or one or more fields could not be
+# typecast to required types, or duplicates is `error` and the file contains
+# duplicate elements
 #
 # @return libHercMatrix.hercMatricx instance containing the matrix read from the
 # file
 
-def read(filename):
-    # reads in the HeRCM file specified by filename
-    # returns it as an instance of libhsm.hsm
+def read(filename, backend='coo', duplicates='sum', indexType=None,
+         valueType=numpy.float64, structureOnly=False):
 
     # matrix object we will return later
-    HERCMATRIX = libHercMatrix.hercMatrix()
-
-    # row, col, and val lists we will read the matrix data into later
-    row = []
-    col = []
-    val = []
+    HERCMATRIX = libHercMatrix.hercMatrix(backend, indexType, valueType)
 
     logging.info("Reading BXF file {0}".format(filename))
 
-    fileObject = open(filename, 'r')
+    fileObject = libCompressedIO.openFile(filename, 'r')
     # this may raise OSError, which the caller should catch
 
-    # Get a list of lines from the file. Might be a good point for future
-    # optimization - lines could be processed one at a time
-    lines = fileObject.readlines()
-    fileObject.close()
-
-    # read in the header
-    header = lines[0]
-    lines.pop(0)
-    splitHeader = header.split()
-
-    logging.info("read BXF header: " + header)
-
-    # stuff we are going to read in from the header
-    version = splitHeader[0]
-    width = None
-    height = None
-    nzentries = None
-    symmetry = None
-
-    # version specific header parsing logic
-
-    # deprecated HERCM (BXF 1.0) and BXF 2.0
-    if version == "HERCM" or version == "BXF":
-        if len(splitHeader) > 6:
-            logging.warning("possibly mangled header - too many " +
-                "fields for BXF 1.0 header. Attempting to read anyway...")
-        elif len(splitHeader) < 6:
-            logging.warning("possibly mangled header - too few fields for " +
-                "BXF 1.0 header. Attempting to read anyway...")
-        elif len(splitHeader) < 5:
-            raise ValueError("Header has too few fields for any known BXF " +
-                "version - unable to read header")
-
-        # read fields from the header, see doc-extra/bxf-spec.md for more
-        # details
-        width = int(splitHeader[1])
-        height = int(splitHeader[2])
-        nzentries = int(splitHeader[3])
-        symmetry = splitHeader[4].upper()
-
-    elif (version == "BXF21") or (version == "BXF22"): # bxf 2.1 and 2.2 use 
-                                                       # the same header format
-        if len(splitHeader) != 5:
-            raise ValueError("Header has incorrect number of fields for BXF " +
-                " 2.1")
-
-        width = int(splitHeader[1])
-        height = int(splitHeader[2])
-        nzentries = int(splitHeader[3])
-        symmetry = splitHeader[4].upper()
+    fieldNames = ['row', 'col'] if structureOnly else ['row', 'col', 'val']
 
-    else:
-        raise ValueError("Header did not contain  valid BXF version " +
-            "identifier")
+    # compressed files can not seek efficiently, so are always read through
+    index = None
+    if libCompressedIO.compression(filename) is None:
+        index = _readIndex(filename)
 
-    # verify symmetry
-    if symmetry not in ["SYM", "ASYM"]:
-        logging.warning("Symmetry {0} is not valid, assuming asymmetric"
-            .format(symmetry))
-        symmetry = "ASYM"
-
-    logging.info("finished reading header")
-
-    HERCMATRIX.width = width
-    HERCMATRIX.height = height
-    HERCMATRIX.nzentries = nzentries
-    HERCMATRIX.symmetry = symmetry
-
-    inField = False
-    currentHeader = ''
-    fieldname = ''
-    vtype = ''
-    currentContents = []
-    for line in lines:
-        # we are starting a new field
-        if not inField:
-            currentHeader = line.rstrip()
-            splitHeader = currentHeader.split()
-
-            if (version == "BXF21") or (version == "BXF22"):
-                fieldname = splitHeader[0]
-                vtype = splitHeader[1]
-            else:
-                # if you review previous BXF specifications, field headers
-                # had three fields, the middle of which was either `LIST` or
-                # `SINGLE`. These can both be safely treated as lists, as BXF2.1
-                # does
-                #
-                fieldname = splitHeader[0]
-                vtype = splitHeader[2]
-
-            inField = True
-
-        # this is the end of a field
-        elif 'ENDFIELD' in line:
-
-            # save the values we read from this field to lists for later use
-            if fieldname.lower() == "val":
-                val = currentContents
-            elif fieldname.lower() == "row":
-                row = currentContents
-            elif fieldname.lower() == "col":
-                col = currentContents
-            elif fieldname.lower() == "remarks":
-                pass
-            else:
-                logging.warning("Ignoring field with unrecognized name: "
-                    + fieldname)
-
-            # discard the contents of this field
-            currentContents = []
-            inField = False
+    try:
+        # read in the header
+        header = fileObject.readline()
+        splitHeader = header.split()
+        if len(splitHeader) == 0:
+            raise ValueError("Header did not contain  valid BXF version " +
+                "identifier")
+
+        logging.info("read BXF header: " + header)
+
+        # stuff we are going to read in from the header
+        version = splitHeader[0]
+        width = None
+        height = None
+        nzentries = None
+        symmetry = None
+
+        # version specific header parsing logic
+
+        # deprecated HERCM (BXF 1.0) and BXF 2.0
+        if version == "HERCM" or version == "BXF":
+            if len(splitHeader) > 6:
+                logging.warning("possibly mangled header - too many " +
+                    "fields for BXF 1.0 header. Attempting to read anyway...")
+            elif len(splitHeader) < 6:
+                logging.warning("possibly mangled header - too few fields " +
+                    "for BXF 1.0 header. Attempting to read anyway...")
+            elif len(splitHeader) < 5:
+                raise ValueError("Header has too few fields for any known " +
+                    "BXF version - unable to read header")
+
+            # read fields from the header, see doc-extra/bxf-spec.md for more
+            # details
+            width = int(splitHeader[1])
+            height = int(splitHeader[2])
+            nzentries = int(splitHeader[3])
+            symmetry = splitHeader[4].upper()
+
+        elif (version == "BXF21") or (version == "BXF22"): # bxf 2.1 and 2.2 
+                                                 # use the same header format
+            if len(splitHeader) != 5:
+                raise ValueError("Header has incorrect number of fields for " +
+                    "BXF 2.1")
+
+            width = int(splitHeader[1])
+            height = int(splitHeader[2])
+            nzentries = int(splitHeader[3])
+            symmetry = splitHeader[4].upper()
 
-        # we are currently reading data from a field
         else:
-            for value in line.split():
-                # typecast this element according to the vtype
-                # these may throw TypeError , which the caller should handle
-                if vtype == 'INT':
-                    currentContents.append(int(value))
-
-                elif vtype == 'FLOAT':
-                    currentContents.append(float(value))
+            raise ValueError("Header did not contain  valid BXF version " +
+                "identifier")
+
+        # verify symmetry
+        if symmetry not in ["SYM", "ASYM"]:
+            logging.warning("Symmetry {0} is not valid, assuming asymmetric"
+                .format(symmetry))
+            symmetry = "ASYM"
+
+        logging.info("finished reading header")
+
+        if (index is not None) and all(name in index for name in fieldNames):
+            logging.info("found index, reading fields directly")
+            fields = {}
+            for name in fieldNames:
+                offset, count = index[name]
+                fileObject.seek(offset)
+                fields.update(_readFields(fileObject, version, count, [name],
+                                          True))
+        else:
+            fields = _readFields(fileObject, version, nzentries, fieldNames)
+    finally:
+        fileObject.close()
 
-                else:
-                    currentContents.append(value)
+    empty = numpy.zeros(0)
+    row = fields.get('row', empty)
+    col = fields.get('col', empty)
+    val = fields.get('val', empty)
+    if structureOnly:
+        val = numpy.ones(len(row))
 
     # do some basic validation
     if (len(row) != len(col)) or \
@@ -187,24 +166,205 @@ def read(filename):
     else:
         logging.info("matrix seems sane, it is probably not corrupt")
 
-    # copy matrix data into the matrix object
-    for i in range(0, HERCMATRIX.nzentries):
-        # this could probably be optimized by generating a scipy.sparse
-        # matrix then using hercMatrix.replaceContents()
-        if (version == "HERCM") or (version == "BXF") or (version == "BXF21"):
-            if HERCMATRIX.symmetry == "SYM":
-                # perform an inline transpose 
-                HERCMATRIX.addElement([col[i], row[i], val[i]]) 
-            else:
-                HERCMATRIX.addElement([row[i], col[i], val[i]])
-        else:
-            HERCMATRIX.addElement([row[i], col[i], val[i]])
+    if (version != "BXF22") and (symmetry == "SYM"):
+        # perform an inline transpose 
+        row, col = col, row
 
-    HERCMATRIX.removeZeros()
-    HERCMATRIX.makeRowMajor()
+    HERCMATRIX.width = width
+    HERCMATRIX.height = height
+    HERCMATRIX.symmetry = symmetry
+
+    # add the elements in one operation, merging duplicates also sorts them 
+    # row major
+    HERCMATRIX.addElements(row, col, val, duplicates=duplicates)
+    if duplicates is None:
+        HERCMATRIX.makeRowMajor()
+
+    if numpy.any(HERCMATRIX.elements['val'] == 0):
+        HERCMATRIX.removeZeros()
 
     return HERCMATRIX
 
+## Read the fields of a BXF file
+# 
+# Reads the file _CHUNK_SIZE characters at a time, so that the file is never
+# held in memory as a whole. The contents of the fields named in fieldNames
+# are parsed with numpy straight into arrays allocated for nzentries 
+# elements, which grow if the file holds more. Any other field is skipped. 
+# 
+# @param fileObject file opened for reading text, positioned after the 
+# header, or at the start of a field if single is `True`
+# @param version version identifier from the header of the file
+# @param nzentries number of elements given by the header of the file, or by
+# the index for the field to read if single is `True`
+# @param fieldNames lower case names of the fields to parse, some of `row`,
+# `col`, and `val`
+# @param single if `True`, stop after the first field
+# 
+# @returns dict mapping the lower case names of the fields in fieldNames 
+# which were found to a numpy.ndarray of their contents
+# 
+# @exception ValueError a field could not be parsed
+
+def _readFields(fileObject, version, nzentries, 
+                fieldNames=('row', 'col', 'val'), single=False):
+    fields = {}
+    counts = {}
+
+    # name and numpy type of the field being read, None between fields
+    fieldname = None
+    fieldType = None
+
+    # True once single is set and the first field has been read
+    finished = False
+
+    remainder = ''
+    while not finished:
+        chunk = fileObject.read(_CHUNK_SIZE)
+        if chunk:
+            # only parse whole lines, so that no value is split
+            text = remainder + chunk
+            end = text.rfind('\n') + 1
+            text, remainder = text[:end], text[end:]
+        else:
+            text, remainder = remainder, ''
+            if not text:
+                break
+
+        position = 0
+        while (position < len(text)) and not finished:
+            if fieldname is None:
+                # we are starting a new field
+                end = text.find('\n', position)
+                if end == -1:
+                    end = len(text)
+                splitHeader = text[position:end].split()
+                position = end + 1
+                if len(splitHeader) == 0:
+                    continue
+
+                if (version == "BXF21") or (version == "BXF22"):
+                    fieldname = splitHeader[0].lower()
+                    vtype = splitHeader[1]
+                else:
+                    # if you review previous BXF specifications, field 
+                    # headers had three fields, the middle of which was either
+                    # `LIST` or `SINGLE`. These can both be safely treated as
+                    # lists, as BXF2.1 does
+                    fieldname = splitHeader[0].lower()
+                    vtype = splitHeader[2]
+
+                if fieldname in fieldNames:
+                    if vtype == 'INT':
+                        fieldType = numpy.int64
+                    else:
+                        fieldType = numpy.float64
+                    fields[fieldname] = numpy.empty(nzentries, 
+                                                    dtype=fieldType)
+                    counts[fieldname] = 0
+                elif fieldname not in ['remarks', 'row', 'col', 'val', 
+                                       'index']:
+                    logging.warning("Ignoring field with unrecognized name: "
+                        + fieldname)
+                continue
+
+            # we are reading data from a field, up to the line containing 
+            # ENDFIELD
+            marker = text.find('ENDFIELD', position)
+            if marker == -1:
+                body = text[position:]
+                position = len(text)
+            else:
+                body = text[position:max(text.rfind('\n', position, marker) 
+                                         + 1, position)]
+                end = text.find('\n', marker)
+                position = len(text) if end == -1 else end + 1
+
+            if (fieldname in counts) and body and not body.isspace():
+                try:
+                    values = numpy.fromstring(body, dtype=fieldType, sep=' ')
+                except ValueError:
+                    raise ValueError("Could not parse contents of field " +
+                        "{0} as {1}".format(fieldname.upper(), 
+                                            numpy.dtype(fieldType).name))
+
+                contents = fields[fieldname]
+                count = counts[fieldname]
+                if count + len(values) > len(contents):
+                    grown = numpy.empty(max(2 * len(contents), 
+                                            count + len(values)),
+                                        dtype=fieldType)
+                    grown[:count] = contents[:count]
+                    fields[fieldname] = contents = grown
+                contents[count:count + len(values)] = values
+                counts[fieldname] = count + len(values)
+
+            if marker != -1:
+                # this is the end of the field
+                fieldname = None
+                finished = single
+
+    if fieldname is not None:
+        logging.warning("Field {0} has no ENDFIELD, ignoring it"
+                        .format(fieldname.upper()))
+        fields.pop(fieldname, None)
+
+    return {name: fields[name][:count] for name, count in counts.items() 
+            if name in fields}
+
+## Read the INDEX field at the end of a BXF file
+# 
+# The INDEX field is optional, and gives the offset in bytes from the start 
+# of the file of the header of each other field, and the number of entries 
+# in it, as the entries `NAME OFFSET COUNT` on one line per field, see 
+# doc-extra/bxf-spec.md. It must be the last field in the file, so only the
+# end of the file is read to find it. Each offset is checked against the 
+# header of its field, so a file which was modified after it was written 
+# is read through as usual. 
+# 
+# @param filename path to an uncompressed BXF file
+# 
+# @returns dict mapping the lower case name of each field to a tuple of its 
+# offset and the number of entries in it, or `None` if the file has no 
+# valid INDEX field
+
+def _readIndex(filename):
+    with open(filename, 'rb') as fileObject:
+        fileObject.seek(0, os.SEEK_END)
+        size = fileObject.tell()
+        fileObject.seek(max(0, size - _INDEX_TAIL_SIZE))
+        tail = fileObject.read()
+
+        start = tail.rfind(b'\n' + _INDEX_HEADER.encode('ascii'))
+        if (start == -1) or not tail.endswith(b'\nENDFIELD\n'):
+            return None
+        entries = tail[start + 1 + len(_INDEX_HEADER):
+                       -len(b'ENDFIELD\n')].split()
+        if len(entries) % 3 != 0:
+            return None
+
+        index = {}
+        for i in range(0, len(entries), 3):
+            name = entries[i]
+            try:
+                offset = int(entries[i + 1])
+                count = int(entries[i + 2])
+            except ValueError:
+                return None
+            if (offset < 0) or (count < 0):
+                return None
+
+            fileObject.seek(offset)
+            fieldHeader = fileObject.readline().split()
+            if (len(fieldHeader) == 0) or (fieldHeader[0] != name):
+                logging.warning("INDEX field does not match field {0}, "
+                                .format(name.decode('ascii', 'replace')) +
+                                "ignoring it")
+                return None
+            index[name.decode('ascii', 'replace').lower()] = (offset, count)
+
+    return index
+
 # TODO: remove this function
 
 
@@ -234,10 +394,17 @@ def verify(hercm):
 # `BXF22`. Care should be taken when modifying this parameter, as compatibility
 # with pre-2.2 BXF versions has not been preserved. 
 # 
+# Each field is formatted and written in large blocks of lines, see 
+# _formatLines(). The fields are followed by an INDEX field giving the 
+# offset and length of each of them, see _readIndex(). 
+# 
+# @param compressionLevel compression level, if filename names a compressed
+# file, see libCompressedIO.openFile()
+# 
 # @throws FileNotFoundError if the file could not be found (should never happen)
 # @throws PermissionError if a permissions error is encountered
 
-def write(HERCMATRIX, filename, headerString="BXF22"):
+def write(HERCMATRIX, filename, headerString="BXF22", compressionLevel=None):
     # HERCMATRIX should be an instance of libhsm.hsm
     # fileame is the string path to the file to write
     # writes a hercm file with contents matching hercm to filename
@@ -248,7 +415,7 @@ def write(HERCMATRIX, filename, headerString="BXF22"):
     logging.info("writing hercm file {0}".format(filename))
 
     try:
-        fileObject = open(filename, 'w')
+        fileObject = libCompressedIO.openFile(filename, 'w', compressionLevel)
     except FileNotFoundError as e:
         logging.warning("(lsc-294) could not open file: file not found")
         raise FileNotFoundError("could not open file {0}... "
@@ -268,71 +435,333 @@ def write(HERCMATRIX, filename, headerString="BXF22"):
 
     logging.info("generated header: {0}".format(header))
 
-    fileObject.write(header)
+    # number of bytes written so far, the offset of the next field
+    position = [0]
 
-    logging.info("writing remarks")
-    fileObject.write('REMARKS STRING\n')
-    itemcounter = 0
-    line = ''
-    for item in HERCMATRIX.remarks:
-        logging.debug("writing item {0} in remarks".format(item))
-        line = line + item + ' '
-        itemcounter += 1
-        if itemcounter == 9:
-            fileObject.write(line + '\n')
-            line = ''
-            itemcounter = 0
-    if itemcounter > 0:
-        fileObject.write(line + '\n')
-    fileObject.write('ENDFIELD\n')
+    def writeText(text):
+        fileObject.write(text)
+        if text.isascii():
+            position[0] += len(text)
+        else:
+            position[0] += len(text.encode(fileObject.encoding))
 
-    logging.info("writing val")
-    fileObject.write('VAL FLOAT\n')
-    itemcounter = 0
-    line = ''
-    for item in HERCMATRIX.elements['val']:
-        logging.debug("writing item {0} in val".format(str(item)))
-        line = line + str(item) + ' '
-        itemcounter += 1
-        if itemcounter == 9:
-            fileObject.write(line + '\n')
-            line = ''
-            itemcounter = 0
-    if itemcounter > 0:
-        fileObject.write(line + '\n')
-    fileObject.write('ENDFIELD\n')
+    writeText(header)
 
-    logging.info("writing row")
-    fileObject.write('ROW INT\n')
-    itemcounter = 0
-    line = ''
-    for item in HERCMATRIX.elements['row']:
-        logging.debug("writing item {0} in row".format(str(item)))
-        line = line + str(item) + ' '
-        itemcounter += 1
-        if itemcounter == 9:
-            fileObject.write(line + '\n')
-            line = ''
-            itemcounter = 0
-    if itemcounter > 0:
-        fileObject.write(line + '\n')
-    fileObject.write('ENDFIELD\n')
+    elements = HERCMATRIX.elements
+    if elements is None:
+        elements = numpy.zeros(0, dtype=HERCMATRIX.dtype)
 
-    logging.info("writing col")
-    fileObject.write('COL INT\n')
-    itemcounter = 0
-    line = ''
-    for item in HERCMATRIX.elements['col']:
-        logging.debug("writing item {0} in col".format(str(item)))
-        line = line + str(item) + ' '
-        itemcounter += 1
-        if itemcounter == 9:
-            fileObject.write(line + '\n')
-            line = ''
-            itemcounter = 0
-    if itemcounter > 0:
-        fileObject.write(line + '\n')
-    fileObject.write('ENDFIELD\n')
+    # offset and number of entries of each field, see _INDEX_HEADER
+    index = []
+
+    logging.info("writing remarks")
+    index.append(('REMARKS', position[0], 
+                  sum(len(str(remark).split()) 
+                      for remark in HERCMATRIX.remarks)))
+    writeText('REMARKS STRING\n')
+    for text in _formatLines(HERCMATRIX.remarks):
+        writeText(text)
+    writeText('ENDFIELD\n')
+
+    for field, fieldHeader in [('val', 'VAL FLOAT\n'), ('row', 'ROW INT\n'),
+                               ('col', 'COL INT\n')]:
+        logging.info("writing {0}".format(field))
+        index.append((field.upper(), position[0], len(elements)))
+        writeText(fieldHeader)
+        for text in _formatLines(elements[field]):
+            writeText(text)
+        writeText('ENDFIELD\n')
+
+    logging.info("writing index")
+    _writeIndex(fileObject, index)
 
     logging.info("finished writing, closing file")
     fileObject.close()
+
+## Write the INDEX field of a BXF file
+# 
+# @param fileObject text file object positioned after the last field
+# @param index list of tuples `(name, offset, count)`, one per field, see 
+# _INDEX_HEADER
+
+def _writeIndex(fileObject, index):
+    fileObject.write(_INDEX_HEADER)
+    for entry in index:
+        fileObject.write("{0} {1} {2}\n".format(*entry))
+    fileObject.write('ENDFIELD\n')
+
+## Format items as the lines of a BXF field
+# 
+# Items are written _ITEMS_PER_LINE to a line, each as str() formats it and
+# followed by a space. Rather than building each line an item at a time, 
+# every block of _BLOCK_LINES lines is formatted by a single `%` operation.
+# Python ints and floats format as numpy ints and float64s do, so those are
+# converted with tolist() first; other types, such as float32, are left as 
+# numpy scalars so that the output is the same. 
+# 
+# @param items numpy.ndarray or list of items to format
+# 
+# @returns generator of str, each holding a block of whole lines
+
+def _formatLines(items):
+    toList = isinstance(items, numpy.ndarray) and \
+        (items.dtype.kind in 'iub' or items.dtype == numpy.float64)
+    blockSize = _BLOCK_LINES * _ITEMS_PER_LINE
+    for start in range(0, len(items), blockSize):
+        block = items[start:start + blockSize]
+        block = tuple(block.tolist() if toList else block)
+
+        lines = len(block) // _ITEMS_PER_LINE
+        text = (_LINE_FORMAT * lines) % block[:lines * _ITEMS_PER_LINE]
+        remaining = len(block) - lines * _ITEMS_PER_LINE
+        if remaining > 0:
+            text = text + ('%s ' * remaining + '\n') % \
+                block[lines * _ITEMS_PER_LINE:]
+        yield text
+
+## write a matrix to a binary BXF file
+# 
+# Writes the binary companion of BXF 2.2, see doc-extra/bxf-spec.md. The 
+# elements are written as they are stored in the matrix, as one array of 
+# records in the byte order of this machine, after a fixed size header. The 
+# header records whether the elements are row major with no duplicates, and 
+# whether they are all in the lower triangle, so that readBinary() need not 
+# check. 
+# 
+# The file is written beside filename and then replaces it (see 
+# libCompressedIO.replaceFile()), so a matrix may be written back to the 
+# file it was mapped from. 
+# 
+# @param HERCMATRIX instance of libHercMatrix.hercMatrix() containing the 
+# matrix to write
+# @param filename the relative or absolute path to the file to write
+# @param compressionLevel compression level, if filename names a compressed
+# file, see libCompressedIO.openFile()
+# 
+# @throws OSError if the file could not be written
+
+def writeBinary(HERCMATRIX, filename, compressionLevel=None):
+    logging.info("writing binary bxf file {0}".format(filename))
+
+    elements = HERCMATRIX.elements
+    if elements is None:
+        elements = numpy.zeros(0, dtype=HERCMATRIX.dtype)
+
+    # find out if the elements are canonical (row major with no duplicates),
+    # and if they are in the lower triangle, a block at a time
+    canonical = True
+    lower = True
+    for start in range(0, len(elements), _BINARY_BLOCK_SIZE):
+        # each block overlaps the last element of the one before it
+        block = elements[max(start - 1, 0):start + _BINARY_BLOCK_SIZE]
+        rows = block['row']
+        cols = block['col']
+        canonical = canonical and bool(numpy.all(
+            (rows[1:] > rows[:-1]) | 
+            ((rows[1:] == rows[:-1]) & (cols[1:] > cols[:-1]))))
+        lower = lower and bool(numpy.all(rows >= cols))
+
+    flags = 0
+    if canonical:
+        flags = flags | _BINARY_CANONICAL
+    if lower:
+        flags = flags | _BINARY_LOWER
+
+    remarks = '\n'.join(HERCMATRIX.remarks).encode('utf-8')
+    remarksOffset = struct.calcsize(_BINARY_HEADER)
+    elementsOffset = -(-(remarksOffset + len(remarks)) // 
+                       _BINARY_ALIGNMENT) * _BINARY_ALIGNMENT
+
+    endianness = '<' if sys.byteorder == 'little' else '>'
+    header = struct.pack(endianness + _BINARY_HEADER, 
+                         _BINARY_MAGIC,
+                         endianness.encode('ascii'),
+                         1 if HERCMATRIX.symmetry == 'SYM' else 0,
+                         flags,
+                         elements.dtype['row'].str[1:].encode('ascii'),
+                         elements.dtype['val'].str[1:].encode('ascii'),
+                         HERCMATRIX.width,
+                         HERCMATRIX.height,
+                         len(elements),
+                         remarksOffset,
+                         len(remarks),
+                         elementsOffset,
+                         elements.dtype.itemsize)
+
+    # the file may be mapped under the elements, see readBinary()
+    with libCompressedIO.replaceFile(filename, 'wb', compressionLevel) \
+            as fileObject:
+        fileObject.write(header)
+        fileObject.write(remarks)
+        fileObject.write(b'\0' * (elementsOffset - remarksOffset - 
+                                  len(remarks)))
+        for start in range(0, len(elements), _BINARY_BLOCK_SIZE):
+            fileObject.write(
+                elements[start:start + _BINARY_BLOCK_SIZE].tobytes())
+
+    logging.info("finished writing binary bxf file")
+
+## read a binary BXF file
+# 
+# Reads a file written by writeBinary(). Nothing is parsed: by default the 
+# elements of the matrix are a numpy.memmap of the file, so reading takes 
+# the same time for any size of matrix, and elements are only read from disk
+# as they are used. The mapping is copy on write, so the matrix may be 
+# modified, but the file never is. 
+# 
+# The elements are copied instead if they are in a different byte order, or
+# of different types than those requested. If the file does not record that
+# its elements are canonical, they are merged according to duplicates (or 
+# only sorted row major if duplicates is `None`, as in read()), and if a 
+# symmetric matrix has elements in the upper triangle, they are discarded (see 
+# libHercMatrix.hercMatrix.makeSymmetrical()); both of which also copy them.
+# Unlike read(), zero elements are kept. 
+# 
+# @param filename absolute or relative path to the file to read
+# @param backend storage backend for the returned matrix, `coo` (default) or
+# `csr`, see libHercMatrix.hercMatrix
+# @param duplicates how to merge elements which share coordinates, see 
+# libHercMatrix.hercMatrix.coalesce(). Default is `sum`. If `None`, 
+# duplicates are kept, and the elements are only sorted row major. 
+# @param indexType passed through to libHercMatrix.hercMatrix, `None` 
+# (default) keeps the type of the file
+# @param valueType passed through to libHercMatrix.hercMatrix, `None` 
+# (default) keeps the type of the file
+# @param memoryMap if `True` (default), map the file rather than reading it.
+# Compressed files (see libCompressedIO) are always read. 
+# 
+# @exception OSError file does not exist, permission error, or other IO error
+# @exception ValueError file is not a binary BXF file, or its header is 
+# mangled, or duplicates is `error` and the file contains duplicate elements
+# 
+# @return libHercMatrix.hercMatrix instance containing the matrix read from 
+# the file
+
+def readBinary(filename, backend='coo', duplicates='sum', indexType=None,
+               valueType=None, memoryMap=True):
+    logging.info("reading binary bxf file {0}".format(filename))
+
+    # compressed files can not be mapped
+    memoryMap = memoryMap and (libCompressedIO.compression(filename) is None)
+
+    headerSize = struct.calcsize(_BINARY_HEADER)
+    with libCompressedIO.openFile(filename, 'rb') as fileObject:
+        header = fileObject.read(headerSize)
+        if (len(header) != headerSize) or \
+                (header[:len(_BINARY_MAGIC)] != _BINARY_MAGIC):
+            raise ValueError("{0} is not a binary BXF file".format(filename))
+
+        endianness = header[len(_BINARY_MAGIC):len(_BINARY_MAGIC) + 1] \
+            .decode('ascii', 'replace')
+        if endianness not in ['<', '>']:
+            raise ValueError("Header has invalid byte order \"{0}\""
+                             .format(endianness))
+
+        (_, _, symmetry, flags, fileIndexType, fileValueType, width, height,
+         nzentries, remarksOffset, remarksLength, elementsOffset, 
+         elementSize) = struct.unpack(endianness + _BINARY_HEADER, header)
+
+        try:
+            fileIndexType = numpy.dtype(fileIndexType.rstrip(b'\0').decode())
+            fileValueType = numpy.dtype(fileValueType.rstrip(b'\0').decode())
+        except (TypeError, UnicodeDecodeError):
+            raise ValueError("Header has invalid element types")
+        fileDtype = numpy.dtype(
+            [('row', fileIndexType.newbyteorder(endianness)),
+             ('col', fileIndexType.newbyteorder(endianness)),
+             ('val', fileValueType.newbyteorder(endianness))])
+        if fileDtype.itemsize != elementSize:
+            raise ValueError("Header has element size {0}, but its element "
+                             .format(elementSize) + "types have size {0}"
+                             .format(fileDtype.itemsize))
+
+        fileObject.seek(remarksOffset)
+        remarks = fileObject.read(remarksLength).decode('utf-8')
+
+        elements = None
+        if (nzentries > 0) and not memoryMap:
+            # read (and decompress) straight into the elements
+            fileObject.seek(elementsOffset)
+            elements = numpy.empty(nzentries, dtype=fileDtype)
+            buffer = elements.view(numpy.uint8)
+            filled = 0
+            while filled < len(buffer):
+                count = fileObject.readinto(buffer[filled:])
+                if not count:
+                    raise ValueError("File is truncated, expected {0} "
+                                     .format(nzentries) + "elements")
+                filled = filled + count
+
+    if valueType is None:
+        valueType = fileValueType
+    HERCMATRIX = libHercMatrix.hercMatrix(backend, indexType, valueType)
+    HERCMATRIX.width = width
+    HERCMATRIX.height = height
+    HERCMATRIX.symmetry = "SYM" if symmetry == 1 else "ASYM"
+    HERCMATRIX.remarks = remarks.split('\n') if remarks else []
+    if (indexType is None) and \
+            (HERCMATRIX.dtype['row'] != fileIndexType):
+        # keep the type of the file, so the elements need not be copied
+        HERCMATRIX.indexType = fileIndexType.type
+
+    if nzentries > 0:
+        if memoryMap:
+            elements = numpy.memmap(filename, dtype=fileDtype, mode='c', 
+                                    offset=elementsOffset, 
+                                    shape=(nzentries,))
+
+        if elements.dtype != HERCMATRIX.dtype:
+            logging.info("converting elements from {0} to {1}"
+                         .format(elements.dtype, HERCMATRIX.dtype))
+            elements = elements.astype(HERCMATRIX.dtype)
+
+        HERCMATRIX.elements = elements
+        HERCMATRIX.nzentries = nzentries
+        HERCMATRIX.isRowMajor = bool(flags & _BINARY_CANONICAL)
+
+        if (not flags & _BINARY_CANONICAL) and (duplicates is not None):
+            HERCMATRIX.coalesce(duplicates)
+        HERCMATRIX.makeRowMajor()
+
+        if (HERCMATRIX.symmetry == "SYM") and (not flags & _BINARY_LOWER):
+            logging.info("matrix is symmetric, truncating upper triangle")
+            HERCMATRIX.makeSymmetrical('truncate')
+
+    return HERCMATRIX
+
+# number of characters read from a BXF file at a time by read()
+_CHUNK_SIZE = 2**22
+
+# header of the INDEX field of a BXF file, see _readIndex()
+_INDEX_HEADER = 'INDEX STRING\n'
+
+# number of bytes at the end of a BXF file searched for the INDEX field
+_INDEX_TAIL_SIZE = 4096
+
+# number of items per line of a BXF field
+_ITEMS_PER_LINE = 9
+
+# format of one line of a BXF field
+_LINE_FORMAT = '%s ' * _ITEMS_PER_LINE + '\n'
+
+# number of lines formatted and written at a time by write()
+_BLOCK_LINES = 2**14
+
+# identifies a binary BXF file, see writeBinary()
+_BINARY_MAGIC = b'BXF22BIN'
+
+# struct format of the header of a binary BXF file, after the byte order: 
+# magic, byte order, symmetry, flags, index type, value type, width, height,
+# nzentries, remarks offset, remarks length, elements offset, element size
+_BINARY_HEADER = '8s1sBBx4s4s4x7Q'
+
+# flags of a binary BXF file: the elements are row major with no duplicates
+_BINARY_CANONICAL = 1
+# flags of a binary BXF file: no element is above the diagonal
+_BINARY_LOWER = 2
+
+# the elements of a binary BXF file start at a multiple of this many bytes
+_BINARY_ALIGNMENT = 64
+
+# number of elements of a binary BXF file written at a time
+_BINARY_BLOCK_SIZE = 2**20
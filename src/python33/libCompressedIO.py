@@ -0,0 +1,130 @@
+import gzip
+import bz2
+import contextlib
+import lzma
+import os
+import tempfile
+
+## @package libCompressedIO
+# Opens files which may be compressed
+#
+# Files whose names end in `.gz`, `.bz2`, or `.xz` are compressed with gzip,
+# bzip2, or xz respectively, and are decompressed or compressed as they are
+# read or written, so the uncompressed contents are never kept on disk or
+# held in memory as a whole. Any other file is opened as usual.
+
+## Get the compression extension of a file name
+#
+# @param filename path to a file
+#
+# @returns the extension, one of `.gz`, `.bz2`, or `.xz`, or `None` if the
+# file is not compressed
+
+def compression(filename):
+    extension = os.path.splitext(filename)[1].lower()
+    if extension in _COMPRESSORS:
+        return extension
+    return None
+
+## Remove the compression extension from a file name
+#
+# Useful to find the format of a compressed file from its name, for
+# instance `matrix.bxf.gz` becomes `matrix.bxf`.
+#
+# @param filename path to a file
+#
+# @returns filename without its compression extension, if it has one
+
+def stripCompression(filename):
+    if compression(filename) is None:
+        return filename
+    return os.path.splitext(filename)[0]
+
+## Open a file which may be compressed
+#
+# Takes the same modes as open(), and as open() opens files in text mode
+# unless the mode contains `b`. Compressed files can only be read or written
+# sequentially, they can not seek backwards while being read, nor at all
+# while being written.
+#
+# @param filename path to the file, compressed according to its extension,
+# see compression()
+# @param mode `r`, `w`, `x`, or `a`, optionally followed by `b` or `t`
+# @param compressionLevel for compressed files opened for writing, from 1
+# (fastest) to 9 (smallest). `None` (default) uses the default level of the
+# compressor. Ignored otherwise.
+#
+# @returns file object
+#
+# @exception OSError file could not be opened
+# @exception ValueError compressionLevel is not valid
+
+def openFile(filename, mode='r', compressionLevel=None):
+    extension = compression(filename)
+    if extension is None:
+        return open(filename, mode)
+
+    if 'b' not in mode and 't' not in mode:
+        # open() defaults to text mode, but the compressors do not
+        mode = mode + 't'
+
+    options = {}
+    if (compressionLevel is not None) and ('r' not in mode):
+        if compressionLevel not in range(1, 10):
+            raise ValueError("compressionLevel \"{0}\" is not valid, "
+                             .format(compressionLevel) +
+                             "expected an integer from 1 to 9")
+        if extension == '.xz':
+            options['preset'] = compressionLevel
+        else:
+            options['compresslevel'] = compressionLevel
+
+    return _COMPRESSORS[extension].open(filename, mode, **options)
+
+## Write a file by replacing it
+#
+# Like openFile(), but the contents are written to a new file in the same
+# directory, which replaces `filename` only once it has been written and 
+# closed. The file being replaced is never truncated, so it may still be in
+# use while it is rewritten, for instance memory mapped by 
+# libBXF.readBinary(). If writing fails, `filename` is left as it was. The
+# new file gets the permissions of the file it replaces, if there is one. 
+#
+# Use as a context manager, `with replaceFile(filename) as fileObject:`
+#
+# @param filename path to the file, compressed according to its extension,
+# see compression()
+# @param mode `w`, optionally followed by `b` or `t`
+# @param compressionLevel see openFile()
+#
+# @returns context manager giving the file object
+#
+# @exception OSError file could not be written
+# @exception ValueError compressionLevel is not valid
+
+@contextlib.contextmanager
+def replaceFile(filename, mode='w', compressionLevel=None):
+    directory, name = os.path.split(os.path.abspath(filename))
+    # keep the extension, so the new file is compressed the same way
+    descriptor, temporary = tempfile.mkstemp(dir=directory, 
+                                             prefix='.' + name + '.', 
+                                             suffix=compression(name) or '')
+    os.close(descriptor)
+    try:
+        try:
+            permissions = os.stat(filename).st_mode & 0o7777
+        except FileNotFoundError:
+            umask = os.umask(0)
+            os.umask(umask)
+            permissions = 0o666 & ~umask
+        os.chmod(temporary, permissions)
+
+        with openFile(temporary, mode, compressionLevel) as fileObject:
+            yield fileObject
+        os.replace(temporary, filename)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+# compression modules by file extension
+_COMPRESSORS = {'.gz': gzip, '.bz2': bz2, '.xz': lzma}
@@ -0,0 +1,233 @@
+import scipy.sparse.linalg
+import numpy
+import time
+
+## @package libHercLinalg
+# Eigenvalue and linear system solvers for libHercMatrix.hercMatrix.
+#
+# Each solver works on libHercMatrix.hercMatrix.asLinearOperator(), so only
+# matrix-vector products are ever computed, and a SYM matrix is never
+# expanded to its full storage. This makes them suitable for large matrices.
+#
+# Every solver returns a report alongside its results, for tuning the
+# solver parameters. The report is a dict with the keys:
+#
+# * `iterations` - number of iterations taken; for eigsh() and eigs() this is
+# the number of Lanczos or Arnoldi steps, which is the number of times the
+# matrix was applied
+# * `matvecs` - number of times the matrix was applied by the solver
+# * `time` - wall time taken by the solver in seconds
+# * `timePerIteration` - `time` divided by `iterations`
+# * `residuals` - residual norms, see each solver
+# * `converged` - True if the solver converged
+
+## Compute eigenvalues and eigenvectors of a symmetric matrix
+#
+# Uses the implicitly restarted Lanczos method of
+# scipy.sparse.linalg.eigsh().
+#
+# @param HERCMATRIX instance of libHercMatrix.hercMatrix, must be symmetric
+# @param k number of eigenvalues to compute, less than the height of the
+# matrix
+# @param which which eigenvalues to compute, one of 'LM', 'SM', 'LA', 'SA',
+# or 'BE', see scipy.sparse.linalg.eigsh()
+# @param tol relative accuracy of the eigenvalues, 0 for machine precision
+# @param maxiter maximum number of restarts, by default `10 * height`
+#
+# @returns (values, vectors, report). values is a numpy.ndarray of the `k`
+# eigenvalues, and vectors is a numpy.ndarray whose columns are the
+# corresponding eigenvectors. The residuals of the report are
+# `||A v - lambda v||` for each eigenpair.
+#
+# @exception ValueError the matrix is not square or not symmetric
+# @exception scipy.sparse.linalg.ArpackNoConvergence the eigenvalues did not
+# converge within maxiter restarts
+
+def eigsh(HERCMATRIX, k=6, which='LM', tol=0, maxiter=None):
+    _checkSymmetric(HERCMATRIX)
+
+    operator, counter = _countingOperator(HERCMATRIX)
+    start = time.perf_counter()
+    values, vectors = scipy.sparse.linalg.eigsh(operator, k, which=which,
+                                                tol=tol, maxiter=maxiter)
+    elapsed = time.perf_counter() - start
+
+    residuals = _eigenResiduals(HERCMATRIX, values, vectors)
+    return values, vectors, _report(counter[0], counter[0], elapsed,
+                                    residuals, True)
+
+## Compute eigenvalues and eigenvectors of a square matrix
+#
+# Uses the implicitly restarted Arnoldi method of scipy.sparse.linalg.eigs(),
+# for matrices which are not symmetric. For symmetric matrices eigsh() is
+# faster.
+#
+# @param HERCMATRIX instance of libHercMatrix.hercMatrix, must be square
+# @param k number of eigenvalues to compute, less than the height of the
+# matrix minus one
+# @param which which eigenvalues to compute, one of 'LM', 'SM', 'LR', 'SR',
+# 'LI', or 'SI', see scipy.sparse.linalg.eigs()
+# @param tol relative accuracy of the eigenvalues, 0 for machine precision
+# @param maxiter maximum number of restarts, by default `10 * height`
+#
+# @returns (values, vectors, report) as eigsh(), but values and vectors are
+# complex
+#
+# @exception ValueError the matrix is not square
+# @exception scipy.sparse.linalg.ArpackNoConvergence the eigenvalues did not
+# converge within maxiter restarts
+
+def eigs(HERCMATRIX, k=6, which='LM', tol=0, maxiter=None):
+    _checkSquare(HERCMATRIX)
+
+    operator, counter = _countingOperator(HERCMATRIX)
+    start = time.perf_counter()
+    values, vectors = scipy.sparse.linalg.eigs(operator, k, which=which,
+                                               tol=tol, maxiter=maxiter)
+    elapsed = time.perf_counter() - start
+
+    residuals = _eigenResiduals(HERCMATRIX, values, vectors)
+    return values, vectors, _report(counter[0], counter[0], elapsed,
+                                    residuals, True)
+
+## Solve `A x = b` by the conjugate gradient method
+#
+# Uses scipy.sparse.linalg.cg().
+#
+# @param HERCMATRIX instance of libHercMatrix.hercMatrix, must be symmetric
+# positive definite
+# @param b right hand side, array-like of length height
+# @param x0 initial guess, by default zeros
+# @param rtol relative tolerance, the solver stops once
+# `||b - A x|| <= max(rtol * ||b||, atol)`
+# @param atol absolute tolerance
+# @param maxiter maximum number of iterations, by default `10 * height`
+# @param history if True, the residual is computed after every iteration.
+# This costs one extra matrix-vector product per iteration, which is not
+# counted in the time of the report.
+#
+# @returns (x, report). The residuals of the report are `||b - A x||` after
+# each iteration if history is True, and otherwise only for the final x.
+#
+# @exception ValueError the matrix is not square or not symmetric, or b is
+# not of length height
+
+def cg(HERCMATRIX, b, x0=None, rtol=1e-5, atol=0.0, maxiter=None,
+       history=False):
+    return _solve(scipy.sparse.linalg.cg, HERCMATRIX, b, x0, maxiter,
+                  history, rtol=rtol, atol=atol)
+
+## Solve `A x = b` by the minimum residual method
+#
+# Uses scipy.sparse.linalg.minres(). Unlike cg() the matrix need not be
+# positive definite.
+#
+# @param HERCMATRIX instance of libHercMatrix.hercMatrix, must be symmetric
+# @param b right hand side, array-like of length height
+# @param x0 initial guess, by default zeros
+# @param rtol relative tolerance, see scipy.sparse.linalg.minres()
+# @param shift solve `(A - shift I) x = b` instead, the residuals of the 
+# report are then those of the shifted system
+# @param maxiter maximum number of iterations, by default `5 * height`
+# @param history see cg()
+#
+# @returns (x, report) as cg()
+#
+# @exception ValueError the matrix is not square or not symmetric, or b is
+# not of length height
+
+def minres(HERCMATRIX, b, x0=None, rtol=1e-5, shift=0.0, maxiter=None,
+           history=False):
+    return _solve(scipy.sparse.linalg.minres, HERCMATRIX, b, x0, maxiter,
+                  history, rtol=rtol, shift=shift)
+
+## Run one of the scipy.sparse.linalg Krylov solvers, see cg()
+
+def _solve(solver, HERCMATRIX, b, x0, maxiter, history, **options):
+    _checkSymmetric(HERCMATRIX)
+    b = numpy.asarray(b)
+    if (b.ndim != 1) or (len(b) != HERCMATRIX.height):
+        raise ValueError("b must be a vector of length {0}"
+                         .format(HERCMATRIX.height))
+
+    operator, counter = _countingOperator(HERCMATRIX)
+    iterations = [0]
+    residuals = []
+    shift = options.get('shift', 0)
+
+    def residual(x):
+        return numpy.linalg.norm(b - HERCMATRIX.matvec(x) + shift * x)
+
+    # time spent computing the history, which is not counted as solver time
+    overhead = [0]
+
+    def callback(xk):
+        iterations[0] += 1
+        if history:
+            start = time.perf_counter()
+            residuals.append(residual(xk))
+            overhead[0] += time.perf_counter() - start
+
+    start = time.perf_counter()
+    x, info = solver(operator, b, x0=x0, maxiter=maxiter, callback=callback,
+                     **options)
+    elapsed = time.perf_counter() - start - overhead[0]
+
+    if (not history) or (iterations[0] == 0):
+        residuals.append(residual(x))
+
+    report = _report(iterations[0], counter[0], elapsed, residuals, info == 0)
+    return x, report
+
+## Wrap a matrix in a LinearOperator which counts its applications
+#
+# @returns (operator, counter), where `counter[0]` is the number of times
+# the operator has been applied to a vector
+
+def _countingOperator(HERCMATRIX):
+    operator = HERCMATRIX.asLinearOperator()
+    counter = [0]
+
+    def matvec(x):
+        counter[0] += 1
+        return operator.matvec(x)
+
+    def rmatvec(x):
+        counter[0] += 1
+        return operator.rmatvec(x)
+
+    return scipy.sparse.linalg.LinearOperator(operator.shape, matvec=matvec,
+                                              rmatvec=rmatvec,
+                                              dtype=operator.dtype), counter
+
+## Compute `||A v - lambda v||` for each eigenpair
+
+def _eigenResiduals(HERCMATRIX, values, vectors):
+    return numpy.linalg.norm(HERCMATRIX.matmat(vectors) - vectors * values,
+                             axis=0)
+
+## Build the report returned by every solver, see libHercLinalg
+
+def _report(iterations, matvecs, elapsed, residuals, converged):
+    return {'iterations': iterations,
+            'matvecs': matvecs,
+            'time': elapsed,
+            'timePerIteration': elapsed / max(iterations, 1),
+            'residuals': list(residuals),
+            'converged': converged}
+
+## Raise ValueError if HERCMATRIX is not square
+
+def _checkSquare(HERCMATRIX):
+    if HERCMATRIX.height != HERCMATRIX.width:
+        raise ValueError("matrix must be square, but is {0}x{1}"
+                         .format(HERCMATRIX.height, HERCMATRIX.width))
+
+## Raise ValueError if HERCMATRIX is not square or not symmetric
+#
+# A matrix with symmetry ASYM is accepted if its elements are symmetric.
+
+def _checkSymmetric(HERCMATRIX):
+    _checkSquare(HERCMATRIX)
+    if (HERCMATRIX.symmetry != 'SYM') and (not HERCMATRIX.checkSymmetry()):
+        raise ValueError("matrix must be symmetric")
@@ -3,8 +3,14 @@
 # said matricies
 
 import numpy
+import math
 import scipy
+import scipy.sparse.linalg
 import logging
+import copy
+import tempfile
+import pickle
+import weakref
 
 ## @package libHercMatrix
 
@@ -18,20 +24,110 @@ import logging
 # or numpy array that contains a row, col, val triplet in that order.
 # 
 # Unless otherwise noted, everything here is always zero indexed. 
+# 
+# Two storage backends are available. With the default `coo` backend the COO
+# elements are the primary representation. With the `csr` backend a canonical
+# scipy.sparse.csr_matrix (indptr/indices/data) is kept as the primary 
+# representation instead, and the COO elements are materialized from it only
+# when they are used. Any modification made through the COO interface makes 
+# the elements primary again until the CSR representation is next needed, at 
+# which point it is rebuilt (summing any duplicate elements). 
+# 
+# Element types are configurable per matrix, see dtype. By default `row` and 
+# `col` are int32 unless the dimensions of the matrix require int64, and 
+# `val` is float64. 
+# 
+# Elements may be kept out of core, in a numpy.memmap on a scratch file, for 
+# matrices too large for memory, see setScratchDirectory(). Lookups, slicing,
+# the triangle checks, removing elements, and sorting then work through the 
+# elements a block at a time, so only the blocks in use need to be paged in.
+# Conversions with getInFormat() are built in memory regardless. 
 
 class hercMatrix:
     
 
     ## Fairly basic constructor. Nothing special here. 
+    # 
+    # @param backend string, either `coo` (default) or `csr`, the primary 
+    # storage representation of the matrix. See libHercMatrix.hercMatrix.
+    # @param indexType numpy integer type of the `row` and `col` of each 
+    # element, or `None` (default) to choose int32 or int64 from the 
+    # dimensions of the matrix. See dtype. 
+    # @param valueType numpy floating point type of the `val` of each element, 
+    # float64 by default. float32 halves the memory used by values. 
+    # @param scratchDirectory directory to keep the elements in, out of core, 
+    # or `None` (default) to keep them in memory. See setScratchDirectory(). 
+    # 
+    # @exception ValueError backend is not valid, or indexType or valueType
+    # are not valid types 
 
-    def __init__(this):
+    def __init__(this, backend='coo', indexType=None,
+                 valueType=numpy.float64, scratchDirectory=None):
         from scipy.sparse import csr_matrix
         # hercm matrix attributes
 
-        this.dtype = numpy.dtype([('row', numpy.int32),
-                                  ('col', numpy.int32),
-                                  ('val', numpy.float64)])
-        this.elements = None
+        if backend not in ['coo', 'csr']:
+            raise ValueError("backend \"{0}\" is not valid, ".format(backend)
+                             + "expected one of: coo, csr")
+        this.backend = backend
+        # primary CSR representation when backend is csr, None whenever the
+        # elements have been modified since it was built
+        this._csr = None
+
+        if (indexType is not None) and \
+                (numpy.dtype(indexType).kind not in ['i', 'u']):
+            raise ValueError("indexType \"{0}\" is not valid, "
+                             .format(indexType) + "expected an integer type")
+        if numpy.dtype(valueType).kind != 'f':
+            raise ValueError("valueType \"{0}\" is not valid, "
+                             .format(valueType) + "expected a floating " +
+                             "point type")
+        # see dtype
+        this.indexType = indexType
+        this.valueType = numpy.dtype(valueType).type
+
+        # weakref.WeakSet of the matrices sharing _buffer with this one 
+        # (including this one), or None, see snapshot() and _buffer
+        this._group = None
+        # blocks of the shared _buffer as they were before another matrix of
+        # _group overwrote them, by block number, see _saveBlocks()
+        this._savedBlocks = {}
+        # elements are stored in the first _length slots of _buffer, which
+        # is grown geometrically so that appends are amortized O(1). See 
+        # elements and reserve().
+        this._buffer = None
+        this._length = 0
+        # True if _buffer may be in use outside this process, or by whoever
+        # unpickled it, in which case it must be copied before elements are 
+        # modified in place. See attach(). 
+        this._shared = False
+        # if not None, _buffer is a numpy.memmap on an anonymous scratch file
+        # in this directory, see setScratchDirectory() 
+        this.scratchDirectory = scratchDirectory
+        # multiprocessing.shared_memory.SharedMemory blocks created by 
+        # publish(), and blocks the buffers of this matrix are views of if it
+        # was created by attach(). Kept so they stay mapped. 
+        this._published = []
+        this._attached = []
+
+        # True if elements are known to be sorted row-major. Set by 
+        # makeRowMajor(), and cleared by anything that may break the order. 
+        this.isRowMajor = True
+
+        # finds the element storing each (row, col) coordinate pair, built 
+        # lazily by _getIndex(). None when stale. 
+        this._index = None
+
+        # incremented every time the contents of the matrix change, used to
+        # tell if cached data derived from the matrix is still valid
+        this.version = 0
+
+        # scipy.sparse/dense conversions made by getInFormat(), keyed by 
+        # (version, height, width, format). Entries are evicted largest first
+        # once they total more than formatCacheLimit bytes. Set 
+        # formatCacheLimit to 0 to disable caching. 
+        this._formatCache = {}
+        this.formatCacheLimit = 256 * 2**20
 
         this.remarks = []
         this.nzentries = 0
@@ -40,11 +136,581 @@ class hercMatrix:
         this.height = 0
         this.width = 0
 
+    ## numpy dtype of the COO elements of this matrix
+    # 
+    # Structured dtype with the fields `row`, `col`, and `val`. `row` and `col`
+    # are of indexType, or if indexType is `None`, int32 while both 
+    # dimensions of the matrix fit in int32 and int64 otherwise. `val` is of
+    # valueType. 
+    # 
+    # When the dimensions or types change, the element buffer is converted the
+    # next time elements are added, so set height and width before adding
+    # elements with large indices. 
+
+    @property
+    def dtype(this):
+        indexType = this.indexType
+        if indexType is None:
+            if max(this.height, this.width) > numpy.iinfo(numpy.int32).max:
+                indexType = numpy.int64
+            else:
+                indexType = numpy.int32
+
+        return numpy.dtype([('row', indexType),
+                            ('col', indexType),
+                            ('val', this.valueType)])
+
+    ## COO elements of this matrix
+    #
+    # numpy array of libHercMatrix.hercMatrix.dtype, or `None` if the matrix
+    # has not been initialized. Assigning a new array to elements discards the 
+    # coordinate index, so external code may safely replace it wholesale. 
+    # 
+    # The array returned is a view of the used portion of the element buffer,
+    # so in-place modifications are reflected in the matrix. Views should not
+    # be kept across calls which add elements, as the buffer may be 
+    # reallocated. 
+    # 
+    # **NOTE**: if you modify the `row` or `col` columns in place, you must call
+    # _invalidateIndex() afterwards. If you modify only `val` in place, you 
+    # must call _markModified() afterwards. While the buffer is shared with a
+    # snapshot the array returned is read only; call _ensureOwned() first to 
+    # modify it. 
+
+    @property
+    def elements(this):
+        this._materialize()
+        if this._buffer is None:
+            return None
+        elements = this._buffer[:this._length]
+        if this._isShared():
+            elements.flags.writeable = False
+        return elements
+
+    @elements.setter
+    def elements(this, newElements):
+        this._buffer = newElements
+        this._shared = False
+        if newElements is None:
+            this._length = 0
+        else:
+            this._length = len(newElements)
+        # the order of externally provided elements is unknown
+        this.isRowMajor = this._length < 2
+        this._invalidateIndex()
+
+    ## The element buffer
+    # 
+    # Kept in _storage. A matrix which shares its buffer with others (see 
+    # snapshot()) and has saved blocks builds a buffer of its own, from the 
+    # shared buffer and its saved blocks, the first time its buffer is used,
+    # see _restoreSavedBlocks(). Assigning a new buffer stops sharing the old
+    # one. 
+
+    @property
+    def _buffer(this):
+        if this._savedBlocks:
+            this._restoreSavedBlocks()
+        return this._storage
+
+    @_buffer.setter
+    def _buffer(this, buffer):
+        if this._group is not None:
+            this._group.discard(this)
+            this._group = None
+        this._savedBlocks = {}
+        this._storage = buffer
+
+    ## Check if the element buffer must not be modified in place
+    # 
+    # @returns True if the buffer is shared with another matrix, see 
+    # snapshot(), or may be in use elsewhere, see attach()
+
+    def _isShared(this):
+        return this._shared or \
+            ((this._group is not None) and (len(this._group) > 1))
+
+    ## Preallocate space for elements
+    # 
+    # Ensures the element buffer can hold at least `n` elements without being
+    # reallocated. Useful for readers which know the number of elements ahead
+    # of time. Does not change the contents of the matrix, but converts the 
+    # buffer to dtype if it is of a different type. 
+    # 
+    # @param n int number of elements to make room for 
+
+    def reserve(this, n):
+        this._materialize()
+        dtype = this.dtype
+        if this._buffer is None:
+            this._buffer = this._allocate(n)
+            this._length = 0
+        elif (len(this._buffer) < n) or (this._buffer.dtype != dtype) or \
+                (this._isMapped() != isinstance(this._buffer, numpy.memmap)):
+            newBuffer = this._allocate(max(n, len(this._buffer)))
+            for start in range(0, this._length, _BLOCK_SIZE):
+                end = min(start + _BLOCK_SIZE, this._length)
+                newBuffer[start:end] = this._buffer[start:end]
+            this._buffer = newBuffer
+            this._shared = False
+
+    ## Make room for at least `n` elements, growing geometrically
+    # 
+    # Like reserve(), but at least doubles the capacity of the buffer when it
+    # must be reallocated, so that repeated appends are amortized O(1). 
+    # 
+    # @param n int number of elements the buffer must be able to hold
+
+    def _grow(this, n):
+        this._materialize()
+        if this._buffer is None or len(this._buffer) < n:
+            capacity = 0 if this._buffer is None else len(this._buffer)
+            this.reserve(max(n, 16, 2 * capacity))
+        elif (this._buffer.dtype != this.dtype) or \
+                (this._isMapped() != isinstance(this._buffer, numpy.memmap)):
+            this.reserve(n)
+
+    ## Allocate an uninitialized element buffer
+    # 
+    # @param n int number of elements the buffer must hold
+    # 
+    # @returns numpy.ndarray of dtype, or a numpy.memmap of dtype on a new 
+    # scratch file if scratchDirectory is set. The scratch file has no name, 
+    # and is deleted once the buffer is no longer used. 
+
+    def _allocate(this, n):
+        dtype = this.dtype
+        if not this._isMapped():
+            return numpy.empty(n, dtype=dtype)
+
+        with tempfile.TemporaryFile(dir=this.scratchDirectory or None) \
+                as scratch:
+            # mmap can not map an empty file
+            scratch.truncate(max(n, 1) * dtype.itemsize)
+            # the mapping keeps the file alive after it is closed
+            return numpy.memmap(scratch, dtype=dtype, mode='r+',
+                                shape=(max(n, 1),))[:n]
+
+    ## Check if the elements are kept out of core
+    # 
+    # @returns True if scratchDirectory is set
+
+    def _isMapped(this):
+        return this.scratchDirectory is not None
+
+    ## Keep the elements in memory, or out of core in a scratch directory
+    # 
+    # With a scratch directory, the element buffer is a numpy.memmap on an 
+    # anonymous file in that directory, so the operating system pages 
+    # elements in and out as they are used, and the matrix may be larger than
+    # memory. Existing elements are moved into the new storage a block at a 
+    # time. 
+    # 
+    # Operations which do not need every element at once work in blocks of 
+    # _BLOCK_SIZE elements: getValue(), getValues(), setValue(), 
+    # setValues(), getRow(), getCol(), getBlock(), the triangle checks, 
+    # removeElement(), removeZeros(), makeRowMajor(), and transpose(). 
+    # getValue() and setValue() use a binary search when the matrix is row 
+    # major, instead of the coordinate index. Anything which converts the 
+    # matrix to scipy.sparse (getInFormat(), checkSymmetry(), 
+    # makeSymmetrical(), ...) still needs the converted matrix to fit in
+    # memory. 
+    # 
+    # @param scratchDirectory path of an existing directory, or `None` to 
+    # move the elements back into memory. An empty string uses the default 
+    # temporary directory. 
+
+    def setScratchDirectory(this, scratchDirectory):
+        this.scratchDirectory = scratchDirectory
+        if this._buffer is not None:
+            this.reserve(this._length)
+
+    ## Take a copy-on-write snapshot of this matrix
+    # 
+    # Returns a new matrix with the same contents and attributes, which shares
+    # the element buffer (and with the `csr` backend, the CSR representation)
+    # with this one instead of copying it, so taking a snapshot is O(1). 
+    # 
+    # The snapshot only sees the elements which exist now. Elements appended 
+    # to this matrix afterwards are written past the end of the shared 
+    # elements, so they do not copy anything. Before either matrix modifies 
+    # shared elements in place, the _BLOCK_SIZE blocks of elements it 
+    # modifies are saved for the other (see _ensureOwned()), so the memory 
+    # taken by snapshots grows with what is changed, not with the size of 
+    # the matrix. Removing or reordering shared elements still copies them. 
+    # 
+    # A snapshot which is no longer needed should be release()d. 
+    # 
+    # @returns new libHercMatrix.hercMatrix instance
+
+    def snapshot(this):
+        buffer = this._buffer
+        SNAPSHOT = copy.copy(this)
+        SNAPSHOT.remarks = list(this.remarks)
+        SNAPSHOT._index = None
+        SNAPSHOT._formatCache = dict(this._formatCache)
+        SNAPSHOT._published = []
+        SNAPSHOT._group = None
+        SNAPSHOT._savedBlocks = {}
+
+        if buffer is not None:
+            # the snapshot has no spare capacity, so it will reallocate 
+            # rather than append into the part of the buffer this matrix 
+            # appends to
+            SNAPSHOT._buffer = buffer[:this._length]
+            if this._group is None:
+                this._group = weakref.WeakSet([this])
+            SNAPSHOT._group = this._group
+            this._group.add(SNAPSHOT)
+
+        return SNAPSHOT
+
+    ## Release a snapshot which is no longer needed
+    # 
+    # Drops the elements of this matrix, so that the matrices it shared them
+    # with (see snapshot()) need no longer save anything for it before 
+    # modifying them. The matrix must not be used afterwards. 
+
+    def release(this):
+        this._buffer = None
+        this._csr = None
+        this._length = 0
+        this._index = None
+        this._formatCache = {}
+
+    ## Publish this matrix in shared memory
+    # 
+    # Copies the elements, and the CSR representation if there is one (the 
+    # primary one with the `csr` backend, otherwise a cached getInFormat() 
+    # conversion), into multiprocessing.shared_memory blocks. Another process
+    # can then attach() to them without copying anything. 
+    # 
+    # The blocks belong to this matrix, and stay published until unpublish()
+    # is called. They are not updated if the matrix is modified afterwards.
+    # 
+    # @returns dict describing the published matrix, to be passed (by 
+    # pickling, it is small) to attach()
+
+    def publish(this):
+        descriptor = {'state': {}, 'elements': None, 'csr': None}
+        for attribute in ['backend', 'indexType', 'valueType', 'height',
+                          'width', 'nzentries', 'symmetry', 'verification',
+                          'remarks', 'isRowMajor']:
+            descriptor['state'][attribute] = getattr(this, attribute)
+
+        csr = this._csr
+        if csr is None:
+            csr = this._formatCache.get(
+                (this.version, this.height, this.width, 'csr'), (0, None))[1]
+
+        if (this._buffer is not None) or (this._csr is None):
+            if this.elements is not None:
+                descriptor['elements'] = this._publishArray(this.elements)
+
+        if csr is not None:
+            descriptor['csr'] = (csr.shape, [this._publishArray(array) for 
+                array in [csr.data, csr.indices, csr.indptr]])
+
+        return descriptor
+
+    ## Copy an array into a new shared memory block
+    # 
+    # @param array numpy.ndarray to copy
+    # 
+    # @returns tuple `(name, dtype, length)` describing the block, see 
+    # _attachArray()
+
+    def _publishArray(this, array):
+        from multiprocessing import shared_memory
+
+        # blocks can not be empty
+        block = shared_memory.SharedMemory(create=True, 
+                                           size=max(array.nbytes, 1))
+        this._published.append(block)
+        numpy.ndarray(len(array), dtype=array.dtype, buffer=block.buf)[:] = \
+            array
+
+        return (block.name, array.dtype, len(array))
+
+    ## Release the shared memory blocks created by publish()
+    # 
+    # Processes which have attached to them keep their mappings, but no new
+    # process can attach. 
+
+    def unpublish(this):
+        for block in this._published:
+            block.close()
+            block.unlink()
+        this._published = []
+
+    ## Pickle support
+    # 
+    # The element buffer (or with the `csr` backend, the CSR arrays) are 
+    # pickled on their own, and caches are dropped. With pickle protocol 5 
+    # they are passed as pickle.PickleBuffer, so they may be transferred out 
+    # of band without being copied. The unpickled matrix uses the buffers it
+    # is given directly, and copies them before modifying its elements, as 
+    # if it were a snapshot (see snapshot()). 
+
+    def __reduce_ex__(this, protocol):
+        state = this.__dict__.copy()
+        for attribute, empty in [('_storage', None), ('_csr', None),
+                                 ('_index', None), ('_formatCache', {}),
+                                 ('_published', []), ('_attached', []),
+                                 ('_shared', False), ('_group', None),
+                                 ('_savedBlocks', {})]:
+            state[attribute] = empty
+
+        def wrap(array):
+            if protocol >= 5:
+                return pickle.PickleBuffer(numpy.ascontiguousarray(array))
+            return array
+
+        elements = None
+        if this._buffer is not None:
+            elements = (wrap(this.elements), this.elements.dtype)
+            state['_length'] = len(this.elements)
+
+        csr = None
+        if this._csr is not None:
+            csr = (this._csr.shape, [(wrap(array), array.dtype) for array in
+                [this._csr.data, this._csr.indices, this._csr.indptr]])
+
+        return (_rebuildMatrix, (state, elements, csr))
+
+    ## Make sure elements can be modified in place
+    # 
+    # Must be called before modifying existing elements in place. If the 
+    # element buffer is shared with snapshots, and only some elements will 
+    # be modified, the blocks holding them are saved for the other matrices
+    # sharing the buffer (see _saveBlocks()). The buffer may then be written 
+    # at those slots through _buffer, though elements stays read only. 
+    # Otherwise the elements are copied into a new buffer if need be. 
+    # 
+    # @param slots numpy.ndarray of the indices of the elements which will be
+    # modified, or `None` (default) for all of them
+
+    def _ensureOwned(this, slots=None):
+        if this._buffer is None:
+            this._shared = False
+        elif this._shared or ((slots is None) and this._isShared()):
+            buffer = this._allocate(this._length)
+            for start in range(0, this._length, _BLOCK_SIZE):
+                end = min(start + _BLOCK_SIZE, this._length)
+                buffer[start:end] = this._buffer[start:end]
+            this._buffer = buffer
+            this._shared = False
+        elif this._isShared():
+            this._saveBlocks(numpy.unique(
+                numpy.asarray(slots, dtype=numpy.int64) // _BLOCK_SIZE))
+
+    ## Save blocks of the shared element buffer before overwriting them
+    # 
+    # Each of the other matrices sharing the buffer which still sees a block
+    # gets a copy of it, unless it has saved that block already. Matrices 
+    # which saved the block at the same time share the copy. The copy is 
+    # taken from the longest view of the buffer in the group, since the 
+    # others may hold more elements than this matrix does. 
+    # 
+    # @param blocks numpy.ndarray of block numbers, each of _BLOCK_SIZE 
+    # elements
+
+    def _saveBlocks(this, blocks):
+        others = [member for member in this._group if member is not this]
+        source = max(this._group, key=lambda member: len(member._storage))
+        for block in blocks.tolist():
+            start = block * _BLOCK_SIZE
+            lacking = [member for member in others if 
+                       (start < member._length) and 
+                       (block not in member._savedBlocks)]
+            if len(lacking) == 0:
+                continue
+
+            end = min(start + _BLOCK_SIZE, 
+                      max(member._length for member in lacking))
+            saved = numpy.array(source._storage[start:end])
+            for member in lacking:
+                member._savedBlocks[block] = saved
+
+    ## Build an element buffer of our own from saved blocks
+    # 
+    # See _saveBlocks(). Stops sharing the element buffer. 
+
+    def _restoreSavedBlocks(this):
+        shared = this._storage
+        savedBlocks = this._savedBlocks
+        this._savedBlocks = {}
+
+        buffer = this._allocate(this._length)
+        for start in range(0, this._length, _BLOCK_SIZE):
+            end = min(start + _BLOCK_SIZE, this._length)
+            saved = savedBlocks.get(start // _BLOCK_SIZE)
+            if saved is None:
+                buffer[start:end] = shared[start:end]
+            else:
+                buffer[start:end] = saved[:end - start]
+        this._buffer = buffer
+
+    ## Discard the coordinate index
+    # 
+    # Should be called whenever the row or col of any element changes, or 
+    # elements are removed or reordered. The index is rebuilt on next use. 
+
+    def _invalidateIndex(this):
+        this._index = None
+        this._markModified()
+
+    ## Record that the contents of the matrix have changed
+    # 
+    # Increments version, so that any cached conversions of the matrix are no
+    # longer used. Should be called after any modification to elements. 
+    # Modifications which may move or remove elements should call 
+    # _invalidateIndex() instead, which calls this. 
+
+    def _markModified(this):
+        this.version = this.version + 1
+        if this._csr is not None:
+            # the elements are primary from now on, so they must exist
+            this._materialize()
+            this._csr = None
+
+    ## Build the COO elements from the primary CSR representation
+    # 
+    # Does nothing unless the backend is `csr` and the elements have not been
+    # built since the CSR representation was last replaced. 
+
+    def _materialize(this):
+        if (this._buffer is not None) or (this._csr is None):
+            return
+
+        csr = this._csr
+        buffer = this._allocate(csr.nnz)
+        buffer['row'] = numpy.repeat(numpy.arange(csr.shape[0]),
+                                     numpy.diff(csr.indptr))
+        buffer['col'] = csr.indices
+        buffer['val'] = csr.data
+        this._buffer = buffer
+        this._length = csr.nnz
+        this._shared = False
+
+    ## Get this matrix in CSR format 
+    # 
+    # With the `csr` backend this returns the primary CSR representation, 
+    # building it from the elements (and making it primary) if they have been
+    # modified. With the `coo` backend this is getInFormat('csr'). Either way,
+    # the result must not be modified in place. 
+    # 
+    # @returns scipy.sparse.csr_matrix in canonical format
+
+    def _getCSR(this):
+        if this.backend != 'csr':
+            return this.getInFormat('csr')
+
+        if (this._csr is not None) and \
+                (this._csr.shape != (this.height, this.width)):
+            # dimensions have changed, rebuild from the elements 
+            this._materialize()
+            this._csr = None
+
+        if this._csr is None:
+            if this.elements is None:
+                this.replaceContents(scipy.sparse.csr_matrix(
+                    (this.height, this.width)))
+            else:
+                this._setCSR(scipy.sparse.coo_matrix(
+                    (this.elements['val'],
+                     (this.elements['row'], this.elements['col'])),
+                    shape=(this.height, this.width)).tocsr())
+
+        return this._csr
+
+    ## Make a CSR matrix the primary representation
+    # 
+    # The COO elements are discarded and rebuilt from `csr` when next used. 
+    # 
+    # @param csr scipy.sparse.csr_matrix with the same shape as this matrix
+
+    def _setCSR(this, csr):
+        if csr.dtype != this.valueType:
+            csr = csr.astype(this.valueType)
+        if not csr.has_canonical_format:
+            csr = csr.copy()
+            csr.sum_duplicates()
+
+        this._csr = None
+        this._buffer = None
+        this._shared = False
+        this._invalidateIndex()
+        this._csr = csr
+        this._length = csr.nnz
+        this.nzentries = csr.nnz
+        # canonical CSR is always row major
+        this.isRowMajor = True
+
+    ## Get the coordinate index 
+    # 
+    # Returns the tuple `(stride, keys, slots, appended)`, building it if 
+    # needed. keys is the sorted array of the coordinate keys of the 
+    # elements, packed with stride (see _packKeys()), without duplicates, and
+    # slots holds the index of the element storing each key. appended is a 
+    # dict mapping `(row, col)` to the index of the elements added by 
+    # addElement() since, see _appendToIndex(). If a coordinate pair is 
+    # stored more than once, the first element storing it is used, as the 
+    # original linear search did. The index is rebuilt if the dimensions of 
+    # the matrix change the stride. 
+    # 
+    # Unlike a dict of every coordinate pair, this takes 16 bytes per 
+    # element. 
+    # 
+    # @returns tuple `(int, numpy.ndarray, numpy.ndarray, dict)`
+
+    def _getIndex(this):
+        stride = max(this.height, this.width, 1)
+        if (this._index is None) or (this._index[0] != stride):
+            elements = this.elements
+            if elements is None:
+                elements = numpy.zeros(0, dtype=this.dtype)
+            keys, slots = _sortIndex(
+                _packPairs(elements['row'], elements['col'], stride),
+                isSorted=this.isRowMajor)
+            this._index = (stride, keys, slots, {})
+        return this._index
+
+    ## Add an appended element to the coordinate index
+    # 
+    # Appends are kept in a dict beside the sorted keys, rather than 
+    # inserted into them, so that adding elements one at a time is not 
+    # O(n) each. Once the dict holds more than _INDEX_APPENDED elements, or
+    # a sixteenth of the sorted keys, the index is discarded, to be rebuilt
+    # from every element on next use. Does nothing if there is no index. 
+    # 
+    # @param row int row of the element
+    # @param col int column of the element
+    # @param slot int index of the element
+
+    def _appendToIndex(this, row, col, slot):
+        if this._index is None:
+            return
+
+        stride, keys, slots, appended = this._index
+        if _lookupIndex(this._index, row, col) >= 0:
+            # the first element storing a coordinate pair is used
+            return
+        if len(appended) >= max(_INDEX_APPENDED, len(keys) // 16):
+            this._index = None
+            return
+        appended[(row, col)] = slot
+
     ## Return this matrix as a scipy.sparse matrix
     # 
     # Returns the matrix stored in this class instance as an instance of 
     # scipy.sparse. 
     # 
+    # Conversions are cached until the matrix is next modified, so repeated
+    # calls on an unchanged matrix are cheap. Because of this, the returned
+    # matrix may be shared with later callers and **must not** be modified in
+    # place - make a copy first if you need to. 
+    # 
     # @param form A string indicating the format. Should be any string supported
     # by [scipy.sparse.coo_matrix.asformat()](http://docs.scipy.org/doc/scipy/reference/generated/scipy.sparse.coo_matrix.asformat.html#scipy.sparse.coo_matrix.asformat)
     # as this is basically a wrapper for that function. 
@@ -53,6 +719,19 @@ class hercMatrix:
 
     def getInFormat(this, form):
 
+        key = (this.version, this.height, this.width, form)
+        if key in this._formatCache:
+            return this._formatCache[key][1]
+
+        if (this.backend == 'csr') and \
+                ((this._csr is not None) or (this._buffer is not None)):
+            scipyMatrix = this._getCSR()
+            if form == 'csr':
+                return scipyMatrix
+            scipyMatrix = scipyMatrix.asformat(form)
+            this._cacheFormat(key, scipyMatrix)
+            return scipyMatrix
+
         scipyMatrix = None
         try:
             scipyMatrix = scipy.sparse.coo_matrix((this.elements['val'],
@@ -65,9 +744,39 @@ class hercMatrix:
             this.addElement([0, 0, 0])
             this.height = 1
             this.width = 1
-            scipyMatrix = this.getInFormat(form)
+            return this.getInFormat(form)
 
-        return scipyMatrix.asformat(form)
+        scipyMatrix = scipyMatrix.asformat(form)
+        this._cacheFormat(key, scipyMatrix)
+
+        return scipyMatrix
+
+    ## Store a conversion in the format cache
+    # 
+    # Discards entries from previous versions of the matrix, then evicts the 
+    # largest remaining entries until `matrix` fits within formatCacheLimit. 
+    # Matrices larger than formatCacheLimit are not cached at all. 
+    # 
+    # @param key the cache key, as generated by getInFormat()
+    # @param matrix scipy.sparse matrix or numpy array to store
+
+    def _cacheFormat(this, key, matrix):
+        size = _matrixSize(matrix)
+        if size > this.formatCacheLimit:
+            return
+
+        for oldKey in list(this._formatCache.keys()):
+            if oldKey[0] != this.version:
+                del this._formatCache[oldKey]
+
+        used = sum(entry[0] for entry in this._formatCache.values())
+        while used + size > this.formatCacheLimit:
+            largest = max(this._formatCache,
+                          key=lambda k: this._formatCache[k][0])
+            used = used - this._formatCache[largest][0]
+            del this._formatCache[largest]
+
+        this._formatCache[key] = (size, matrix)
 
     ## Add a new COO element 
     #
@@ -88,22 +797,160 @@ class hercMatrix:
             element = this.castElement(element)
             if (this.symmetry == 'SYM') and extrapolate:
                 if element['row'] < element['col']:
-                    # put element in the top triangle, this matrix is
+                    # put element in the lower triangle, this matrix is
                     # symmetric!
-                    temp = numpy.array(this.dtype)
-                    temp = element
-                    element['row'] = temp['col']
-                    element['col'] = temp['row']
+                    row = int(element['row'])
+                    col = int(element['col'])
+                    element = numpy.array((col, row, element['val']),
+                                          dtype=this.dtype)
 
-            if this.elements is None:
-                this.elements = numpy.array([element], dtype=this.dtype)
-            else:
-                this.elements = numpy.append(this.elements, element)
+            this._grow(this._length + 1)
+
+            if this.isRowMajor and this._length > 0:
+                last = this._buffer[this._length - 1]
+                if (element['row'], element['col']) < \
+                        (last['row'], last['col']):
+                    this.isRowMajor = False
+
+            this._buffer[this._length] = element
+            this._length = this._length + 1
             this.nzentries = this.nzentries + 1
+            this._markModified()
+
+            # an append never moves existing elements, so the index can be
+            # kept up to date rather than discarded
+            this._appendToIndex(int(element['row']), int(element['col']),
+                                this._length - 1)
         except ValueError as e:
             raise ValueError(
                 "Could not cast element to valid format... ", str(e))
 
+    ## Add many COO elements at once
+    # 
+    # Vectorized version of addElement(). Appends `len(rows)` elements, casting
+    # all of them to libHercMatrix.hercMatrix.dtype in one operation. 
+    # 
+    # @param rows array-like of ints containing the row of each element
+    # @param cols array-like of ints containing the column of each element
+    # @param vals array-like of floats containing the value of each element
+    # @param extrapolate if `True`, elements which would fall in the upper 
+    # triangle of a symmetric matrix are transposed into the lower triangle, as
+    # in addElement(). This is the default behavior. 
+    # @param duplicates if not `None`, coalesce() is called with this policy
+    # after the elements are added, so that no coordinate is stored twice. 
+    # Default is `None`, duplicates are kept. 
+    # 
+    # @exception ValueError rows, cols, and vals are not the same length, or 
+    # could not be cast to the required types, or duplicates is `error` and 
+    # a coordinate would be stored twice (in which case nothing is added)
+
+    def addElements(this, rows, cols, vals, extrapolate = True,
+                    duplicates = None):
+        rows = numpy.ravel(rows)
+        cols = numpy.ravel(cols)
+        vals = numpy.ravel(vals)
+
+        if (len(rows) != len(cols)) or (len(rows) != len(vals)):
+            raise ValueError("rows, cols, and vals must be the same length")
+
+        dtype = this.dtype
+        if (len(rows) > 0) and \
+                (max(numpy.max(rows), numpy.max(cols)) >
+                 numpy.iinfo(dtype['row']).max):
+            raise ValueError("rows or cols are too large for index type " +
+                             "{0}".format(dtype['row']))
+
+        newElements = numpy.empty(len(rows), dtype=dtype)
+        try:
+            newElements['row'] = rows
+            newElements['col'] = cols
+            newElements['val'] = vals
+        except ValueError as e:
+            raise ValueError(
+                "Could not cast elements to valid format... ", str(e))
+
+        if (this.symmetry == 'SYM') and extrapolate:
+            # move elements in the upper triangle to the lower triangle
+            upper = newElements['row'] < newElements['col']
+            upperRows = newElements['row'][upper]
+            newElements['row'][upper] = newElements['col'][upper]
+            newElements['col'][upper] = upperRows
+
+        this._grow(this._length + len(newElements))
+
+        if this.isRowMajor and len(newElements) > 0:
+            keys = this._packKeys(newElements['row'], newElements['col'])
+            if this._length > 0:
+                last = this._buffer[this._length - 1]
+                keys = numpy.concatenate(
+                    (this._packKeys([last['row']], [last['col']]), keys))
+            if not _keysSorted(keys):
+                this.isRowMajor = False
+
+        oldState = (this._length, this.nzentries, this.isRowMajor)
+
+        this._buffer[this._length:this._length + len(newElements)] = \
+            newElements
+        this._length = this._length + len(newElements)
+        this.nzentries = this.nzentries + len(newElements)
+
+        this._invalidateIndex()
+
+        if duplicates is not None:
+            try:
+                this.coalesce(duplicates)
+            except ValueError:
+                # discard the new elements again
+                (this._length, this.nzentries, this.isRowMajor) = oldState
+                this._invalidateIndex()
+                raise
+
+    ## Merge elements which share coordinates
+    # 
+    # Sorts the elements by coordinate and reduces each run of elements with
+    # the same coordinates to a single element, in one pass. Afterwards the
+    # elements are row major, and no coordinate pair is stored twice. 
+    # 
+    # | value of `policy` | value of the merged element |
+    # |-------------------|-----------------------------|
+    # | `sum`             | the sum of all of the duplicates (as scipy.sparse does) |
+    # | `first`           | the value of the duplicate stored first |
+    # | `last`            | the value of the duplicate stored last |
+    # | `error`           | ValueError is raised if there are any duplicates |
+    # 
+    # @param policy string, one of the above. Default is `sum`. 
+    # 
+    # @exception ValueError policy is not valid, or is `error` and the matrix
+    # contains duplicates (in which case it is not modified)
+
+    def coalesce(this, policy='sum'):
+
+        if policy not in _DUPLICATE_POLICIES:
+            raise ValueError("policy \"{0}\" is not valid, ".format(policy) +
+                    "expected one of: " + ", ".join(_DUPLICATE_POLICIES))
+
+        if this.elements is None:
+            return
+
+        packed = this._packKeys(this.elements['row'], this.elements['col'])
+        keys, vals = _coalesceKeys(packed, this.elements['val'], policy)
+        if keys is packed:
+            # already row major with no duplicates, so nothing is written
+            # (or copied, if the elements are shared)
+            this.isRowMajor = True
+            return
+
+        rows, cols = _unpackPairs(keys, max(this.height, this.width, 1))
+        this._ensureOwned()
+        this._buffer['row'][:len(keys)] = rows
+        this._buffer['col'][:len(keys)] = cols
+        this._buffer['val'][:len(keys)] = vals
+        this._length = len(keys)
+        this.nzentries = len(keys)
+        this.isRowMajor = True
+
+        this._invalidateIndex()
+
     ## Get a COO element from this matrix
     #
     # Returns an array in the order `[row, col, val]`. Numpy return types will
@@ -158,45 +1005,46 @@ class hercMatrix:
     # 
 
     def castElement(this, element):
+        dtype = this.dtype
 
         if type(element) == list:
             if len(element) != 3:
                 raise ValueError("element must contain three indicies ")
             try:
-                row = numpy.int32(element[0])
-            except ValueError:
+                row = dtype['row'].type(element[0])
+            except (ValueError, OverflowError):
                 raise ValueError("index 0 of list cannot be cast to int")
             try:
-                col = numpy.int32(element[1])
-            except ValueError:
+                col = dtype['col'].type(element[1])
+            except (ValueError, OverflowError):
                 raise ValueError("index 1 of list cannot be cast to int")
             try:
-                val = numpy.float64(element[2])
+                val = dtype['val'].type(element[2])
             except ValueError:
                 raise ValueError("index 2 of list cannot be cast to float")
 
-            return numpy.array((row, col, val), dtype=this.dtype)
+            return numpy.array((row, col, val), dtype=dtype)
         elif type(element) == numpy.void:
             return numpy.array(element)
         elif type(element) == numpy.ndarray:
-            if element.dtype == this.dtype:
+            if element.dtype == dtype:
                 return element
             elif len(element) != 3:
                 raise ValueError("element must contain three indicies")
             else:
                 try:
-                    row = numpy.int32(element[0])
-                except ValueError:
+                    row = dtype['row'].type(element[0])
+                except (ValueError, OverflowError):
                     raise ValueError("index 0 of list cannot be cast to int")
                 try:
-                    col = numpy.int32(element[1])
-                except ValueError:
+                    col = dtype['col'].type(element[1])
+                except (ValueError, OverflowError):
                     raise ValueError("index 1 of list cannot be cast to int")
                 try:
-                    val = numpy.float64(element[2])
+                    val = dtype['val'].type(element[2])
                 except ValueError:
                     raise ValueError("index 2 of list cannot be cast to float")
-                return numpy.array((row, col, val), dtype=this.dtype)
+                return numpy.array((row, col, val), dtype=dtype)
 
     ## Search the matrix for an element
     # 
@@ -210,33 +1058,47 @@ class hercMatrix:
     # @returns list of indicies at which the element occurs 
 
     def searchElement(this, element, rtol=1e-05, atol=1e-08):
+        return numpy.flatnonzero(
+            this._matchElement(element, rtol, atol)).tolist()
+
+    ## Find all elements matching an element
+    # 
+    # Compares every element against `element` at once, column by column. 
+    # 
+    # @param element anything supported by castElement()
+    # @param rtol passed through to numpy.isclose
+    # @param atol see above
+    # 
+    # @returns numpy.ndarray of bool, `True` at the index of each matching 
+    # element
+    # 
+    # @exception ValueError element could not be cast by castElement()
+
+    def _matchElement(this, element, rtol, atol):
         try:
             element = this.castElement(element)
         except ValueError as e:
             raise ValueError(
                 "Could not cast element to valid format... ", str(e))
 
-        instances = []
+        if this.elements is None:
+            return numpy.zeros(0, dtype=bool)
 
-        for i in range(0, nzentries):
-            if numpy.isclose(this.elements[i]['row'],
-                             element['row'],
-                             rtol, atol):
-                if numpy.isclose(this.elements[i]['col'],
-                                 element['col'],
-                                 rtol, atol):
-                    if numpy.isclose(this.elements[i]['val'],
-                                     element['val'],
-                                     rtol, atol):
-                        instances.append(i)
+        matches = numpy.isclose(this.elements['row'], element['row'],
+                                rtol, atol)
+        matches &= numpy.isclose(this.elements['col'], element['col'],
+                                 rtol, atol)
+        matches &= numpy.isclose(this.elements['val'], element['val'],
+                                 rtol, atol)
 
-        return instances
+        return matches
 
     ## Remove an element from the matrix
     #
     # Removes either the nth element of the matrix, or the element matching
     # n (if n can be cast by castElement()). If n is not an int, ALL elements 
     # matching it are removed (this is why rtol and atol are zero by default).
+    # All matches are removed in a single pass over the elements. 
     # 
     # @param n int or any supported by castElement()
     # @param rtol passed through to [numpy.isclose](http://docs.scipy.org/doc/numpy-dev/reference/generated/numpy.isclose.html)
@@ -248,17 +1110,157 @@ class hercMatrix:
 
         try:
             n = int(n)
-            this.elements = numpy.delete(this.elements, n)
-            this.nzentries = this.nzentries - 1
-        except ValueError:
+        except (ValueError, TypeError):
             try:
-                n = this.castElement(n)
-                instances = this.searchElement(n, rtol, atol)
-                for i in instances:
-                    this.removeElement(i)
+                matches = this._matchElement(n, rtol, atol)
             except ValueError as e:
                 raise ValueError("could not cast n to any valid format... ",
                                  str(e))
+            this._compact(~matches)
+            return
+
+        keep = numpy.ones(this._length, dtype=bool)
+        keep[n] = False
+        this._compact(keep)
+
+    ## Discard elements in place 
+    # 
+    # Keeps only the elements for which `keep` is `True`, shifting them down 
+    # to the start of the element buffer in their original order. This never
+    # changes whether the elements are row major. 
+    # 
+    # @param keep numpy.ndarray of bool, one entry per element
+
+    def _compact(this, keep):
+        if this.elements is None:
+            return
+
+        elements = this.elements
+        if this._isShared():
+            # write the kept elements straight into a new buffer, rather than
+            # copying the buffer and then compacting it
+            buffer = this._allocate(int(numpy.count_nonzero(keep)))
+        else:
+            buffer = this._buffer
+
+        # a block at a time, so that out of core only the block being moved
+        # is paged in. Elements only ever move down, so this is safe in place
+        length = 0
+        for start in range(0, this._length, _BLOCK_SIZE):
+            kept = elements[start:start + _BLOCK_SIZE][
+                keep[start:start + _BLOCK_SIZE]]
+            buffer[length:length + len(kept)] = kept
+            length = length + len(kept)
+
+        this._buffer = buffer
+        this._shared = False
+        this.nzentries = this.nzentries - (this._length - length)
+        this._length = length
+        this._invalidateIndex()
+
+    ## Find the elements storing coordinates
+    # 
+    # Looks up coordinates in the coordinate index, see _getIndex(). Out of 
+    # core (see setScratchDirectory()) the index is not built. Instead, row 
+    # major elements are binary searched, and otherwise the elements are 
+    # scanned a block at a time. 
+    # 
+    # @param rows numpy.ndarray of int64 rows
+    # @param cols numpy.ndarray of int64 columns, the same length as rows
+    # 
+    # @returns numpy.ndarray of int64, the index of the first element storing
+    # each coordinate pair, or -1 where there is none
+
+    def _findSlots(this, rows, cols):
+        if not this._isMapped():
+            stride, keys, slots, appended = this._getIndex()
+            found = _searchIndex(keys, slots, _packPairs(rows, cols, stride))
+            missing = numpy.flatnonzero(found < 0)
+            if appended and (len(missing) > 0):
+                pairs = numpy.array(list(appended), dtype=numpy.int64)
+                appendedKeys, appendedSlots = _sortIndex(
+                    _packPairs(pairs[:, 0], pairs[:, 1], stride),
+                    numpy.fromiter(appended.values(), dtype=numpy.int64,
+                                   count=len(appended)))
+                found[missing] = _searchIndex(
+                    appendedKeys, appendedSlots, 
+                    _packPairs(rows[missing], cols[missing], stride))
+            return found
+
+        slots = numpy.full(len(rows), -1, dtype=numpy.int64)
+        if (this.elements is None) or (len(rows) == 0):
+            return slots
+
+        elements = this.elements
+        stride = max(this.height, this.width, 1)
+
+        if this.isRowMajor:
+            # python ints, which can not overflow, see _bisectElements()
+            for i, (row, col) in enumerate(zip(rows.tolist(), cols.tolist())):
+                key = row * stride + col
+                slot = _bisectElements(elements, key, stride)
+                if (slot < this._length) and \
+                        (int(elements['row'][slot]) * stride +
+                         int(elements['col'][slot]) == key):
+                    slots[i] = slot
+            return slots
+
+        keys = this._packKeys(rows, cols)
+        uniqueKeys, inverse = numpy.unique(keys, return_inverse=True)
+        uniqueSlots = numpy.full(len(uniqueKeys), -1, dtype=numpy.int64)
+        for start in range(0, this._length, _BLOCK_SIZE):
+            block = elements[start:start + _BLOCK_SIZE]
+            blockKeys = this._packKeys(block['row'], block['col'])
+            position = numpy.searchsorted(uniqueKeys, blockKeys)
+            position[position == len(uniqueKeys)] = 0
+            found = numpy.flatnonzero(uniqueKeys[position] == blockKeys)
+            position = position[found]
+            new = uniqueSlots[position] < 0
+            # assigned in reverse, so the first element storing a key wins
+            uniqueSlots[position[new][::-1]] = (found[new] + start)[::-1]
+
+        return uniqueSlots[inverse.ravel()]
+
+    ## Find the element storing a coordinate pair
+    # 
+    # @param row int row
+    # @param col int column
+    # 
+    # @returns int index of the first element storing `row`, `col`, or `None`
+    # if there is none. See _findSlots(). 
+
+    def _findSlot(this, row, col):
+        if this._isMapped():
+            slot = this._findSlots(numpy.array([row], dtype=numpy.int64),
+                                   numpy.array([col], dtype=numpy.int64))[0]
+        else:
+            slot = _lookupIndex(this._getIndex(), int(row), int(col))
+        if slot < 0:
+            return None
+        return int(slot)
+
+    ## Select the elements matching a condition
+    # 
+    # Evaluates `condition` over the elements a block at a time, keeping only
+    # the matching elements of each block. 
+    # 
+    # @param condition function taking a slice of elements and returning a 
+    # numpy.ndarray of bool
+    # 
+    # @returns numpy.ndarray of dtype, a copy of the matching elements in 
+    # order
+
+    def _selectElements(this, condition):
+        if this.elements is None:
+            return numpy.zeros(0, dtype=this.dtype)
+
+        elements = this.elements
+        selected = [numpy.zeros(0, dtype=elements.dtype)]
+        for start in range(0, len(elements), _BLOCK_SIZE):
+            block = elements[start:start + _BLOCK_SIZE]
+            selected.append(block[condition(block)])
+
+        return numpy.concatenate(selected)
 
 
     ## returns the value of an element by coordinates
@@ -295,14 +1297,54 @@ class hercMatrix:
         if col < 0:
             raise IndexError("col out of bounds")
 
-        for i in range(0, this.nzentries):
-            if numpy.isclose(this.elements[i]['row'],
-                             row):
-                if numpy.isclose(this.elements[i]['col'],
-                                 col):
-                    return this.elements[i]['val']
+        index = this._findSlot(row, col)
+        if index is None:
+            return 0
+
+        return this.elements['val'][index]
+
+    ## returns the values of many elements by coordinates
+    # 
+    # Batched version of getValue(). Looks up every `(rows[i], cols[i])` pair
+    # using the coordinate index, and gathers all values at once. 
+    # 
+    # @param rows array-like of ints indicating the row of each element
+    # @param cols array-like of ints indicating the column of each element, 
+    # must be the same length as rows
+    # @param extrapolate as in getValue()
+    # 
+    # @returns numpy.ndarray of valueType such that index i contains the value
+    # at `rows[i]`, `cols[i]`
+    # 
+    # @exception IndexError one or more coordinates are out of bounds
+    # @exception ValueError rows and cols are of different lengths
 
-        return 0
+    def getValues(this, rows, cols, extrapolate = True):
+        rows = numpy.asarray(rows, dtype=numpy.int64).ravel()
+        cols = numpy.asarray(cols, dtype=numpy.int64).ravel()
+
+        if len(rows) != len(cols):
+            raise ValueError("rows and cols must be the same length")
+
+        if (this.symmetry == 'SYM') and extrapolate:
+            # extrapolate for values in upper triangle
+            rows, cols = numpy.maximum(rows, cols), numpy.minimum(rows, cols)
+
+        if numpy.any((rows < 0) | (rows >= this.height)):
+            raise IndexError("row out of bounds")
+        if numpy.any((cols < 0) | (cols >= this.width)):
+            raise IndexError("col out of bounds")
+
+        values = numpy.zeros(len(rows), dtype=this.valueType)
+        if (this._buffer is None) and (this._csr is None):
+            return values
+
+        slots = this._findSlots(rows, cols)
+
+        found = slots >= 0
+        values[found] = this.elements['val'][slots[found]]
+
+        return values
 
     ## Change the value by coordinates
     # 
@@ -324,8 +1366,11 @@ class hercMatrix:
 
         if (this.symmetry == 'SYM') and extrapolate:
             if newRow < newCol:
-                this.setValue(newCol, newRow, newVal)
-                return
+                # symmetric matrices are stored by their lower triangle
+                tempRow = newRow
+                tempCol = newCol
+                newRow = tempCol
+                newCol = tempRow
 
         if newRow >= this.height:
             raise IndexError("newRow out of bounds")
@@ -336,39 +1381,319 @@ class hercMatrix:
         if newCol < 0:
             raise IndexError("newCol out of bounds")
 
-        if this.symmetry == 'SYM':
-            if newRow > newCol:
-                # put value in the correct triangle
-                tempRow = newRow
-                tempCol = newCol
-                newRow = tempCol
-                newCol = tempRow
-
-        if this.getValue(newRow, newCol) != 0:
-            for i in range(0, this.nzentries):
-                if this.elements['row'][i] == newRow:
-                    if this.elements['col'][i] == newCol:
-                        this.elements['val'][i] = newVal
-                        if newVal == 0:
-                            this.removeZeros()
-                        return
+        index = this._findSlot(newRow, newCol)
+        if index is not None:
+            if newVal == 0:
+                this.removeElement(index)
+            else:
+                this._ensureOwned(numpy.array([index]))
+                this._buffer['val'][index] = newVal
+                this._markModified()
+            return
 
         # value does not exist yet, lets create it
-        newEntry = numpy.array((newRow, newCol, newVal), dtype=this.dtype)
-        this.addElement(newEntry)
-        this.nzentries = len(this.elements['val'])
-        if newVal == 0:
-            this.removeZeros()
+        if newVal != 0:
+            this.addElement([newRow, newCol, newVal], extrapolate=False)
+
+    ## Change many values by coordinates
+    # 
+    # Batched version of setValue(). All writes are merged into the matrix in
+    # one pass: coordinates which already have an element are overwritten, 
+    # new coordinates are appended, and writing zero removes the element at
+    # that coordinate (zeros are never stored). If a coordinate appears more
+    # than once in the batch, the last write wins, as if setValue() had been
+    # called for each in order. 
+    # 
+    # @param rows array-like of ints indicating the row of each value
+    # @param cols array-like of ints indicating the column of each value
+    # @param vals array-like of floats, or a single float to write to every 
+    # coordinate
+    # @param extrapolate if `True` and the matrix is symmetric, coordinates in
+    # the upper triangle are switched into the lower triangle, as in 
+    # setValue(). This is the default behavior. 
+    # 
+    # @exception IndexError one or more coordinates are out of bounds
+    # @exception ValueError rows, cols, and vals are of different lengths
+
+    def setValues(this, rows, cols, vals, extrapolate = True):
+        rows = numpy.asarray(rows, dtype=numpy.int64).ravel()
+        cols = numpy.asarray(cols, dtype=numpy.int64).ravel()
+        vals = numpy.asarray(vals, dtype=numpy.float64).ravel()
+        if len(vals) == 1:
+            vals = numpy.repeat(vals, len(rows))
+
+        if (len(rows) != len(cols)) or (len(rows) != len(vals)):
+            raise ValueError("rows, cols, and vals must be the same length")
+
+        if (this.symmetry == 'SYM') and extrapolate:
+            # symmetric matrices are stored by their lower triangle
+            rows, cols = numpy.maximum(rows, cols), numpy.minimum(rows, cols)
+
+        if numpy.any((rows < 0) | (rows >= this.height)):
+            raise IndexError("row out of bounds")
+        if numpy.any((cols < 0) | (cols >= this.width)):
+            raise IndexError("col out of bounds")
+
+        if len(rows) == 0:
+            return
+
+        # keep only the last write to each coordinate, sorted by key
+        reversedKeys = this._packKeys(rows, cols)[::-1]
+        keys, lastWrite = numpy.unique(reversedKeys, return_index=True)
+        lastWrite = len(rows) - 1 - lastWrite
+        vals = vals[lastWrite]
+
+        # find the elements storing any of the keys, a block at a time
+        matched = [numpy.zeros(0, dtype=numpy.int64)]
+        matchedKeys = [numpy.zeros(0, dtype=numpy.int64)]
+        positions = [numpy.zeros(0, dtype=numpy.int64)]
+        if this.elements is not None:
+            elements = this.elements
+            for start in range(0, this._length, _BLOCK_SIZE):
+                block = elements[start:start + _BLOCK_SIZE]
+                blockKeys = this._packKeys(block['row'], block['col'])
+                position = numpy.searchsorted(keys, blockKeys)
+                position[position == len(keys)] = 0
+                existing = numpy.flatnonzero(keys[position] == blockKeys)
+                matched.append(existing + start)
+                matchedKeys.append(blockKeys[existing])
+                positions.append(position[existing])
+        matched = numpy.concatenate(matched)
+        matchedKeys = numpy.concatenate(matchedKeys)
+        positions = numpy.concatenate(positions)
+
+        if len(matched) > 0:
+            newVals = vals[positions]
+
+            # only the first element storing a coordinate is overwritten, any
+            # duplicates of it are removed
+            order = numpy.argsort(matchedKeys, kind='stable')
+            sortedKeys = matchedKeys[order]
+            duplicate = numpy.zeros(len(matched), dtype=bool)
+            duplicate[order[1:]] = sortedKeys[1:] == sortedKeys[:-1]
+
+            this._ensureOwned(matched)
+            this._buffer['val'][matched] = newVals
+            this._markModified()
+
+            keep = numpy.ones(this._length, dtype=bool)
+            keep[matched[duplicate | (newVals == 0)]] = False
+            if not numpy.all(keep):
+                this._compact(keep)
+
+            new = ~numpy.isin(keys, matchedKeys)
+        else:
+            new = numpy.ones(len(keys), dtype=bool)
+
+        new &= vals != 0
+        if numpy.any(new):
+            this.addElements(rows[lastWrite[new]], cols[lastWrite[new]],
+                             vals[new], extrapolate=False)
+
+    ## Get the nonzero values in a row
+    # 
+    # Slices the row out of the CSR representation of the matrix, so this 
+    # costs O(nnz in the row) once the CSR representation exists. Out of core
+    # (see setScratchDirectory()) the row is found by a binary search if the 
+    # matrix is row major, or by scanning the elements a block at a time. 
+    # 
+    # @param row int the row to get 
+    # @param extrapolate if `True` and the matrix is symmetric, the row is 
+    # returned as it appears in the full matrix, including values only stored
+    # in the lower triangle as part of column `row`. This is the default 
+    # behavior. If `False`, only the values actually stored in the row are 
+    # returned. 
+    # 
+    # @returns tuple of numpy.ndarray `(cols, vals)`, sorted by column 
+    # 
+    # @exception IndexError row is out of bounds
+
+    def getRow(this, row, extrapolate = True):
+        if (row < 0) or (row >= this.height):
+            raise IndexError("row out of bounds")
+
+        if (this._buffer is None) and (this._csr is None):
+            return _emptySlice(this.valueType)
+
+        if this._isMapped():
+            symmetric = (this.symmetry == 'SYM') and extrapolate
+            if this.isRowMajor and not symmetric and \
+                    (this.elements is not None):
+                stride = max(this.height, this.width, 1)
+                start = _bisectElements(this.elements, row * stride, stride)
+                end = _bisectElements(this.elements, (row + 1) * stride,
+                                      stride)
+                selected = this.elements[start:end]
+            else:
+                selected = this._selectElements(
+                    lambda block: (block['row'] == row) | (symmetric &
+                        (block['col'] == row) & (block['row'] > row)))
+            cols = numpy.where(selected['row'] == row, selected['col'],
+                               selected['row']).astype(numpy.int64)
+            return _dropZeros(*_coalesceKeys(cols, selected['val'], 'sum'))
+
+        csr = this._getCSR()
+        cols, vals = _sliceCompressed(csr, row)
+
+        if (this.symmetry == 'SYM') and extrapolate:
+            # values right of the diagonal are stored below it, in column row
+            rows, colVals = _sliceCompressed(this.getInFormat('csc'), row)
+            below = rows > row
+            cols = numpy.concatenate((cols, rows[below]))
+            vals = numpy.concatenate((vals, colVals[below]))
+            order = numpy.argsort(cols, kind='stable')
+            cols = cols[order]
+            vals = vals[order]
+
+        return _dropZeros(cols, vals)
+
+    ## Get the nonzero values in a column
+    # 
+    # Slices the column out of the CSC representation of the matrix, or out 
+    # of core, scans the elements a block at a time. See getRow(). 
+    # 
+    # @param col int the column to get
+    # @param extrapolate as in getRow()
+    # 
+    # @returns tuple of numpy.ndarray `(rows, vals)`, sorted by row
+    # 
+    # @exception IndexError col is out of bounds
+
+    def getCol(this, col, extrapolate = True):
+        if (col < 0) or (col >= this.width):
+            raise IndexError("col out of bounds")
+
+        if (this._buffer is None) and (this._csr is None):
+            return _emptySlice(this.valueType)
+
+        if (this.symmetry == 'SYM') and extrapolate:
+            # a column of a symmetric matrix is the same as the row
+            return this.getRow(col)
+
+        if this._isMapped():
+            selected = this._selectElements(
+                lambda block: block['col'] == col)
+            return _dropZeros(*_coalesceKeys(
+                selected['row'].astype(numpy.int64), selected['val'], 'sum'))
+
+        return _dropZeros(*_sliceCompressed(this.getInFormat('csc'), col))
+
+    ## Get a rectangular block of the matrix
+    # 
+    # Slices the block bounded by `row1`, `col1` and `row2`, `col2` 
+    # (inclusive) out of the CSR representation of the matrix, or out of 
+    # core, out of the elements a block at a time. 
+    # 
+    # @param row1 int the first row of the block
+    # @param row2 int the last row of the block
+    # @param col1 int the first column of the block
+    # @param col2 int the last column of the block
+    # @param extrapolate if `True` and the matrix is symmetric, the block is 
+    # taken from the full matrix, including the upper triangle. This is the
+    # default behavior. 
+    # 
+    # @returns new asymmetric libHercMatrix.hercMatrix instance, with 
+    # `row2 - row1 + 1` rows and `col2 - col1 + 1` columns, such that element
+    # (0, 0) is element (row1, col1) of this matrix
+    # 
+    # @exception IndexError one or more bounds are out of bounds
+    # @exception ValueError `row1` > `row2` or `col1` > `col2`
+
+    def getBlock(this, row1, row2, col1, col2, extrapolate = True):
+        if (row1 < 0) or (row2 >= this.height):
+            raise IndexError("row out of bounds")
+        if (col1 < 0) or (col2 >= this.width):
+            raise IndexError("col out of bounds")
+        if row1 > row2:
+            raise ValueError("row1 larger than row2")
+        if col1 > col2:
+            raise ValueError("col1 larger than col2")
+
+        shape = (row2 - row1 + 1, col2 - col1 + 1)
+        if this._isMapped():
+            symmetric = (this.symmetry == 'SYM') and extrapolate
+            selected = this._selectElements(
+                lambda block: (block['row'] >= row1) & 
+                    (block['row'] <= row2) & (block['col'] >= col1) & 
+                    (block['col'] <= col2))
+            rows = selected['row'].astype(numpy.int64) - row1
+            cols = selected['col'].astype(numpy.int64) - col1
+            vals = selected['val']
+            if symmetric:
+                # the part of the block right of the diagonal is stored, 
+                # transposed, below it
+                upper = this._selectElements(
+                    lambda block: (block['col'] >= row1) & 
+                        (block['col'] <= row2) & (block['row'] >= col1) & 
+                        (block['row'] <= col2) & 
+                        (block['row'] > block['col']))
+                rows = numpy.concatenate(
+                    (rows, upper['col'].astype(numpy.int64) - row1))
+                cols = numpy.concatenate(
+                    (cols, upper['row'].astype(numpy.int64) - col1))
+                vals = numpy.concatenate((vals, upper['val']))
+            block = scipy.sparse.coo_matrix((vals, (rows, cols)), 
+                                            shape=shape)
+            block.sum_duplicates()
+        else:
+            block = this._getBlockCSR(row1, row2, col1, col2, extrapolate)
+
+        BLOCK = hercMatrix(this.backend, this.indexType, this.valueType)
+        BLOCK.height = shape[0]
+        BLOCK.width = shape[1]
+        BLOCK.replaceContents(block)
+        BLOCK.removeZeros()
+
+        return BLOCK
+
+    ## Slice a block out of the CSR representation, see getBlock() 
+    # 
+    # @returns scipy.sparse.coo_matrix containing the block
+
+    def _getBlockCSR(this, row1, row2, col1, col2, extrapolate):
+        if (this._buffer is None) and (this._csr is None):
+            return scipy.sparse.coo_matrix((row2 - row1 + 1, col2 - col1 + 1),
+                                           dtype=this.valueType)
+
+        csr = this._getCSR()
+        block = csr[row1:row2 + 1, col1:col2 + 1].tocoo()
+
+        if (this.symmetry == 'SYM') and extrapolate:
+            # the part of the block right of the diagonal is stored, 
+            # transposed, below it
+            upper = csr[col1:col2 + 1, row1:row2 + 1].transpose().tocoo()
+            right = (upper.row + row1) < (upper.col + col1)
+            block = scipy.sparse.coo_matrix(
+                (numpy.concatenate((block.data, upper.data[right])),
+                 (numpy.concatenate((block.row, upper.row[right])),
+                  numpy.concatenate((block.col, upper.col[right])))),
+                shape=block.shape)
+
+        return block
 
     ## Remove all zero elements from the matrix
     #
     # This does not affect the actual contents of the matrix, only it's 
     # representation in COO format. Removes any COO elements where val is
     # exactly zero. 
+    # 
+    # **NOTE**: this goes through CSR, so duplicate elements are summed and
+    # the elements are left row major. Out of core (see 
+    # setScratchDirectory()) only the zero elements are removed, a block at a
+    # time, and the other elements are left as they are. 
 
     def removeZeros(this):
 
-        matrix = this.getInFormat('csr')
+        if this._isMapped() and (this.elements is not None):
+            elements = this.elements
+            keep = numpy.concatenate([numpy.zeros(0, dtype=bool)] + 
+                [elements['val'][start:start + _BLOCK_SIZE] != 0 
+                 for start in range(0, this._length, _BLOCK_SIZE)])
+            this._compact(keep)
+            return
+
+        # copy, as the cached conversion must not be modified
+        matrix = this.getInFormat('csr').copy()
         matrix.eliminate_zeros()
         this.replaceContents(matrix)
         this.nzentries = len(this.elements['val'])
@@ -376,11 +1701,34 @@ class hercMatrix:
     ## replace matrix contents with a scipy sparse matrix
     #
     # Overwrites this matrix with the contents of a scipy.sparse.XXX_matrix 
-    # instance, or something that can be cast to one. 
+    # instance, or something that can be cast to one. With the `csr` backend,
+    # a CSR matrix is used as the new primary representation as-is. 
     # 
     # @param newContents anything which can be cast by scipy.sparse.coo_matrix
+    # @param duplicates if not `None`, elements of newContents which share 
+    # coordinates are merged according to this policy, see coalesce(). Default
+    # is `None`, duplicates are kept (note that the `csr` backend always sums
+    # any remaining duplicates). 
+    # 
+    # @exception ValueError duplicates is not valid, or is `error` and 
+    # newContents contains duplicates 
+
+    def replaceContents(this, newContents, duplicates=None):
+        if duplicates is not None:
+            newContents = _coalesceMatrix(newContents, duplicates)
+
+        if this.backend == 'csr':
+            try:
+                this._setCSR(scipy.sparse.csr_matrix(newContents))
+            except (ValueError, TypeError):
+                raise TypeError("Could not replace contents of matrix with " + 
+                   "object of type {0}".format(type(newContents)))
+            return
+
+        # CSR matrices with sorted indices convert to row major COO 
+        rowMajor = (getattr(newContents, 'format', None) == 'csr') and \
+            newContents.has_sorted_indices
 
-    def replaceContents(this, newContents):
         try:
             newContents = scipy.sparse.coo_matrix(newContents)
         except ValueError:
@@ -390,23 +1738,20 @@ class hercMatrix:
                 raise TypeError("Could not replace contents of matrix with " + 
                    "object of type {0}".format(type(newContents)))
 
-        try:
-            this.elements.resize(len(newContents.data))
-        except AttributeError:
-            # elements is None because it has not been initialized 
-            this.elements = numpy.array([[],[],[]],dtype=this.dtype)
-            this.elements.resize(len(newContents.data))
-
-        this.elements['row'] = newContents.row.astype(numpy.int32)
-        this.elements['col'] = newContents.col.astype(numpy.int32)
-        this.elements['val'] = newContents.data.astype(numpy.float64)
+        newElements = this._allocate(len(newContents.data))
+        newElements['row'] = newContents.row
+        newElements['col'] = newContents.col
+        newElements['val'] = newContents.data
+        this.elements = newElements
         this.nzentries = len(this.elements['val'])
+        this.isRowMajor = this.isRowMajor or rowMajor
 
     ## check if there are elements in the lower triangle
     #
     # Checks if there are any elements stored in the lower triangle of the 
     # matrix. Kept for compatibility, as symmetric matrices are now stored
-    # by their lower triangle. 
+    # by their lower triangle. Does not modify the matrix, and stops at the
+    # first block of elements containing a lower triangle element. 
     # 
     # @returns True if there are no nonzero elements in the lower triangle
     # @returns False if there are nonzero elements in the lower triangle
@@ -416,24 +1761,15 @@ class hercMatrix:
 
     def checkLowerTriangle(this):
 
-        this.removeZeros()
-        this.makeRowMajor()
-
-        for i in range(0, this.nzentries):
-            element = this.getElement(i)
-            row = element[0]
-            col = element[1]
-            val = element[2]
-            if row > col:
-                if val != 0:
-                    return False
-
-        return True
+        return not this._anyElement(
+            lambda block: (block['row'] > block['col']) & (block['val'] != 0))
 
     ## check if there are elements in the upper triangle
     #
     # Checks if there are any elements stored in the upper triangle of the 
     # matrix. Useful for verifying symmetric matrices are stored correctly. 
+    # Does not modify the matrix, and stops at the first block of elements 
+    # containing an upper triangle element. 
     # 
     # @returns True if there are no nonzero elements in the upper triangle
     # @returns False if there are nonzero elements in the upper triangle
@@ -443,19 +1779,29 @@ class hercMatrix:
 
     def checkUpperTriangle(this):
 
-        this.removeZeros()
-        this.makeRowMajor()
+        return not this._anyElement(
+            lambda block: (block['row'] < block['col']) & (block['val'] != 0))
 
-        for i in range(0, this.nzentries):
-            element = this.getElement(i)
-            row = element[0]
-            col = element[1]
-            val = element[2]
-            if row < col:
-                if val != 0:
-                    return False
+    ## Check if any element matches a condition 
+    # 
+    # Evaluates `condition` over the elements `_BLOCK_SIZE` at a time, 
+    # returning as soon as a block contains a match. 
+    # 
+    # @param condition function taking a slice of elements and returning a 
+    # numpy.ndarray of bool
+    # 
+    # @returns True if `condition` is `True` for any element
 
-        return True
+    def _anyElement(this, condition):
+        if this.elements is None:
+            return False
+
+        elements = this.elements
+        for start in range(0, len(elements), _BLOCK_SIZE):
+            if numpy.any(condition(elements[start:start + _BLOCK_SIZE])):
+                return True
+
+        return False
 
 
     ## checks if the matrix is symmetric
@@ -469,6 +1815,16 @@ class hercMatrix:
     # in the upper triangle is not equal. In other words, the matrix is equal
     # to itself transposed
     # 
+    # The second condition is tested by sorting the coordinates of the 
+    # off-diagonal elements of the matrix transposed, and comparing them and 
+    # their values against those of the matrix block by block. Duplicate 
+    # elements are summed and zeros ignored first, as in removeZeros(), but 
+    # the matrix itself is not modified. 
+    # 
+    # @param rtol passed through to numpy.isclose when comparing values, by 
+    # default values must be exactly equal
+    # @param atol see above
+    # 
     # @returns True if either of the above conditions are met
     # @returns False otherwise
     # 
@@ -477,23 +1833,51 @@ class hercMatrix:
     # matrix is correctly stored symmetrically, you should use 
     # checkLowerTriangle()
 
-    def checkSymmetry(this):
-
-        this.removeZeros()
-        this.makeRowMajor()
+    def checkSymmetry(this, rtol=0, atol=0):
 
         if this.checkUpperTriangle():
             if this.symmetry == 'SYM':
                 return True
 
-        for i in range(0, this.nzentries):
-            element = this.getElement(i)
-            row = element[0]
-            col = element[1]
-            val = element[2]
-            if row > col:
-                if val != this.getValue(col, row):
-                    return False
+        if this.height != this.width:
+            return False
+
+        if this.elements is None:
+            return True
+
+        # CSR in canonical format has duplicates summed, and is sorted row 
+        # major
+        matrix = this.getInFormat('csr')
+        if not matrix.has_canonical_format:
+            matrix = matrix.copy()
+            matrix.sum_duplicates()
+
+        rows = numpy.repeat(numpy.arange(this.height, dtype=numpy.int64),
+                            numpy.diff(matrix.indptr))
+        cols = matrix.indices.astype(numpy.int64)
+        vals = matrix.data
+
+        offDiagonal = (rows != cols) & (vals != 0)
+        rows = rows[offDiagonal]
+        cols = cols[offDiagonal]
+        vals = vals[offDiagonal]
+
+        # cheap rejection before sorting anything 
+        if numpy.count_nonzero(rows > cols) != numpy.count_nonzero(rows < cols):
+            return False
+
+        keys = this._packKeys(rows, cols)
+        transposedKeys = this._packKeys(cols, rows)
+        transposedOrder = numpy.argsort(transposedKeys, kind='stable')
+
+        for start in range(0, len(keys), _BLOCK_SIZE):
+            block = slice(start, start + _BLOCK_SIZE)
+            order = transposedOrder[block]
+            if not numpy.array_equal(keys[block], transposedKeys[order]):
+                return False
+            if not numpy.all(numpy.isclose(vals[block], vals[order],
+                                           rtol, atol)):
+                return False
 
         return True
 
@@ -509,8 +1893,8 @@ class hercMatrix:
     # | `add`           | The upper half of the triangle is transposed, and the result is added to the lower triangle |
     # | `smart`         | Elements of the upper triangle whose counterpart in the lower triangle is zero are moved to the lower triangle |
     # 
-    # **NOTE**: the `smart` method is very performance naive, and is not very
-    # fast. In most cases, it will not be useful and should probably be avoided
+    # **NOTE**: the `smart` method matches the two triangles by sorting packed
+    # coordinate keys, and is O(nnz log nnz). 
     # 
     # **NOTE**: the diagonal is never modified by any method
     # 
@@ -523,7 +1907,7 @@ class hercMatrix:
             this.replaceContents(lowerTriangle)
 
         elif method == 'add':
-            upperTriangle = scipy.sparse.triu(this.getInFormat('coo'), k=-1)
+            upperTriangle = scipy.sparse.triu(this.getInFormat('coo'), k=1)
 
             this.makeSymmetrical(method='truncate')
 
@@ -535,28 +1919,26 @@ class hercMatrix:
             this.replaceContents(newMatrix)
 
         elif method == 'smart':
-            # this is horrifyingly slow O(n) = n^2 (n=nzentries)
-
             this.removeZeros()
-            upperTriangle = scipy.sparse.triu(this.getInFormat('coo'))
-            lowerTriangle = scipy.sparse.tril(this.getInFormat('coo'), k=-1)
-
-            # remove conflicting entries
-            for row, col in zip(upperTriangle.row, upperTriangle.col):
-                lcounter = 0  # counter in lower triangle
-                for lrow, lcol in zip(lowerTriangle.row, lowerTriangle.col):
-                    # lrow and lcol refer to the lower column and lower row
-                    # of the lower triangle coo matrix
-                    if lcol == row:
-                        if lrow == col:
-                            lowerTriangle.data[lcounter] = 0
-                    lcounter = lcounter + 1
-            newMatrix = upperTriangle + lowerTriangle
+            rows, cols, vals = this._getTriplets()
+
+            lower = rows > cols
+            upper = rows < cols
+
+            # upper triangle elements are kept, transposed, only where the
+            # lower triangle has no element of its own
+            moved = upper.copy()
+            moved[upper] = ~numpy.isin(this._packKeys(cols[upper], rows[upper]),
+                                       this._packKeys(rows[lower], cols[lower]))
+
+            kept = ~upper
+            newMatrix = scipy.sparse.coo_matrix(
+                (numpy.concatenate((vals[kept], vals[moved])),
+                 (numpy.concatenate((rows[kept], cols[moved])),
+                  numpy.concatenate((cols[kept], rows[moved])))),
+                shape=(this.height, this.width))
 
             this.replaceContents(newMatrix)
-            this.transpose() # this method still operates on the upper triangle
-            this.makeSymmetrical('add')
-            this.removeZeros()
 
         else:
             raise ValueError("method \"{0}\" is not valid, ".format(method) +
@@ -574,10 +1956,9 @@ class hercMatrix:
     # |-------------------|--------|
     # | `truncate`        | The upper triangle is replaced with the lower triangle transposed |
     # | `add`             | The lower triangle is transposed and added to the upper triangle |
-    # | `smart`           | Moves any elements in the lower triangle whose counterpart in the upper triangle is zero to the lower triangle |
+    # | `smart`           | Elements of the lower triangle whose counterpart in the upper triangle is zero are copied, transposed, to the upper triangle |
     # 
-    # **NOTE**: as with makeSymmetrical(), `smart` is very slow, and probably
-    # not very useful. 
+    # **NOTE**: as with makeSymmetrical(), `smart` is O(nnz log nnz). 
     # 
     # **NOTE**: the diagonal is never modified by any method
     # 
@@ -603,21 +1984,26 @@ class hercMatrix:
             this.replaceContents(newMatrix)
 
         elif method == 'smart':
-            upperTriangle = scipy.sparse.triu(this.getInFormat('coo'), k=1)
-            uppertriangle = upperTriangle.transpose()
-            lowerTriangle = scipy.sparse.tril(this.getInFormat('coo'), k=-1)
-            for i in range(0, upperTriangle.nnz):
-                for j in range(0, lowerTriangle.nnz):
-                    # remember upperTriangle has already been transposed
-                    if upperTriangle.row[i] == lowerTriangle.row[j]:
-                        if upperTriangle.col[i] == lowerTriangle.col[j]:
-                            if lowerTriangle.data[j] != 0:
-                                upperTriangle.data[i] = 0
-
-            # lower triangle is not modified, just use the one that is live
-            newMatrix = this.getInFormat('coo') + upperTriangle
+            this.removeZeros()
+            rows, cols, vals = this._getTriplets()
+
+            lower = rows > cols
+            upper = rows < cols
+
+            # lower triangle elements are mirrored into the upper triangle 
+            # only where the upper triangle has no element of its own
+            mirrored = lower.copy()
+            mirrored[lower] = ~numpy.isin(
+                this._packKeys(cols[lower], rows[lower]),
+                this._packKeys(rows[upper], cols[upper]))
+
+            newMatrix = scipy.sparse.coo_matrix(
+                (numpy.concatenate((vals, vals[mirrored])),
+                 (numpy.concatenate((rows, cols[mirrored])),
+                  numpy.concatenate((cols, rows[mirrored])))),
+                shape=(this.height, this.width))
+
             this.replaceContents(newMatrix)
-            this.transpose() # smart still works on the upper triangle 
 
         else:
             raise ValueError("method \"{0}\" is not valid, ".format(method) +
@@ -626,10 +2012,45 @@ class hercMatrix:
         this.removeZeros()
         this.makeRowMajor()
 
+    ## Get the COO vectors of this matrix
+    # 
+    # @returns tuple of numpy.ndarray `(rows, cols, vals)`, with rows and cols 
+    # as int64. These are copies, and may be modified freely. 
+
+    def _getTriplets(this):
+        if this.elements is None:
+            return (numpy.zeros(0, dtype=numpy.int64),
+                    numpy.zeros(0, dtype=numpy.int64),
+                    numpy.zeros(0, dtype=this.valueType))
+
+        return (this.elements['row'].astype(numpy.int64),
+                this.elements['col'].astype(numpy.int64),
+                this.elements['val'].copy())
+
+    ## Pack coordinate pairs into single integer keys
+    # 
+    # Keys are `row * stride + col`, where stride is the larger dimension of 
+    # the matrix, so each coordinate pair (or its transpose) has a unique key 
+    # and keys sort in row-major order. See _packPairs(), for matrices too 
+    # large for such keys to fit in an int64. 
+    # 
+    # @param rows array-like of ints 
+    # @param cols array-like of ints, the same length as rows
+    # 
+    # @returns numpy.ndarray of keys
+
+    def _packKeys(this, rows, cols):
+        return _packPairs(rows, cols, max(this.height, this.width, 1))
+
     ## Make the matrix row major
     # 
     # Modifies the COO matrix data such that it is sorted as row major. This
     # does not affect matrix contents in any way. 
+    # 
+    # Elements are sorted by a packed `row * stride + col` key (see 
+    # _packKeys()) with a stable argsort, then gathered in one pass. If 
+    # isRowMajor is already `True` this returns immediately, and if the keys
+    # turn out to already be sorted no elements are moved. 
 
     def makeRowMajor(this):
 
@@ -637,27 +2058,621 @@ class hercMatrix:
             logging.warning("cannot make nonexistent matrix row major")
             return
 
-        this.elements = numpy.sort(this.elements, order=["row", "col"])
+        if this.isRowMajor:
+            return
+
+        if this._isMapped():
+            this._sortBlocks()
+            this.isRowMajor = True
+            return
+
+        keys = this._packKeys(this.elements['row'], this.elements['col'])
+        if not _keysSorted(keys):
+            order = numpy.argsort(keys, kind='stable')
+            if this._isShared():
+                this._buffer = this.elements[order]
+                this._shared = False
+            else:
+                this._buffer[:this._length] = this.elements[order]
+            this._invalidateIndex()
+
+        this.isRowMajor = True
+
+    ## Sort the elements row major, a block at a time
+    # 
+    # Out of core version of makeRowMajor(). A bucket sort by rows: the 
+    # elements in each row are counted, consecutive rows are grouped into 
+    # buckets of about _BLOCK_SIZE elements, every element is copied into its
+    # bucket in a new buffer, and finally each bucket is sorted in memory. 
+    # Each pass reads the elements in order a block at a time. The sort is 
+    # stable, as in makeRowMajor(). 
+
+    def _sortBlocks(this):
+        elements = this.elements
+
+        # find out if there is anything to do, and count the elements in 
+        # each row
+        counts = numpy.zeros(max(this.height, 1), dtype=numpy.int64)
+        isSorted = True
+        lastKey = None
+        for start in range(0, this._length, _BLOCK_SIZE):
+            block = elements[start:start + _BLOCK_SIZE]
+            keys = this._packKeys(block['row'], block['col'])
+            if lastKey is not None:
+                keys = numpy.concatenate((lastKey, keys))
+            isSorted = isSorted and _keysSorted(keys)
+            lastKey = keys[-1:]
+            blockCounts = numpy.bincount(block['row'])
+            if len(blockCounts) > len(counts):
+                counts = numpy.concatenate((counts, numpy.zeros(
+                    len(blockCounts) - len(counts), dtype=numpy.int64)))
+            counts[:len(blockCounts)] += blockCounts
+
+        if isSorted:
+            return
+
+        # the bucket of each row, by where the row starts. Rows longer than
+        # _BLOCK_SIZE get a bucket to themselves. 
+        rowStarts = numpy.cumsum(counts) - counts
+        rowBuckets = numpy.unique(rowStarts // _BLOCK_SIZE,
+                                  return_inverse=True)[1].ravel()
+        bucketStarts = numpy.full(rowBuckets[-1] + 2, this._length,
+                                  dtype=numpy.int64)
+        bucketStarts[rowBuckets[::-1]] = rowStarts[::-1]
+
+        # copy every element into its bucket, keeping their order
+        buffer = this._allocate(this._length)
+        cursors = bucketStarts[:-1].copy()
+        for start in range(0, this._length, _BLOCK_SIZE):
+            block = elements[start:start + _BLOCK_SIZE]
+            buckets = rowBuckets[block['row']]
+            order = numpy.argsort(buckets, kind='stable')
+            buckets = buckets[order]
+            firsts = numpy.searchsorted(buckets, buckets)
+            positions = cursors[buckets] + numpy.arange(len(buckets)) - firsts
+            buffer[positions] = block[order]
+            cursors += numpy.bincount(buckets, minlength=len(cursors))
+
+        # sort within each bucket
+        for bucket in range(len(bucketStarts) - 1):
+            start = bucketStarts[bucket]
+            end = bucketStarts[bucket + 1]
+            if end - start > 1:
+                block = buffer[start:end]
+                keys = this._packKeys(block['row'], block['col'])
+                buffer[start:end] = block[numpy.argsort(keys, kind='stable')]
+
+        this._buffer = buffer
+        this._shared = False
+        this._invalidateIndex()
 
     ## transpose the matrix 
     #
-    # Perform a matrix transpose about the diagonal. 
+    # Perform a matrix transpose about the diagonal, by swapping the row and
+    # col of every element in place. The height and width of the matrix are 
+    # swapped as well. 
     # 
-    # @exception TypeError matrix is symmetric, and cannot be transposed
+    # Symmetric matrices are their own transpose, so for a matrix whose 
+    # symmetry is `SYM` this is a no-op, and the stored elements (which must 
+    # remain in the lower triangle) are left exactly as they are. 
     # 
-    # **NOTE**: you should never transpose a symmetric matrix. This 
-    # functionality used to be permitted, but has been disabled because it broke
-    # things. If you *really* want to transpose a symmetric matrix, use 
-    # getInFormat() to get it as a scipy.sparse matrix, then use numpy's 
-    # transpose function (you will probably still break everything, be careful).
+    # @param rowMajor if `True`, the elements are sorted back into row-major
+    # order afterwards, see makeRowMajor(). Otherwise, a row-major matrix 
+    # will be column-major after transposing. Default is `False`. 
+
+    def transpose(this, rowMajor=False):
 
-    def transpose(this):
-        
         if this.symmetry == "SYM":
-            raise TypeError("Cannot transpose a symmetric matrix")
+            return
+
+        tempHeight = this.height
+        this.height = this.width
+        this.width = tempHeight
+
+        if this.elements is None:
+            return
+
+        this._ensureOwned()
+        elements = this.elements
+        for start in range(0, this._length, _BLOCK_SIZE):
+            block = elements[start:start + _BLOCK_SIZE]
+            originalRows = block['row'].copy()
+            block['row'] = block['col']
+            block['col'] = originalRows
 
-        for element in this.elements:
-            originalRow = element[0]
-            originalCol = element[1]
-            element[0] = originalCol
-            element[1] = originalRow
+        this.isRowMajor = this._length < 2
+        this._invalidateIndex()
+
+        if rowMajor:
+            this.makeRowMajor()
+
+    ## Multiply this matrix by a vector
+    # 
+    # Computes `A x` from the CSR representation of the matrix (see 
+    # _getCSR()), which is cached, so repeated products with an unchanged 
+    # matrix cost only the multiplication. 
+    # 
+    # Symmetric matrices are multiplied using the stored lower triangle `L`
+    # directly, as `L x + L^T x - D x` where `D` is the diagonal, so the full
+    # matrix is never built. `L^T` is the CSC view of the same arrays, and 
+    # the diagonal is cached along with the CSR representation. 
+    # 
+    # @param x array-like of length width
+    # 
+    # @returns numpy.ndarray of length height
+    # 
+    # @exception ValueError x is not a vector of length width
+
+    def matvec(this, x):
+        x = numpy.asarray(x)
+        if (x.ndim != 1) or (len(x) != this.width):
+            raise ValueError("x must be a vector of length {0}"
+                             .format(this.width))
+
+        return this._multiply(x)
+
+    ## Multiply this matrix by a dense matrix
+    # 
+    # Batched version of matvec(), computes `A X` for every column of `X` in
+    # one pass over the matrix. 
+    # 
+    # @param X array-like of shape `(width, k)`
+    # 
+    # @returns numpy.ndarray of shape `(height, k)`
+    # 
+    # @exception ValueError X is not a matrix with width rows
+
+    def matmat(this, X):
+        X = numpy.asarray(X)
+        if (X.ndim != 2) or (X.shape[0] != this.width):
+            raise ValueError("X must be a matrix with {0} rows"
+                             .format(this.width))
+
+        return this._multiply(X)
+
+    ## Get this matrix as a scipy.sparse.linalg.LinearOperator
+    # 
+    # The operator multiplies through matvec() and matmat(), so a SYM matrix 
+    # is never expanded to its full storage. It can be passed to any of the 
+    # iterative solvers in scipy.sparse.linalg, see also libHercLinalg. 
+    # 
+    # **NOTE**: the operator reads the matrix each time it is applied, so 
+    # modifying the matrix also modifies the operator. 
+    # 
+    # @returns scipy.sparse.linalg.LinearOperator of shape `(height, width)`
+
+    def asLinearOperator(this):
+        return scipy.sparse.linalg.LinearOperator(
+            (this.height, this.width), 
+            matvec=this._multiply, 
+            rmatvec=this._rmultiply, 
+            matmat=this._multiply, 
+            rmatmat=this._rmultiply,
+            dtype=numpy.dtype(this.valueType))
+
+    ## Compute `A x` for a vector or a dense matrix, see matvec()
+
+    def _multiply(this, x):
+        if (this._buffer is None) and (this._csr is None):
+            return numpy.zeros((this.height,) + x.shape[1:], 
+                               dtype=numpy.result_type(this.valueType, x))
+
+        csr = this._getCSR()
+        if this.symmetry != 'SYM':
+            return csr @ x
+
+        diagonal = this._getDiagonal()
+        if x.ndim == 2:
+            diagonal = diagonal[:, numpy.newaxis]
+
+        result = csr @ x
+        result += csr.T @ x
+        result -= diagonal * x
+        return result
+
+    ## Compute `A^T x` for a vector or a dense matrix, see matvec()
+
+    def _rmultiply(this, x):
+        if this.symmetry == 'SYM':
+            return this._multiply(x)
+
+        if (this._buffer is None) and (this._csr is None):
+            return numpy.zeros((this.width,) + x.shape[1:], 
+                               dtype=numpy.result_type(this.valueType, x))
+
+        return this._getCSR().T @ x
+
+    ## Get the diagonal of the matrix
+    # 
+    # Duplicate elements are summed. Cached until the matrix is modified, as
+    # getInFormat() conversions are. 
+    # 
+    # @returns numpy.ndarray, must not be modified in place
+
+    def _getDiagonal(this):
+        csr = this._getCSR()
+        key = (this.version, this.height, this.width, 'diagonal')
+        if key not in this._formatCache:
+            this._cacheFormat(key, csr.diagonal())
+            if key not in this._formatCache:
+                # too large to cache
+                return csr.diagonal()
+
+        return this._formatCache[key][1]
+
+
+# number of elements processed at a time by operations which can stop early
+_BLOCK_SIZE = 2**16
+
+# number of elements addElement() may add to the coordinate index before it
+# is rebuilt, see hercMatrix._appendToIndex()
+_INDEX_APPENDED = 4096
+
+# valid policies for coalesce()
+_DUPLICATE_POLICIES = ['sum', 'first', 'last', 'error']
+
+# largest stride for which _packPairs() packs keys into an int64, the 
+# largest key being `stride * stride - 1`
+_MAX_PACKED_STRIDE = math.isqrt(numpy.iinfo(numpy.int64).max)
+
+# keys made by _packPairs() for larger strides
+_PAIR_DTYPE = numpy.dtype([('row', numpy.int64), ('col', numpy.int64)])
+
+## Attach to a matrix published in shared memory
+# 
+# Creates a matrix whose buffers are views of the shared memory blocks 
+# created by libHercMatrix.hercMatrix.publish() (possibly in another 
+# process), so nothing is copied. The shared memory itself is never written:
+# the views are read only, and the matrix copies its elements before 
+# modifying them, as if it were a snapshot. 
+# 
+# @param descriptor dict returned by publish()
+# 
+# @returns new libHercMatrix.hercMatrix instance
+
+def attach(descriptor):
+    state = descriptor['state']
+    MATRIX = hercMatrix(state['backend'], state['indexType'], 
+                        state['valueType'])
+    for attribute, value in state.items():
+        setattr(MATRIX, attribute, value)
+    MATRIX.remarks = list(state['remarks'])
+
+    if descriptor['elements'] is not None:
+        MATRIX._buffer = _attachArray(MATRIX, *descriptor['elements'])
+        MATRIX._length = len(MATRIX._buffer)
+        MATRIX._shared = True
+
+    if descriptor['csr'] is not None:
+        shape, arrays = descriptor['csr']
+        csr = scipy.sparse.csr_matrix(
+            tuple(_attachArray(MATRIX, *array) for array in arrays),
+            shape=shape, copy=False)
+        if (MATRIX.backend == 'csr') and (MATRIX._buffer is None):
+            MATRIX._csr = csr
+            MATRIX._length = csr.nnz
+        else:
+            # not subject to formatCacheLimit, as it takes no memory of ours
+            MATRIX._formatCache[(MATRIX.version, MATRIX.height, MATRIX.width,
+                                 'csr')] = (0, csr)
+
+    return MATRIX
+
+## Map a shared memory block created by publish()
+# 
+# @param MATRIX matrix which keeps the block mapped
+# @param name name of the block
+# @param dtype numpy dtype of the array in the block
+# @param length number of items in the array
+# 
+# @returns read only numpy.ndarray which is a view of the block
+
+def _attachArray(MATRIX, name, dtype, length):
+    from multiprocessing import shared_memory
+
+    try:
+        block = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # before python 3.13 the block can not be attached untracked. This 
+        # is harmless in processes started by multiprocessing, which share
+        # the resource tracker of the publisher. 
+        block = shared_memory.SharedMemory(name=name)
+    MATRIX._attached.append(block)
+
+    array = numpy.ndarray(length, dtype=dtype, buffer=block.buf)
+    array.flags.writeable = False
+    return array
+
+## Unpickle a matrix pickled by libHercMatrix.hercMatrix.__reduce_ex__()
+# 
+# @param state dict of attributes
+# @param elements tuple `(buffer, dtype)` of the elements, or `None`
+# @param csr tuple `(shape, [(buffer, dtype), ...])` of the CSR data, 
+# indices, and indptr, or `None`
+# 
+# @returns new libHercMatrix.hercMatrix instance
+
+def _rebuildMatrix(state, elements, csr):
+    MATRIX = hercMatrix.__new__(hercMatrix)
+    MATRIX.__dict__.update(state)
+
+    def unwrap(buffer, dtype):
+        if isinstance(buffer, numpy.ndarray):
+            return buffer
+        return numpy.frombuffer(buffer, dtype=dtype)
+
+    if elements is not None:
+        MATRIX._buffer = unwrap(*elements)
+        # buffers passed with pickle protocol 5 may still be in use by 
+        # whoever passed them, so they are treated like a snapshot's
+        MATRIX._shared = not isinstance(elements[0], numpy.ndarray)
+
+    if csr is not None:
+        shape, arrays = csr
+        MATRIX._csr = scipy.sparse.csr_matrix(
+            tuple(unwrap(*array) for array in arrays), shape=shape, 
+            copy=False)
+
+    return MATRIX
+
+## Pack coordinate pairs into keys which sort row major
+# 
+# Keys are the int64 `row * stride + col`, unless that could overflow, 
+# when stride is greater than _MAX_PACKED_STRIDE. Then each key is instead
+# a record of _PAIR_DTYPE, which numpy sorts, searches and compares for 
+# equality in the same way, though more slowly. Such keys can not be 
+# compared with `<`, see _keysSorted(). 
+# 
+# @param rows array-like of ints 
+# @param cols array-like of ints, the same length as rows
+# @param stride int greater than every row and col
+# 
+# @returns numpy.ndarray of keys
+
+def _packPairs(rows, cols, stride):
+    rows = numpy.asarray(rows, dtype=numpy.int64)
+    cols = numpy.asarray(cols, dtype=numpy.int64)
+    if stride <= _MAX_PACKED_STRIDE:
+        return rows * stride + cols
+
+    keys = numpy.empty(rows.shape, dtype=_PAIR_DTYPE)
+    keys['row'] = rows
+    keys['col'] = cols
+    return keys
+
+## Unpack keys made by _packPairs()
+# 
+# @returns tuple of numpy.ndarray `(rows, cols)`
+
+def _unpackPairs(keys, stride):
+    if keys.dtype.names is None:
+        return numpy.divmod(keys, stride)
+    return (keys['row'], keys['col'])
+
+## Check that keys made by _packPairs() are sorted
+# 
+# @returns `True` if no key is less than the key before it
+
+def _keysSorted(keys):
+    if keys.dtype.names is None:
+        return not numpy.any(keys[1:] < keys[:-1])
+
+    rows = keys['row']
+    cols = keys['col']
+    return not numpy.any((rows[1:] < rows[:-1]) | 
+                         ((rows[1:] == rows[:-1]) & (cols[1:] < cols[:-1])))
+
+## Sort the keys of a coordinate index
+# 
+# @param keys numpy.ndarray of keys made by _packPairs()
+# @param slots numpy.ndarray of int64, the index of the element of each key,
+# or `None` (default) if that is the position of the key in keys
+# @param isSorted if `True`, keys are already sorted
+# 
+# @returns tuple of numpy.ndarray `(keys, slots)` sorted by key, keeping only
+# the first of the elements which share a key, see 
+# libHercMatrix.hercMatrix._getIndex()
+
+def _sortIndex(keys, slots=None, isSorted=False):
+    if isSorted:
+        if slots is None:
+            slots = numpy.arange(len(keys))
+    else:
+        order = numpy.argsort(keys, kind='stable')
+        keys = keys[order]
+        slots = order if slots is None else slots[order]
+
+    first = numpy.ones(len(keys), dtype=bool)
+    first[1:] = keys[1:] != keys[:-1]
+    if first.all():
+        return (keys, slots)
+    return (keys[first], slots[first])
+
+## Look keys up in a coordinate index
+# 
+# @param keys numpy.ndarray of sorted keys without duplicates, see 
+# _sortIndex()
+# @param slots numpy.ndarray of int64, the index of the element of each key
+# @param queries numpy.ndarray of keys to look up, made by _packPairs() 
+# with the same stride as keys
+# 
+# @returns numpy.ndarray of int64, the slot of each query, or -1 where it is
+# not in keys
+
+def _searchIndex(keys, slots, queries):
+    found = numpy.full(len(queries), -1, dtype=numpy.int64)
+    if len(keys) == 0:
+        return found
+
+    position = numpy.searchsorted(keys, queries)
+    position[position == len(keys)] = 0
+    hit = keys[position] == queries
+    found[hit] = slots[position[hit]]
+    return found
+
+## Look one coordinate pair up in a coordinate index
+# 
+# @param index tuple `(stride, keys, slots, appended)`, see 
+# libHercMatrix.hercMatrix._getIndex()
+# @param row int row
+# @param col int column
+# 
+# @returns int index of the element storing `row`, `col`, or -1
+
+def _lookupIndex(index, row, col):
+    stride, keys, slots, appended = index
+    slot = appended.get((row, col))
+    if slot is not None:
+        return slot
+
+    if keys.dtype.names is not None:
+        return int(_searchIndex(keys, slots, 
+                                _packPairs([row], [col], stride))[0])
+
+    # a python int key, searching for which is much faster than packing an
+    # array of one key
+    key = row * stride + col
+    position = int(keys.searchsorted(key))
+    if (position < len(keys)) and (keys[position] == key):
+        return int(slots[position])
+    return -1
+
+## Binary search row major elements for a key
+# 
+# @param elements numpy.ndarray of libHercMatrix.hercMatrix.dtype, sorted row 
+# major
+# @param key int packed key to search for, see 
+# libHercMatrix.hercMatrix._packKeys()
+# @param stride int the stride the key was packed with
+# 
+# @returns int the index of the first element whose key is not less than key,
+# as bisect.bisect_left. Only O(log n) elements are read. 
+
+def _bisectElements(elements, key, stride):
+    low = 0
+    high = len(elements)
+    while low < high:
+        middle = (low + high) // 2
+        element = elements[middle]
+        if int(element['row']) * stride + int(element['col']) < key:
+            low = middle + 1
+        else:
+            high = middle
+
+    return low
+
+## Merge values which share a key
+# 
+# Sorts `keys` (stably, so the original order of duplicates is preserved) 
+# unless they are sorted already, then reduces each run of equal keys to a 
+# single value according to `policy`, see 
+# libHercMatrix.hercMatrix.coalesce(). 
+# 
+# @param keys numpy.ndarray of keys, see 
+# libHercMatrix.hercMatrix._packKeys()
+# @param vals numpy.ndarray of values, the same length as keys
+# @param policy one of `sum`, `first`, `last`, `error`
+# 
+# @returns tuple of numpy.ndarray `(keys, vals)` with unique, sorted keys
+# 
+# @exception ValueError policy is `error` and there are duplicate keys
+
+def _coalesceKeys(keys, vals, policy):
+    # elements read from a file are usually row major already
+    if not _keysSorted(keys):
+        order = numpy.argsort(keys, kind='stable')
+        keys = keys[order]
+        vals = vals[order]
+
+    if len(keys) == 0:
+        return (keys, vals)
+
+    starts = numpy.flatnonzero(
+        numpy.concatenate(([True], keys[1:] != keys[:-1])))
+    if len(starts) == len(keys):
+        return (keys, vals)
+
+    if policy == 'sum':
+        vals = numpy.add.reduceat(vals, starts)
+    elif policy == 'first':
+        vals = vals[starts]
+    elif policy == 'last':
+        vals = vals[numpy.append(starts[1:], len(keys)) - 1]
+    else:
+        raise ValueError("{0} elements have duplicate coordinates"
+                         .format(len(keys) - len(starts)))
+
+    return (keys[starts], vals)
+
+## Merge elements of a scipy.sparse matrix which share coordinates
+# 
+# @param matrix anything which can be cast by scipy.sparse.coo_matrix
+# @param policy see libHercMatrix.hercMatrix.coalesce()
+# 
+# @returns scipy.sparse.coo_matrix with no duplicate elements
+# 
+# @exception ValueError policy is not valid, or is `error` and there are 
+# duplicates
+
+def _coalesceMatrix(matrix, policy):
+    if policy not in _DUPLICATE_POLICIES:
+        raise ValueError("policy \"{0}\" is not valid, ".format(policy) +
+                "expected one of: " + ", ".join(_DUPLICATE_POLICIES))
+
+    matrix = scipy.sparse.coo_matrix(matrix)
+    stride = max(matrix.shape[1], 1)
+    keys, vals = _coalesceKeys(
+        _packPairs(matrix.row, matrix.col, stride), matrix.data, policy)
+    rows, cols = _unpackPairs(keys, stride)
+
+    return scipy.sparse.coo_matrix((vals, (rows, cols)), shape=matrix.shape)
+
+## The row or column of a matrix with no elements, see getRow()
+# 
+# @param valueType numpy floating point type of the values
+# 
+# @returns tuple of empty numpy.ndarray `(indices, vals)`
+
+def _emptySlice(valueType):
+    return (numpy.zeros(0, dtype=numpy.int64), numpy.zeros(0, dtype=valueType))
+
+## Slice one row of a CSR matrix, or one column of a CSC matrix
+# 
+# @param matrix scipy.sparse.csr_matrix or csc_matrix 
+# @param n the row or column to slice
+# 
+# @returns tuple of numpy.ndarray `(indices, data)`
+
+def _sliceCompressed(matrix, n):
+    start = matrix.indptr[n]
+    end = matrix.indptr[n + 1]
+    return (matrix.indices[start:end].astype(numpy.int64),
+            matrix.data[start:end])
+
+## Drop explicit zeros from a sparse vector
+# 
+# @param indices numpy.ndarray of indices
+# @param vals numpy.ndarray of values, the same length as indices
+# 
+# @returns tuple of numpy.ndarray `(indices, vals)` without any zero values
+
+def _dropZeros(indices, vals):
+    nonzero = vals != 0
+    return (indices[nonzero], vals[nonzero])
+
+## Get the number of bytes used by a matrix
+# 
+# @param matrix scipy.sparse matrix or numpy array
+# 
+# @returns int total size in bytes of the arrays backing `matrix`
+
+def _matrixSize(matrix):
+    if isinstance(matrix, numpy.ndarray):
+        return matrix.nbytes
+
+    size = 0
+    for attribute in ['data', 'indices', 'indptr', 'row', 'col', 'offsets']:
+        array = getattr(matrix, attribute, None)
+        if isinstance(array, numpy.ndarray):
+            size = size + array.nbytes
+    return size
@@ -0,0 +1,503 @@
+import libHercMatrix
+import libBXF
+import libCompressedIO
+import scipy.sparse
+import numpy
+import concurrent.futures
+import itertools
+import logging
+import os
+
+## @package libHercShard
+# Runs whole matrix operations on a process pool.
+#
+# The elements of a libHercMatrix.hercMatrix are split into shards, and each
+# shard is handed to a worker process of a concurrent.futures
+# ProcessPoolExecutor. Checks and stats are reduced from the results of each
+# shard. Operations which rebuild the matrix first route every element to the
+# worker for a range of rows (a bucket), and each bucket is built into a CSR
+# block, so the elements need not be sorted beforehand. The blocks are then
+# stacked back together.
+#
+# Every function gives the same result as the libHercMatrix.hercMatrix method
+# of the same name. The matrix is sent to the workers by pickling its
+# elements, so this is only worthwhile for large matrices.
+#
+# Every function takes `workers`, the number of worker processes to use, by
+# default os.cpu_count(). The matrix is split into four shards per worker so
+# that uneven shards balance out.
+
+
+## Check if there are elements in the lower triangle
+#
+# See libHercMatrix.hercMatrix.checkLowerTriangle()
+#
+# @param HERCMATRIX instance of libHercMatrix.hercMatrix to check
+# @param workers int number of worker processes
+#
+# @returns True if there are no nonzero elements in the lower triangle
+
+def checkLowerTriangle(HERCMATRIX, workers=None):
+    return not _anyShard(HERCMATRIX, _lowerTriangleShard, workers)
+
+## Check if there are elements in the upper triangle
+#
+# See libHercMatrix.hercMatrix.checkUpperTriangle()
+#
+# @param HERCMATRIX instance of libHercMatrix.hercMatrix to check
+# @param workers int number of worker processes
+#
+# @returns True if there are no nonzero elements in the upper triangle
+
+def checkUpperTriangle(HERCMATRIX, workers=None):
+    return not _anyShard(HERCMATRIX, _upperTriangleShard, workers)
+
+## Check if the matrix is symmetric
+#
+# See libHercMatrix.hercMatrix.checkSymmetry(). Each element off the diagonal
+# is routed to the bucket for the larger of its row and column, so that it
+# meets its counterpart across the diagonal, and each bucket is then
+# compared by a worker.
+#
+# @param HERCMATRIX instance of libHercMatrix.hercMatrix to check
+# @param rtol passed through to numpy.isclose, by default values must be
+# exactly equal
+# @param atol see above
+# @param workers int number of worker processes
+#
+# @returns True if the matrix is symmetric
+
+def checkSymmetry(HERCMATRIX, rtol=0, atol=0, workers=None):
+    if checkUpperTriangle(HERCMATRIX, workers):
+        if HERCMATRIX.symmetry == 'SYM':
+            return True
+
+    if HERCMATRIX.height != HERCMATRIX.width:
+        return False
+
+    if HERCMATRIX.elements is None:
+        return True
+
+    with _executor(workers) as executor:
+        for symmetric in executor.map(_compareBucket, _shuffle(
+                executor, HERCMATRIX, _mirrorShard, workers),
+                itertools.repeat(rtol), itertools.repeat(atol)):
+            if not symmetric:
+                return False
+
+    return True
+
+## Remove all zero elements from the matrix
+#
+# See libHercMatrix.hercMatrix.removeZeros(). As there, duplicate elements
+# are summed and the matrix is left row major.
+#
+# @param HERCMATRIX instance of libHercMatrix.hercMatrix to modify
+# @param workers int number of worker processes
+
+def removeZeros(HERCMATRIX, workers=None):
+    if HERCMATRIX.elements is None:
+        HERCMATRIX.removeZeros()
+        return
+
+    _rebuild(HERCMATRIX, _identityShard, workers)
+
+## Make the matrix symmetrical
+#
+# See libHercMatrix.hercMatrix.makeSymmetrical(). Only the `truncate` and
+# `add` methods are supported, as `smart` needs every element at once.
+#
+# @param HERCMATRIX instance of libHercMatrix.hercMatrix to modify
+# @param method string, `truncate` (default) or `add`
+# @param workers int number of worker processes
+#
+# @exception ValueError method is not valid
+
+def makeSymmetrical(HERCMATRIX, method='truncate', workers=None):
+    if method not in ['truncate', 'add']:
+        raise ValueError("method \"{0}\" is not valid, ".format(method) +
+                "expected one of: truncate, add")
+
+    if HERCMATRIX.elements is None:
+        HERCMATRIX.makeSymmetrical(method)
+        return
+
+    if method == 'truncate':
+        _rebuild(HERCMATRIX, _truncateShard, workers)
+    else:
+        _rebuild(HERCMATRIX, _addShard, workers)
+    HERCMATRIX.symmetry = 'SYM'
+
+## Summarize the stored elements of the matrix
+#
+# Statistics are of the elements as stored, so duplicate elements are
+# counted separately, and symmetric matrices are not extrapolated.
+#
+# | key            | value |
+# |----------------|-------|
+# | `nzentries`    | number of elements stored |
+# | `zeros`        | number of elements whose value is exactly zero |
+# | `diagonal`     | number of elements on the diagonal |
+# | `lower`        | number of elements below the diagonal |
+# | `upper`        | number of elements above the diagonal |
+# | `min`          | smallest value, or `None` if there are no elements |
+# | `max`          | largest value, or `None` if there are no elements |
+# | `sum`          | sum of all values |
+# | `bandwidth`    | largest distance of an element from the diagonal |
+# | `emptyRows`    | number of rows with no elements |
+# | `maxRowLength` | largest number of elements in one row |
+#
+# @param HERCMATRIX instance of libHercMatrix.hercMatrix to summarize
+# @param workers int number of worker processes
+#
+# @returns dict as above
+
+def stats(HERCMATRIX, workers=None):
+    result = {'nzentries': 0, 'zeros': 0, 'diagonal': 0, 'lower': 0,
+              'upper': 0, 'min': None, 'max': None, 'sum': 0.0,
+              'bandwidth': 0}
+    rowLengths = numpy.zeros(HERCMATRIX.height, dtype=numpy.int64)
+
+    with _executor(workers) as executor:
+        for partial, firstRow, lengths in executor.map(
+                _statsShard, _shards(HERCMATRIX, workers)):
+            for key in ['nzentries', 'zeros', 'diagonal', 'lower', 'upper',
+                        'sum']:
+                result[key] = result[key] + partial[key]
+            result['bandwidth'] = max(result['bandwidth'],
+                                      partial['bandwidth'])
+            for key, reduce in [('min', min), ('max', max)]:
+                if result[key] is None:
+                    result[key] = partial[key]
+                elif partial[key] is not None:
+                    result[key] = reduce(result[key], partial[key])
+            rowLengths[firstRow:firstRow + len(lengths)] += lengths
+
+    result['emptyRows'] = int(numpy.count_nonzero(rowLengths == 0))
+    result['maxRowLength'] = int(rowLengths.max()) if len(rowLengths) else 0
+
+    return result
+
+## Write a matrix to a BXF file
+#
+# See libBXF.write(), this writes an identical file, including the INDEX 
+# field. Workers format the val, row, and col fields, in shards of whole 
+# lines, and the results are written in order.
+#
+# @param HERCMATRIX instance of libHercMatrix.hercMatrix to write
+# @param filename the relative or absolute path to the file to write
+# @param headerString the version identifier, see libBXF.write()
+# @param workers int number of worker processes
+# @param compressionLevel compression level, if filename names a compressed
+# file, see libCompressedIO.openFile()
+
+def writeBXF(HERCMATRIX, filename, headerString="BXF22", workers=None,
+             compressionLevel=None):
+    logging.info("writing bxf file {0} on {1} workers"
+                 .format(filename, _workers(workers)))
+
+    with libCompressedIO.openFile(filename, 'w', compressionLevel) \
+            as fileObject:
+        # number of bytes written so far, the offset of the next field
+        position = [0]
+
+        def writeText(text):
+            fileObject.write(text)
+            if text.isascii():
+                position[0] += len(text)
+            else:
+                position[0] += len(text.encode(fileObject.encoding))
+
+        writeText("{0} {1} {2} {3} {4}\n".format(headerString,
+            HERCMATRIX.width, HERCMATRIX.height, HERCMATRIX.nzentries,
+            HERCMATRIX.symmetry))
+
+        # offset and number of entries of each field, see libBXF.write()
+        index = [('REMARKS', position[0], 
+                  sum(len(str(remark).split()) 
+                      for remark in HERCMATRIX.remarks))]
+        writeText('REMARKS STRING\n')
+        writeText(''.join(libBXF._formatLines(HERCMATRIX.remarks)))
+        writeText('ENDFIELD\n')
+
+        elements = HERCMATRIX.elements
+        with _executor(workers) as executor:
+            for field, header in [('val', 'VAL FLOAT\n'),
+                                  ('row', 'ROW INT\n'),
+                                  ('col', 'COL INT\n')]:
+                index.append((field.upper(), position[0], 
+                              0 if elements is None else len(elements)))
+                writeText(header)
+                if elements is not None:
+                    for text in executor.map(_encodeShard, _fieldShards(
+                            elements[field], workers)):
+                        writeText(text)
+                writeText('ENDFIELD\n')
+
+        libBXF._writeIndex(fileObject, index)
+
+## Get the number of worker processes to use
+#
+# @param workers int or `None` for os.cpu_count()
+#
+# @returns int
+
+def _workers(workers):
+    if workers is None:
+        return os.cpu_count() or 1
+    return workers
+
+## Create the process pool
+#
+# @param workers int or `None` for os.cpu_count()
+#
+# @returns concurrent.futures.ProcessPoolExecutor
+
+def _executor(workers):
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers=_workers(workers))
+
+## Split the elements into shards
+#
+# @param HERCMATRIX instance of libHercMatrix.hercMatrix
+# @param workers int or `None` for os.cpu_count()
+#
+# @returns list of tuples `(rows, cols, vals, height, width)`, one per
+# contiguous range of elements
+
+def _shards(HERCMATRIX, workers):
+    elements = HERCMATRIX.elements
+    if elements is None:
+        return []
+
+    size = max(-(-len(elements) // (4 * _workers(workers))), 1)
+    return [(elements['row'][start:start + size],
+             elements['col'][start:start + size],
+             elements['val'][start:start + size],
+             HERCMATRIX.height, HERCMATRIX.width)
+            for start in range(0, len(elements), size)]
+
+## Split one field of the elements into shards of whole BXF lines
+#
+# @param field numpy.ndarray, one field of the elements
+# @param workers int or `None` for os.cpu_count()
+#
+# @returns list of numpy.ndarray
+
+def _fieldShards(field, workers):
+    size = max(-(-len(field) // (4 * _workers(workers))), 1)
+    # round up to whole lines, so lines are never split between shards
+    size = -(-size // libBXF._ITEMS_PER_LINE) * libBXF._ITEMS_PER_LINE
+    return [field[start:start + size] for start in range(0, len(field), size)]
+
+## Check if a condition holds for any shard
+#
+# @param HERCMATRIX instance of libHercMatrix.hercMatrix
+# @param function worker function taking a shard and returning bool
+# @param workers int or `None` for os.cpu_count()
+#
+# @returns True if function returned `True` for any shard
+
+def _anyShard(HERCMATRIX, function, workers):
+    with _executor(workers) as executor:
+        for result in executor.map(function, _shards(HERCMATRIX, workers)):
+            if result:
+                executor.shutdown(wait=False, cancel_futures=True)
+                return True
+
+    return False
+
+## Route every element to the bucket for its row range
+#
+# Each shard is mapped by `function` into elements routed to buckets, and
+# the routed elements are collected by bucket.
+#
+# @param executor the process pool to use
+# @param HERCMATRIX instance of libHercMatrix.hercMatrix
+# @param function worker function taking a shard and the first row of each
+# bucket, and returning a list of `(rows, cols, vals)`, one per bucket
+# @param workers int or `None` for os.cpu_count()
+#
+# @returns list of tuples `(firstRow, endRow, width, rows, cols, vals)`, one
+# per bucket
+
+def _shuffle(executor, HERCMATRIX, function, workers):
+    bounds = numpy.unique(numpy.linspace(
+        0, HERCMATRIX.height, 4 * _workers(workers) + 1).astype(numpy.int64))
+    if len(bounds) < 2:
+        bounds = numpy.array([0, HERCMATRIX.height], dtype=numpy.int64)
+
+    routed = list(executor.map(function, _shards(HERCMATRIX, workers),
+                               itertools.repeat(bounds[:-1])))
+
+    buckets = []
+    for bucket in range(len(bounds) - 1):
+        parts = [shard[bucket] for shard in routed]
+        buckets.append((int(bounds[bucket]), int(bounds[bucket + 1]),
+                        HERCMATRIX.width) + tuple(
+                            numpy.concatenate([part[i] for part in parts])
+                            for i in range(3)))
+
+    return buckets
+
+## Rebuild the matrix from routed elements
+#
+# Routes the elements with `function` (see _shuffle()), builds each bucket
+# into a canonical CSR block without zeros, and replaces the contents of the
+# matrix with the stacked blocks.
+#
+# @param HERCMATRIX instance of libHercMatrix.hercMatrix to modify
+# @param function see _shuffle()
+# @param workers int or `None` for os.cpu_count()
+
+def _rebuild(HERCMATRIX, function, workers):
+    with _executor(workers) as executor:
+        blocks = list(executor.map(_buildBucket, _shuffle(
+            executor, HERCMATRIX, function, workers)))
+
+    HERCMATRIX.replaceContents(scipy.sparse.vstack(blocks, format='csr'))
+    HERCMATRIX.nzentries = len(HERCMATRIX.elements['val'])
+
+## Split elements between buckets
+#
+# @param bounds numpy.ndarray, the first row of each bucket
+# @param rows numpy.ndarray of the row each element is routed by
+# @param arrays numpy.ndarray to split, the same length as rows
+#
+# @returns list of tuples of numpy.ndarray, one per bucket
+
+def _route(bounds, rows, *arrays):
+    buckets = numpy.searchsorted(bounds, rows, side='right') - 1
+    buckets = numpy.clip(buckets, 0, len(bounds) - 1)
+    order = numpy.argsort(buckets, kind='stable')
+    splits = numpy.searchsorted(buckets[order],
+                                numpy.arange(1, len(bounds)))
+
+    return list(zip(*[numpy.split(array[order], splits) for array in arrays]))
+
+## worker: True if a shard has a nonzero element in the lower triangle
+
+def _lowerTriangleShard(shard):
+    rows, cols, vals = shard[:3]
+    return bool(numpy.any((rows > cols) & (vals != 0)))
+
+## worker: True if a shard has a nonzero element in the upper triangle
+
+def _upperTriangleShard(shard):
+    rows, cols, vals = shard[:3]
+    return bool(numpy.any((rows < cols) & (vals != 0)))
+
+## worker: route the elements of a shard as they are
+
+def _identityShard(shard, bounds):
+    rows, cols, vals = shard[:3]
+    return _route(bounds, rows, rows, cols, vals)
+
+## worker: route the lower triangle of a shard, as makeSymmetrical('truncate')
+
+def _truncateShard(shard, bounds):
+    rows, cols, vals = shard[:3]
+    lower = rows >= cols
+    return _route(bounds, rows[lower], rows[lower], cols[lower], vals[lower])
+
+## worker: route the lower triangle of a shard plus the transposed upper
+# triangle, as makeSymmetrical('add')
+
+def _addShard(shard, bounds):
+    rows, cols, vals = shard[:3]
+    lower = rows >= cols
+    upper = cols > rows
+    newRows = numpy.concatenate((rows[lower], cols[upper]))
+    return _route(bounds, newRows, newRows,
+                  numpy.concatenate((cols[lower], rows[upper])),
+                  numpy.concatenate((vals[lower], vals[upper])))
+
+## worker: route the elements of a shard off the diagonal by the larger of
+# their row and column. The elements are returned as the rows, columns, and
+# values of their position in the lower triangle, with the sign of the
+# column flipped for elements from the upper triangle.
+
+def _mirrorShard(shard, bounds):
+    rows, cols, vals = shard[:3]
+    rows = rows.astype(numpy.int64)
+    cols = cols.astype(numpy.int64)
+    offDiagonal = rows != cols
+    rows = rows[offDiagonal]
+    cols = cols[offDiagonal]
+    vals = vals[offDiagonal]
+
+    lowerRows = numpy.maximum(rows, cols)
+    lowerCols = numpy.where(rows > cols, cols, -1 - rows)
+    return _route(bounds, lowerRows, lowerRows, lowerCols, vals)
+
+## worker: compare the two halves of a bucket routed by _mirrorShard()
+
+def _compareBucket(bucket, rtol, atol):
+    firstRow, endRow, width, rows, cols, vals = bucket
+    stride = max(width, 1)
+
+    lower = cols >= 0
+    lowerKeys, lowerVals = _sumDuplicates(
+        libHercMatrix._packPairs(rows[lower], cols[lower], stride), 
+        vals[lower])
+    upperKeys, upperVals = _sumDuplicates(
+        libHercMatrix._packPairs(rows[~lower], -1 - cols[~lower], stride), 
+        vals[~lower])
+
+    if not numpy.array_equal(lowerKeys, upperKeys):
+        return False
+
+    return bool(numpy.all(numpy.isclose(lowerVals, upperVals, rtol, atol))
+                and numpy.all(numpy.isclose(upperVals, lowerVals, rtol,
+                                            atol)))
+
+## Sum values which share a key, then drop zeros
+#
+# @returns tuple of numpy.ndarray `(keys, vals)`, sorted by key
+
+def _sumDuplicates(keys, vals):
+    keys, vals = libHercMatrix._coalesceKeys(keys, vals, 'sum')
+    nonzero = vals != 0
+    return (keys[nonzero], vals[nonzero])
+
+## worker: build a bucket into a canonical CSR block without zeros
+
+def _buildBucket(bucket):
+    firstRow, endRow, width, rows, cols, vals = bucket
+    block = scipy.sparse.coo_matrix(
+        (vals, (rows.astype(numpy.int64) - firstRow, cols)),
+        shape=(endRow - firstRow, width)).tocsr()
+    block.sum_duplicates()
+    block.eliminate_zeros()
+    return block
+
+## worker: partial stats of a shard, see stats()
+
+def _statsShard(shard):
+    rows, cols, vals = shard[:3]
+    rows = rows.astype(numpy.int64)
+    cols = cols.astype(numpy.int64)
+
+    partial = {'nzentries': len(vals),
+               'zeros': int(numpy.count_nonzero(vals == 0)),
+               'diagonal': int(numpy.count_nonzero(rows == cols)),
+               'lower': int(numpy.count_nonzero(rows > cols)),
+               'upper': int(numpy.count_nonzero(rows < cols)),
+               'min': None, 'max': None,
+               'sum': float(numpy.sum(vals, dtype=numpy.float64)),
+               'bandwidth': 0}
+    if len(vals) == 0:
+        return (partial, 0, numpy.zeros(0, dtype=numpy.int64))
+
+    partial['min'] = float(vals.min())
+    partial['max'] = float(vals.max())
+    partial['bandwidth'] = int(numpy.abs(rows - cols).max())
+
+    # only the rows this shard touches, to keep the result small
+    firstRow = int(rows.min())
+    return (partial, firstRow, numpy.bincount(rows - firstRow))
+
+## worker: format one shard of a field as BXF lines
+
+def _encodeShard(field):
+    return ''.join(libBXF._formatLines(field))
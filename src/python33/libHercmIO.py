@@ -4,13 +4,16 @@ import libBXF
 import scipy
 import numpy
 import scipy.io
-from numpy.lib.recfunctions import append_fields
 import traceback
 import pprint
 import os
 import logging
 import libValcolIO
 import MatrixUtils
+import libCompressedIO
+import libHercShard
+import tempfile
+import shutil
 
 ## @package libHercmIO
 # libHercmIO is the aggregate IO provider for all python HeRC Matrix Tools. It's
@@ -25,23 +28,54 @@ import MatrixUtils
 # @param[in] filename a string containing the absolute or relative path of the
 # file to read
 # @param[in] form a string containing the format of the file to read. Currently,
-# valid values are `bxf`, `hercm`, `mat`, and `mtx`.
+# valid values are `bxf`, `bxfb` (binary BXF, see libBXF.readBinary()), 
+# `hercm`, `mat`, `mtx`, and `valcol`.
+# Files of any format may be compressed, if filename ends in `.gz`, `.bz2`, 
+# or `.xz`; they are decompressed as they are read, see libCompressedIO.
 # @param[in] showProgress if `True`, verbose progress messages are printed.
 # Defaults to `False`.
+# @param[in] backend storage backend for the returned matrix, `coo` (default)
+# or `csr`, see libHercMatrix.hercMatrix
+# @param[in] duplicates how to merge elements which share coordinates, see
+# libHercMatrix.hercMatrix.coalesce(). Default is `sum`. If `None`, 
+# duplicates are kept, whatever the format. 
+# @param[in] indexType numpy integer type used for row and col, or `None`
+# (default) to choose int32 or int64 from the dimensions of the matrix. See
+# libHercMatrix.hercMatrix.dtype
+# @param[in] valueType numpy floating point type used for values, or `None` 
+# (default) for float64. `None` keeps the type of `bxfb` files, so that their
+# elements are left mapped rather than copied. 
+# @param[in] structureOnly if `True`, the values of `bxf` and `hercm` files
+# are not read, and every element has the value 1, see libBXF.read(). 
+# Ignored for other formats. 
 #
 # @return the matrix as an instance of `libHercMatrix.hercMatrix`
 #
 # @throws IOError if the specified file could not be opened for writing
+# @throws ValueError if duplicates is `error` and the file contains duplicate
+# elements
 #
 
-def readMatrix(filename, form, showProgress=False):
-    HERCMATRIX = libHercMatrix.hercMatrix()
+def readMatrix(filename, form, showProgress=False, backend='coo',
+               duplicates='sum', indexType=None, valueType=None,
+               structureOnly=False):
+    if (valueType is None) and (form != 'bxfb'):
+        valueType = numpy.float64
+    HERCMATRIX = libHercMatrix.hercMatrix(backend, indexType, valueType)
 
     logging.info("reading matrix {0} in format {1}".format(filename, form))
 
     if (form == 'hercm') or (form == 'bxf'):
         # TODO: exception handling 
-        HERCMATRIX = libBXF.read(filename)
+        HERCMATRIX = libBXF.read(filename, backend, duplicates, indexType,
+                                 valueType, structureOnly)
+
+    elif form == 'bxfb':
+        # already row major, and symmetric matrices hold only the lower 
+        # triangle, so unless valueType asks for another type, the elements 
+        # are left mapped rather than copied
+        return libBXF.readBinary(filename, backend, duplicates, indexType,
+                                 valueType)
 
     elif form == 'mtx':
         from scipy import io
@@ -54,9 +88,21 @@ def readMatrix(filename, form, showProgress=False):
             if showProgress:
                 print("reading data from file...")
 
-            rawMatrix = scipy.sparse.coo_matrix(scipy.io.mmread(filename))
+            if libCompressedIO.compression(filename) is None:
+                # scipy.io aborts on uncompressed file objects, so it is 
+                # given the name instead
+                rawMatrix = scipy.sparse.coo_matrix(scipy.io.mmread(filename))
+                info = io.mminfo(filename)
+            else:
+                with libCompressedIO.openFile(filename, 'rb') as fileObject:
+                    rawMatrix = scipy.sparse.coo_matrix(
+                        scipy.io.mmread(fileObject))
+
+                # mminfo only reads the header
+                with libCompressedIO.openFile(filename, 'rb') as fileObject:
+                    info = io.mminfo(fileObject)
 
-            if 'symmetric' in io.mminfo(filename):
+            if 'symmetric' in info:
                 HERCMATRIX.symmetry = "SYM"
             else:
                 HERCMATRIX.symmetry = "ASYM"
@@ -75,32 +121,16 @@ def readMatrix(filename, form, showProgress=False):
             HERCMATRIX.verification = vs
             HERCMATRIX.remarks = []
 
-            # I'm not sure why  has to be hard...
-            # http://stackoverflow.com/questions/26018781/numpy-is-it-possible-to-preserve-the-dtype-of-columns-when-using-column-stack
-
             if showProgress:
                 print("preparing matrix data...")
-            val = numpy.asarray(hercm['val'], dtype='float64')
-            col = numpy.asarray(hercm['col'], dtype='int32')
-            row = numpy.asarray(hercm['row'], dtype='int32')
-
-            val = numpy.rec.array(val, dtype=[(('val'), numpy.float64)])
-            col = numpy.rec.array(col, dtype=[(('col'), numpy.int32)])
-            row = numpy.rec.array(row, dtype=[(('row'), numpy.int32)])
 
-            HERCMATRIX.elements = append_fields(row,
-                    'col',
-                    col,
-                    usemask=False,
-                    dtypes=[numpy.int32])
-
-            HERCMATRIX.elements = append_fields(HERCMATRIX.elements,
-                    'val',
-                    val,
-                    usemask=False,
-                    dtypes=[numpy.float64])
-
-            HERCMATRIX.nzentries = len(HERCMATRIX.elements['val'])
+            # elements are copied verbatim, the upper triangle of symmetric
+            # matrices is truncated below
+            HERCMATRIX.addElements(rawMatrix.row,
+                                   rawMatrix.col,
+                                   rawMatrix.data,
+                                   extrapolate=False,
+                                   duplicates=duplicates)
 
             HERCMATRIX.verification = libBXF.generateVerificationSum(
                 HERCMATRIX)
@@ -120,8 +150,9 @@ def readMatrix(filename, form, showProgress=False):
 
         try:
 
-            rawMatrix = scipy.sparse.coo_matrix(
-                scipy.io.loadmat(filename)['matrix'])
+            with libCompressedIO.openFile(filename, 'rb') as fileObject:
+                rawMatrix = scipy.sparse.coo_matrix(
+                    scipy.io.loadmat(fileObject)['matrix'])
 
             hercm = {}  # needed to generate verification
 
@@ -135,27 +166,11 @@ def readMatrix(filename, form, showProgress=False):
             HERCMATRIX.verification = vs
             HERCMATRIX.remarks = []
 
-            # I'm not sure why  has to be hard...
-            # http://stackoverflow.com/questions/26018781/numpy-is-it-possible-to-preserve-the-dtype-of-columns-when-using-column-stack
-
-            val = numpy.asarray(hercm['val'], dtype='float64')
-            col = numpy.asarray(hercm['col'], dtype='int32')
-            row = numpy.asarray(hercm['row'], dtype='int32')
-
-            val = numpy.rec.array(val, dtype=[(('val'), numpy.float64)])
-            col = numpy.rec.array(col, dtype=[(('col'), numpy.int32)])
-            row = numpy.rec.array(row, dtype=[(('row'), numpy.int32)])
-
-            HERCMATRIX.elements = append_fields(row,
-                    'col',
-                    col,
-                    usemask=False,
-                    dtypes=[numpy.int32])
-
-            HERCMATRIX.elements = append_fields(HERCMATRIX.elements,
-                    'val', val, usemask=False, dtypes=[numpy.float64])
-
-            HERCMATRIX.nzentries = len(HERCMATRIX.elements['val'])
+            HERCMATRIX.addElements(rawMatrix.row,
+                                   rawMatrix.col,
+                                   rawMatrix.data,
+                                   extrapolate=False,
+                                   duplicates=duplicates)
 
             if HERCMATRIX.checkSymmetry():
                 HERCMATRIX.symmetry = 'SYM'
@@ -169,7 +184,8 @@ def readMatrix(filename, form, showProgress=False):
                           str(e))
 
     elif form == 'valcol':
-        HERCMATRIX = libValcolIO.read(filename)
+        HERCMATRIX = libValcolIO.read(filename, backend, duplicates,
+                                          indexType, valueType)
 
     else:
         logging.warning("(lsc-545) format {0} is not valid".format(form))
@@ -200,15 +216,22 @@ def readMatrix(filename, form, showProgress=False):
 # @param[in] filename string containing the relative or absolute path to the file
 # to write
 # @param[in] form the format in which to write the file, one of `hercm`, `bxf`,
-# `mtx`, or `mat`
+# `bxfb`, `mtx`, `mat`, or `valcol`
 # @param[in] HERCMATRIX an instance of libHercMatrix.hercMatrix, whose contents
 # will be written to the file
+# @param[in] compressionLevel compression level from 1 to 9, if filename ends
+# in `.gz`, `.bz2`, or `.xz`, see libCompressedIO.openFile()
+# @param[in] workers number of worker processes to write `hercm` and `bxf`
+# files with, see libHercShard, or `None` (default) to write them in this 
+# process
 #
 # @return `None`
 #
 # @throws TypeError if `form` is not a valid format
+# @throws ValueError if `compressionLevel` is not valid
 
-def writeMatrix(filename, form, HERCMATRIX):
+def writeMatrix(filename, form, HERCMATRIX, compressionLevel=None, 
+                workers=None):
     # writes HERCMATRIX to the file
     # filename is a string indicating path of file
     # format is a string indicating file format (mtx or hercm)
@@ -224,7 +247,10 @@ def writeMatrix(filename, form, HERCMATRIX):
 
     if HERCMATRIX.symmetry == 'SYM':
         logging.info("matrix is symmetric, truncating lower triangle")
-        HERCMATRIX.makeSymmetrical('truncate')
+        if workers is None:
+            HERCMATRIX.makeSymmetrical('truncate')
+        else:
+            libHercShard.makeSymmetrical(HERCMATRIX, 'truncate', workers)
 
     logging.info("making matrix row major...")
     HERCMATRIX.makeRowMajor()
@@ -232,44 +258,76 @@ def writeMatrix(filename, form, HERCMATRIX):
     if form == 'hercm':
         # TODO: these will probably need a try/except block at some point
 
-        libBXF.write(HERCMATRIX, filename, "HERCM")
+        if workers is None:
+            libBXF.write(HERCMATRIX, filename, "HERCM", compressionLevel)
+        else:
+            libHercShard.writeBXF(HERCMATRIX, filename, "HERCM", workers,
+                                  compressionLevel)
 
     elif form == 'bxf':
 
-        libBXF.write(HERCMATRIX, filename)
+        if workers is None:
+            libBXF.write(HERCMATRIX, filename, 
+                         compressionLevel=compressionLevel)
+        else:
+            libHercShard.writeBXF(HERCMATRIX, filename, workers=workers,
+                                  compressionLevel=compressionLevel)
+
+    elif form == 'bxfb':
+
+        libBXF.writeBinary(HERCMATRIX, filename, compressionLevel)
 
     elif form == 'mtx':
-        try:
-            scipy.io.mmwrite(filename, HERCMATRIX.getInFormat('coo'))
-        except ValueError as e:
-            logging.warning("""(lsc-589) encountered ValueError exception 
+        # mmwrite seeks in its output, so it can not write compressed files
+        # directly, instead it writes to a temporary file which is then 
+        # copied (and compressed) to filename
+        with tempfile.TemporaryFile() as temporaryFile:
+            try:
+                scipy.io.mmwrite(temporaryFile, 
+                                 HERCMATRIX.getInFormat('coo'))
+            except ValueError as e:
+                logging.warning("""(lsc-589) encountered ValueError exception 
 while writing file. Exception: {0}. You probably have out of bounds indices 
 in row or col""".format(e))
-        except Exception as e:
-            logging.warning("""(lsc-593) encountered general error while
+            except Exception as e:
+                logging.warning("""(lsc-593) encountered general error while
  writing: {0}""".format(str(e)))
 
-        # fix header of mtx file
-        if HERCMATRIX.symmetry == 'SYM':
-            logging.info("format is mtx and matrix is symmetric, fixing" +
-                    " header...")
-            with open(filename) as inputFile:
-                lines = inputFile.readlines()
-            lines[0] = "%%MatrixMarket matrix coordinate pattern symmetric\n"
+            temporaryFile.seek(0)
+            with libCompressedIO.openFile(filename, 'wb', 
+                                          compressionLevel) as outputFile:
+                header = temporaryFile.readline()
+
+                # fix header of mtx file
+                if HERCMATRIX.symmetry == 'SYM':
+                    logging.info("format is mtx and matrix is symmetric, " +
+                                 "fixing header...")
+                    header = b"%%MatrixMarket matrix coordinate pattern " + \
+                        b"symmetric\n"
 
-            with open(filename, 'w') as outputFile:
-                for line in lines:
-                    outputFile.write(line)
+                outputFile.write(header)
+                shutil.copyfileobj(temporaryFile, outputFile)
 
     elif form == 'mat':  # matlab matrix file
         from scipy import io
         from scipy import sparse
         from numpy import array
 
-        scipy.io.savemat(filename, {'matrix': HERCMATRIX.getInFormat('coo')})
+        contents = {'matrix': HERCMATRIX.getInFormat('coo')}
+        if libCompressedIO.compression(filename) is None:
+            scipy.io.savemat(filename, contents)
+        else:
+            # savemat seeks in its output, see mtx above
+            with tempfile.TemporaryFile() as temporaryFile:
+                scipy.io.savemat(temporaryFile, contents)
+                temporaryFile.seek(0)
+                with libCompressedIO.openFile(filename, 'wb', 
+                                              compressionLevel) \
+                        as outputFile:
+                    shutil.copyfileobj(temporaryFile, outputFile)
 
     elif form == 'valcol':
-        libValcolIO.write(filename, HERCMATRIX)
+        libValcolIO.write(filename, HERCMATRIX, compressionLevel)
 
     else:
         logging.warning("(lsc-621) format {0} is not valid".format(form))
@@ -1,6 +1,7 @@
 import libHercMatrix
 import scipy.sparse
 import numpy
+import libCompressedIO
 
 ## @package libValcolIO
 # Provides read/write support for the valcol formatted files
@@ -8,43 +9,61 @@ import numpy
 
 
 ## read a valcol file
-# Reads in the valcol file located at path
+# Reads in the valcol file located at path, which may be compressed, see
+# libCompressedIO
 #
 # @param path the absolute or relative path to the valcol file to read
+# @param backend storage backend for the returned matrix, `coo` (default) or
+# `csr`, see libHercMatrix.hercMatrix. valcol files are already CSR, so with 
+# the `csr` backend no conversion is needed. 
+# @param duplicates how to merge elements which share coordinates, see 
+# libHercMatrix.hercMatrix.coalesce(). Default is `sum`. If `None`, 
+# duplicates are kept (though the `csr` backend sums them, see 
+# libHercMatrix.hercMatrix.replaceContents()). 
+# @param indexType passed through to libHercMatrix.hercMatrix, `None` 
+# (default) chooses from the dimensions of the matrix
+# @param valueType passed through to libHercMatrix.hercMatrix, default is
+# float64
+#
+# @exception ValueError duplicates is `error` and the file contains 
+# duplicate elements
 #
 # @returns libHerMatrix.hercMatrix instance containing the contents of the file
 
-def read(path):
+def read(path, backend='coo', duplicates='sum', indexType=None,
+         valueType=numpy.float64):
     # hercMatrix instance we will return later
-    MATRIX = libHercMatrix.hercMatrix()
+    MATRIX = libHercMatrix.hercMatrix(backend, indexType, valueType)
     # CSR matrix contents
-    row_ptr = numpy.array([])  # row pointer
-    col_idx = numpy.array([])  # column index
-    val     = numpy.array([])  # values
-
-    # read the file
-    FILE = open(path, 'r')
-    lines = FILE.readlines()
-    FILE.close()
-
-    # read in the header, split it, and save the contents
-    header = lines[0].split()
-    height = int(header[0])
-    width = int(header[0])
-    nzentries = int(header[1])
-
-    lines.pop(0)  # get rid of the header
-    for line in lines:
-        if len(line.split()) == 2:
-            # if the length is 2, we are in the column index + val section
-            val = numpy.append(val, float(line.split()[0]))
-            # col_idx is 1-indexed in valcol
-            col_idx = numpy.append(col_idx, int(line.split()[1]) - 1)
-        elif len(line.split()) == 1:
-            # if line length is 1, we are in the row pointer section
-            row_ptr = numpy.append(row_ptr, int(line))
-        else:
-            print("WARNING: malformed line for valcol file: {0}".format(line))
+    row_ptr = []  # row pointer
+    col_idx = []  # column index
+    val     = []  # values
+
+    # read the file a line at a time, so that compressed files are
+    # decompressed as they are parsed
+    FILE = libCompressedIO.openFile(path, 'r')
+    try:
+        # read in the header, split it, and save the contents
+        header = FILE.readline().split()
+        height = int(header[0])
+        width = int(header[0])
+        nzentries = int(header[1])
+
+        for line in FILE:
+            fields = line.split()
+            if len(fields) == 2:
+                # if the length is 2, we are in the column index + val section
+                val.append(float(fields[0]))
+                # col_idx is 1-indexed in valcol
+                col_idx.append(int(fields[1]) - 1)
+            elif len(fields) == 1:
+                # if line length is 1, we are in the row pointer section
+                row_ptr.append(int(line))
+            else:
+                print("WARNING: malformed line for valcol file: {0}"
+                      .format(line))
+    finally:
+        FILE.close()
 
 
     # generate a scipy.sparse.csr_matrix instance of 
@@ -56,7 +75,7 @@ def read(path):
     MATRIX.nzentries = nzentries
     MATRIX.height = height 
     MATRIX.width = width 
-    MATRIX.replaceContents(CSRMATRIX) 
+    MATRIX.replaceContents(CSRMATRIX, duplicates)
 
     # check if the matrix is symmetric 
     if MATRIX.checkLowerTriangle():
@@ -69,9 +88,11 @@ def read(path):
 #
 # @param path string containing the absolute or relative path to write to
 # @param MATRIX instance of libHercMatrix.hercMatrix() to be written
+# @param compressionLevel compression level, if path names a compressed file,
+# see libCompressedIO.openFile()
 # 
-def write(path, MATRIX):
-    FILE = open(path, "w")
+def write(path, MATRIX, compressionLevel=None):
+    FILE = libCompressedIO.openFile(path, "w", compressionLevel)
     CSRMATRIX = MATRIX.getInFormat("csr")
     val = CSRMATRIX.data
     col = CSRMATRIX.indices 
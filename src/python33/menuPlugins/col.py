@@ -16,14 +16,13 @@ class col(masterPlugin.masterPlugin):
 
     def execute(this, arguments, WORKINGMATRIX):
         col = arguments[0]
-
-        for index in range(0, WORKINGMATRIX.nzentries - 1):
-            try:
-                if WORKINGMATRIX.getValue(index, col) != 0:
-                    print("col {0}, row {1}: {2}"
-                          .format(col, index, WORKINGMATRIX.getValue(index, col)))
-            except IndexError:
-                pass
+        try:
+            rows, vals = WORKINGMATRIX.getCol(col)
+        except IndexError:
+            print("ERROR: col {0} is out of bounds".format(col))
+            return
+        for row, val in zip(rows, vals):
+            print("col {0}, row {1}: {2}".format(col, row, val))
 
     def validate(this, arguments, WORKINGMATRIX):
         if not super().validate(arguments, WORKINGMATRIX):
@@ -13,26 +13,38 @@ class convert(masterPlugin.masterPlugin):
             [1, str, 'source format'],
             [2, str, 'destination'],
             [3, str, 'destination format']],
-        'optionalArguments': None,
+        'optionalArguments': [[0, int, 'level'], [1, int, 'workers']],
         'argumentInfo': ['The path to the source file',
                     'the file format of the source file',
                     'the path to the destination file',
-                    'the format of the destination file'],
+                    'the format of the destination file',
+                    'the compression level of the destination, from 1 to 9',
+                    'the number of processes to write bxf and hercm files ' +
+                    'with'],
         'help': """Reads the source file in the specified format, then writes it
                 'back out at the specified destination in the destination 
-                format"""}
+                format. Either file may be compressed, if its path ends in
+                .gz, .bz2, or .xz. Large bxf and hercm files are written 
+                faster by several worker processes"""}
 
     def execute(this, arguments, WORKINGMATRIX):
         source = arguments[0] 
         destination = arguments[2]
         sourceFormat = arguments[1]
         destinationFormat = arguments[3]
-
+        level = None
+        workers = None
+        if len(arguments) >= 5:
+            level = arguments[4]
+        if len(arguments) == 6:
+            workers = arguments[5]
 
         MatrixUtils.convert(source, 
             destination, 
             sourceFormat, 
-            destinationFormat)
+            destinationFormat,
+            level,
+            workers)
 
     def validate(this, arguments, WORKINGMATRIX):
         if not super().validate(arguments, WORKINGMATRIX):
@@ -46,4 +58,16 @@ class convert(masterPlugin.masterPlugin):
             print("ERROR: source is not a file")
             return False
 
+        if len(arguments) >= 5:
+            if arguments[4] not in range(1, 10):
+                print("ERROR: level {0} is not an integer from 1 to 9"
+                    .format(arguments[4]))
+                return False
+
+        if len(arguments) == 6:
+            if arguments[5] < 1:
+                print("ERROR: workers {0} is not a positive integer"
+                    .format(arguments[5]))
+                return False
+
         return True
\ No newline at end of file
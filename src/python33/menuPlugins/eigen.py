@@ -0,0 +1,90 @@
+import masterPlugin
+import libHercLinalg
+import scipy.sparse.linalg
+
+## Wrapper for libHercLinalg.eigsh() and libHercLinalg.eigs()
+#
+# Computes a few eigenvalues of the matrix, then prints them along with the
+# report of the solver
+
+class eigen(masterPlugin.masterPlugin):
+    def __init__(this):
+        super().__init__()
+        this.command = "eigen"
+        this.aliases = ["eigs"]
+        this.commandInfo = {'requiredArguments': None,
+            'optionalArguments': [[0, int, 'k'], [1, str, 'which'],
+                [2, float, 'tol']],
+            'argumentInfo': ['The number of eigenvalues to compute, ' +
+                    'default is 6',
+                    'Which eigenvalues to compute, default is LM (largest ' +
+                    'magnitude), see scipy.sparse.linalg.eigsh',
+                    'Relative accuracy of the eigenvalues, default is ' +
+                    'machine precision'],
+            'help': """Computes eigenvalues of the matrix, using the Lanczos
+                method if the matrix is symmetric, or the Arnoldi method
+                otherwise. Symmetric matrices are never expanded. Prints the
+                eigenvalues, the residual of each eigenpair, the number of
+                iterations, and the time taken per iteration"""}
+
+    def execute(this, arguments, WORKINGMATRIX):
+        k = 6
+        which = 'LM'
+        tol = 0
+        if len(arguments) >= 1:
+            k = arguments[0]
+        if len(arguments) >= 2:
+            which = arguments[1]
+        if len(arguments) == 3:
+            tol = arguments[2]
+
+        symmetric = ((WORKINGMATRIX.symmetry == 'SYM') or
+                     WORKINGMATRIX.checkSymmetry())
+        if symmetric:
+            print("computing eigenvalues by the Lanczos method...")
+            solver = libHercLinalg.eigsh
+        else:
+            print("computing eigenvalues by the Arnoldi method...")
+            solver = libHercLinalg.eigs
+
+        try:
+            values, vectors, report = solver(WORKINGMATRIX, k, which, tol)
+        except scipy.sparse.linalg.ArpackNoConvergence as e:
+            print("ERROR: did not converge, {0} of {1} eigenvalues found"
+                  .format(len(e.eigenvalues), k))
+            return
+        except ValueError as e:
+            print("ERROR:", e)
+            return
+
+        print("{0:>4} {1:>24} {2:>12}".format("", "eigenvalue", "residual"))
+        for i, (value, residual) in enumerate(zip(values, 
+                                                  report['residuals'])):
+            print("{0:>4} {1:>24.16g} {2:>12.4g}".format(i, value, residual))
+        print("iterations: {0}, time: {1:.4g}s, time per iteration: {2:.4g}s"
+              .format(report['iterations'], report['time'],
+                      report['timePerIteration']))
+
+    def validate(this, arguments, WORKINGMATRIX):
+        if not super().validate(arguments, WORKINGMATRIX):
+            return False
+
+        if WORKINGMATRIX.height != WORKINGMATRIX.width:
+            print("ERROR: matrix is not square")
+            return False
+
+        if len(arguments) >= 1:
+            if (arguments[0] < 1) or (arguments[0] >= WORKINGMATRIX.height):
+                print("ERROR: k must be at least 1 and less than the height " +
+                      "of the matrix")
+                return False
+
+        if len(arguments) >= 2:
+            if arguments[1] not in ['LM', 'SM', 'LA', 'SA', 'BE', 'LR', 'SR',
+                                    'LI', 'SI']:
+                print("ERROR: which {0} is not one of `LM`, `SM`, `LA`, " 
+                      .format(arguments[1]) + "`SA`, `BE`, `LR`, `SR`, " +
+                      "`LI`, `SI`")
+                return False
+
+        return True
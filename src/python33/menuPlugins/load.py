@@ -1,6 +1,8 @@
 import masterPlugin
 import os
 import libHercmIO
+import libCompressedIO
+import numpy
 
 ## load command plugin
 #
@@ -13,20 +15,45 @@ class loader(masterPlugin.masterPlugin):
         this.command = "load"
         this.aliases = ["l"]
         this.commandInfo = {'requiredArguments': [[0, str, 'path']],
-            'optionalArguments': [[1, str, 'format']],
-            'argumentInfo': ['The file to load', 'The format of said file'],
+            'optionalArguments': [[1, str, 'format'], [2, str, 'backend'],
+                [3, str, 'valtype']],
+            'argumentInfo': ['The file to load', 'The format of said file',
+                    'The storage backend to use, coo or csr',
+                    'The type to store values as, float64, float32, or ' + 
+                    'pattern'],
             'help': """Reads in the file for viewing and manipulation. If format
-                is not provided, it will be extrapolated from the filename"""}
+                is not provided, it will be extrapolated from the filename. 
+                Files ending in .gz, .bz2, or .xz are decompressed as they
+                are read. 
+                The csr backend keeps the matrix in CSR format, which makes
+                row operations faster; the default is coo. float32 values use
+                half the memory of the default float64, bxfb files keep the 
+                type they were written with unless one is given. pattern 
+                skips reading the values of bxf files, setting every value 
+                to 1, which is faster when only the positions of the elements
+                are needed, as by plot or the triangle checks"""}
 
     def execute(this, arguments, WORKINGMATRIX):
         filename = arguments[0]
         form = None
-        if len(arguments) == 2:
+        backend = 'coo'
+        valueType = None
+        structureOnly = False
+        if len(arguments) >= 2:
             form = arguments[1]
         else:
             form = this.extrapolateFormat(arguments[0])
+        if len(arguments) >= 3:
+            backend = arguments[2]
+        if len(arguments) == 4:
+            if arguments[3] == 'pattern':
+                structureOnly = True
+            else:
+                valueType = numpy.dtype(arguments[3]).type
     
-        WORKINGMATRIX = libHercmIO.readMatrix(filename, form, True)
+        WORKINGMATRIX = libHercmIO.readMatrix(filename, form, True, backend,
+                                              valueType=valueType,
+                                              structureOnly=structureOnly)
         return WORKINGMATRIX
 
     def validate(this, arguments, WORKINGMATRIX):
@@ -46,14 +73,31 @@ class loader(masterPlugin.masterPlugin):
             print("ERROR: target is a directory, not a file")
             return False
 
+        if len(arguments) >= 3:
+            if arguments[2] not in ['coo', 'csr']:
+                print("ERROR: backend {0} is not one of `coo`, `csr`"
+                    .format(arguments[2]))
+                return False
+
+        if len(arguments) == 4:
+            if arguments[3] not in ['float64', 'float32', 'pattern']:
+                print("ERROR: valtype {0} is not one of `float64`, `float32`,"
+                    .format(arguments[3]) + " `pattern`")
+                return False
+
 
         return True
 
     ## attempt to extrapolate format from filename
     # returns the format if it can be extrapolated, or None if it cannot
+    # compressed files (see libCompressedIO) have the format of their name 
+    # without the compression extension
     def extrapolateFormat(this, filename):
+        filename = libCompressedIO.stripCompression(filename)
         if filename[-3:] == "bxf":
             return 'bxf'
+        if filename[-4:] == 'bxfb':
+            return 'bxfb'
         if filename[-3:] == 'mat':
             return 'mat'
         if filename[-3:] == 'mtx':
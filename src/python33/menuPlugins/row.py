@@ -15,13 +15,13 @@ class row(masterPlugin.masterPlugin):
 
     def execute(this, arguments, WORKINGMATRIX):
         row = arguments[0]
-        for index in range(0, WORKINGMATRIX.nzentries - 1):
-            try:
-                if WORKINGMATRIX.getValue(row, index) != 0:
-                    print("col {0}, row {1}: {2}"
-                        .format(index, row, WORKINGMATRIX.getValue(row, index)))
-            except IndexError:
-                pass
+        try:
+            cols, vals = WORKINGMATRIX.getRow(row)
+        except IndexError:
+            print("ERROR: row {0} is out of bounds".format(row))
+            return
+        for col, val in zip(cols, vals):
+            print("col {0}, row {1}: {2}".format(col, row, val))
 
     def validate(this, arguments, WORKINGMATRIX):
         if not super().validate(arguments, WORKINGMATRIX):
@@ -20,7 +20,7 @@ class setSymmetry(masterPlugin.masterPlugin):
                     corresponding elements in the upper triangle (asym->sym) OR 
                     all elements in the upper triangle are added to the 
                     corresponding elements in the lower (sym->asym); smart - 
-                    only overwrites values with are zero, very slow"""}
+                    only overwrites values which are zero"""}
 
     def execute(this, arguments, WORKINGMATRIX):
         newSymmetry = arguments[0]
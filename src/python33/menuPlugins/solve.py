@@ -0,0 +1,83 @@
+import masterPlugin
+import libHercLinalg
+import numpy
+
+## Wrapper for libHercLinalg.cg() and libHercLinalg.minres()
+#
+# Solves `A x = b` for a right hand side of all ones, and prints the report
+# of the solver, for tuning the tolerance and iteration limit
+
+class solve(masterPlugin.masterPlugin):
+    def __init__(this):
+        super().__init__()
+        this.command = "solve"
+        this.aliases = None
+        this.commandInfo = {'requiredArguments': [[0, str, 'method']],
+            'optionalArguments': [[0, float, 'tol'], [1, int, 'maxiter']],
+            'argumentInfo': ['The method to use, cg or minres',
+                    'Relative tolerance, default is 1e-5',
+                    'Maximum number of iterations'],
+            'help': """Solves A x = b, where b is a vector of all ones, using
+                the conjugate gradient (cg) or minimum residual (minres)
+                method. The matrix must be symmetric, and positive definite
+                for cg. Symmetric matrices are never expanded. Prints the
+                residual after each iteration, the number of iterations, and
+                the time taken per iteration. The time taken to compute the
+                residuals is not included"""}
+
+    def execute(this, arguments, WORKINGMATRIX):
+        method = arguments[0]
+        rtol = 1e-5
+        maxiter = None
+        if len(arguments) >= 2:
+            rtol = arguments[1]
+        if len(arguments) == 3:
+            maxiter = arguments[2]
+
+        solver = {'cg': libHercLinalg.cg, 'minres': libHercLinalg.minres}
+        b = numpy.ones(WORKINGMATRIX.height)
+        print("solving by {0}...".format(method))
+        try:
+            x, report = solver[method](WORKINGMATRIX, b, rtol=rtol, 
+                                       maxiter=maxiter, history=True)
+        except ValueError as e:
+            print("ERROR:", e)
+            return
+
+        print("{0:>8} {1:>12}".format("iter", "residual"))
+        residuals = report['residuals']
+        # print at most about 20 residuals
+        step = max(len(residuals) // 20, 1)
+        for i in range(0, len(residuals), step):
+            print("{0:>8} {1:>12.4g}".format(i + 1, residuals[i]))
+        if (len(residuals) - 1) % step != 0:
+            print("{0:>8} {1:>12.4g}".format(len(residuals), residuals[-1]))
+
+        if report['converged']:
+            print("converged", end='')
+        else:
+            print("did not converge", end='')
+        print(" after {0} iterations, time: {1:.4g}s, time per iteration: "
+              .format(report['iterations'], report['time']) + 
+              "{0:.4g}s".format(report['timePerIteration']))
+        print("relative residual: {0:.4g}"
+              .format(residuals[-1] / numpy.linalg.norm(b)))
+
+    def validate(this, arguments, WORKINGMATRIX):
+        if not super().validate(arguments, WORKINGMATRIX):
+            return False
+
+        if arguments[0] not in ['cg', 'minres']:
+            print("ERROR: method {0} is not one of `cg`, `minres`"
+                  .format(arguments[0]))
+            return False
+
+        if WORKINGMATRIX.height != WORKINGMATRIX.width:
+            print("ERROR: matrix is not square")
+            return False
+
+        if WORKINGMATRIX.height == 0:
+            print("ERROR: matrix is empty")
+            return False
+
+        return True
@@ -13,17 +13,15 @@ class transpose(masterPlugin.masterPlugin):
             'help': 'Reflects the matrix about the diagonal'}
 
     def execute(this, arguments, WORKINGMATRIX):
+        if WORKINGMATRIX.symmetry == "SYM":
+            print("matrix is symmetric, transposing it has no effect")
+            return
         print("performing matrix transpose...")
-        WORKINGMATRIX.transpose()
+        WORKINGMATRIX.transpose(rowMajor=True)
         print("done")
 
     def validate(this, arguments, WORKINGMATRIX):
         if not super().validate(arguments, WORKINGMATRIX):
             return False
 
-        if WORKINGMATRIX.symmetry == "SYM":
-            print("ERROR: matrix is already symmetric, performing transpose " +
-                "would produce non-compliant output")
-            return False 
-
         return True 
\ No newline at end of file
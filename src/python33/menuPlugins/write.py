@@ -16,25 +16,33 @@ class writer(masterPlugin.masterPlugin):
         this.command = "write"
         this.aliases = ["w"]
         this.commandInfo = {'requiredArguments': [[0, str, 'path']],
-        'optionalArguments': [[1, str, 'format']],
-        'argumentInfo': ['The file to write to', 'The format of said file'],
+        'optionalArguments': [[0, str, 'format'], [1, int, 'level']],
+        'argumentInfo': ['The file to write to', 'The format of said file',
+                    'The compression level, from 1 to 9'],
         'help': """Writes current matrix to specified file, in specified format
         note that the given path should include the desired file extension.
-        if format is not given, it will be extrapolated from the filename"""}
+        if format is not given, it will be extrapolated from the filename. 
+        If the path ends in .gz, .bz2, or .xz, the file is compressed 
+        accordingly, at the given level, or the default level of the 
+        compressor if level is not given"""}
 
     def execute(this, arguments, WORKINGMATRIX):
         filename = arguments[0]
         form = None
-        if len(arguments) == 2:
+        level = None
+        if len(arguments) >= 2:
             form = arguments[1]
         else:
             form = load.loader.extrapolateFormat(None, arguments[0])
+        if len(arguments) == 3:
+            level = arguments[2]
 
 
-        if form not in ['bxf', 'hercm', 'mat', 'mtx', 'valcol']:
+        if form not in ['bxf', 'bxfb', 'hercm', 'mat', 'mtx', 'valcol']:
             print("ERROR: file format {0} not supported".format(form))
-    
-        libHercmIO.writeMatrix(filename, form, WORKINGMATRIX)
+            return
+
+        libHercmIO.writeMatrix(filename, form, WORKINGMATRIX, level)
 
     def validate(this, arguments, WORKINGMATRIX):
         if not super().validate(arguments, WORKINGMATRIX):
@@ -45,6 +53,12 @@ class writer(masterPlugin.masterPlugin):
                 print("ERROR: could not extrapolate format from filename")
                 return False
 
+        if len(arguments) == 3:
+            if arguments[2] not in range(1, 10):
+                print("ERROR: level {0} is not an integer from 1 to 9"
+                    .format(arguments[2]))
+                return False
+
         if os.path.exists(arguments[0]):
             print("WARNING: target file already exists, delete it? (y/n)")
             if (input().upper() in ["YES","Y"]):
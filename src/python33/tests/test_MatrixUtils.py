@@ -0,0 +1,88 @@
+import contextlib
+import io
+import os
+import sys
+import unittest
+
+import numpy
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import libHercMatrix
+import MatrixUtils
+
+
+class testMatrixUtils(unittest.TestCase):
+
+    def setUp(this):
+        this.matrix = libHercMatrix.hercMatrix()
+        MatrixUtils.initialize(6, 8, this.matrix)
+
+    def toarray(this):
+        return this.matrix.getInFormat('coo').toarray()
+
+    def testInitialize(this):
+        this.assertEqual((this.matrix.height, this.matrix.width), (6, 8))
+        this.assertEqual(this.matrix.nzentries, 0)
+        this.assertIsNone(this.matrix.elements)
+
+        MatrixUtils.initialize(3, 4, this.matrix, 2)
+        this.assertEqual(this.matrix.nzentries, 12)
+        this.assertTrue(numpy.all(this.toarray() == 2))
+
+    def testPaint(this):
+        # parts of the box outside of the matrix are ignored
+        MatrixUtils.paint(4, 10, -2, 1, 3, this.matrix)
+        expected = numpy.zeros((6, 8))
+        expected[4:6, 0:2] = 3
+        this.assertTrue(numpy.array_equal(this.toarray(), expected))
+
+        # painting zero removes elements
+        MatrixUtils.paint(5, 5, 0, 7, 0, this.matrix)
+        expected[5] = 0
+        this.assertTrue(numpy.array_equal(this.toarray(), expected))
+        this.assertEqual(this.matrix.nzentries, 2)
+
+    def testPaintDiagonal(this):
+        for offset in [0, 2, -3]:
+            MatrixUtils.initialize(6, 8, this.matrix)
+            MatrixUtils.paintDiagonal(1, 4, 2, 1.5, this.matrix, offset)
+
+            rows, cols = numpy.indices((6, 8))
+            band = (numpy.abs(cols - offset - rows) < 2) & \
+                (rows >= 1) & (rows <= 4)
+            this.assertTrue(numpy.array_equal(this.toarray(), 
+                                              numpy.where(band, 1.5, 0)))
+
+    def testSetDims(this):
+        MatrixUtils.paint(0, 5, 0, 7, 1, this.matrix)
+        MatrixUtils.setDims(3, 10, this.matrix)
+        this.assertEqual((this.matrix.height, this.matrix.width), (3, 10))
+        this.assertEqual(this.matrix.nzentries, 24)
+        this.assertTrue(numpy.all(this.matrix.elements['row'] < 3))
+
+        MatrixUtils.setDims(3, 2, this.matrix)
+        this.assertEqual(this.matrix.nzentries, 6)
+        this.assertTrue(numpy.all(this.toarray() == 1))
+
+    def testPrintRange(this):
+        this.matrix.setValue(5, 7, 4)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            MatrixUtils.printRange(4, 5, 6, 7, this.matrix)
+        this.assertEqual([line.split() for line in 
+                          output.getvalue().splitlines()],
+                         [['0', '0'], ['0', '4']])
+
+        # an index equal to the dimension is out of bounds
+        for bounds in [(0, 6, 0, 1), (6, 6, 0, 1), (0, 1, 0, 8), 
+                       (0, 1, 8, 8), (-1, 1, 0, 1), (0, 1, -1, 1)]:
+            with this.assertRaises(IndexError):
+                MatrixUtils.printRange(*bounds, this.matrix)
+        with this.assertRaises(ValueError):
+            MatrixUtils.printRange(3, 2, 0, 1, this.matrix)
+        with this.assertRaises(ValueError):
+            MatrixUtils.printRange(0, 1, 3, 2, this.matrix)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,177 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import libBXF
+import libHercMatrix
+import libHercmIO
+
+
+class testText(unittest.TestCase):
+
+    def setUp(this):
+        this.directory = tempfile.TemporaryDirectory()
+        this.filename = os.path.join(this.directory.name, 'matrix.bxf')
+
+        random = numpy.random.default_rng(0)
+        this.matrix = libHercMatrix.hercMatrix()
+        this.matrix.height = 50
+        this.matrix.width = 60
+        this.matrix.remarks = ['a remark', 'another one']
+        this.matrix.addElements(random.integers(0, 50, 500),
+                                random.integers(0, 60, 500),
+                                random.random(500) + 1, duplicates='sum')
+
+    def tearDown(this):
+        this.directory.cleanup()
+
+    def assertSameMatrix(this, matrix):
+        this.assertEqual((matrix.height, matrix.width), (50, 60))
+        this.assertEqual(matrix.symmetry, 'ASYM')
+        this.assertTrue(numpy.array_equal(matrix.elements, 
+                                          this.matrix.elements))
+
+    def testRoundTrip(this):
+        libBXF.write(this.matrix, this.filename)
+        this.assertSameMatrix(libBXF.read(this.filename))
+
+    def testIndex(this):
+        # each offset of the INDEX field is that of the header of its field
+        libBXF.write(this.matrix, this.filename)
+        index = libBXF._readIndex(this.filename)
+        this.assertEqual(sorted(index), ['col', 'remarks', 'row', 'val'])
+
+        with open(this.filename, 'rb') as fileObject:
+            for name, (offset, count) in index.items():
+                fileObject.seek(offset)
+                this.assertEqual(fileObject.readline().split()[0], 
+                                 name.upper().encode('ascii'))
+                if name != 'remarks':
+                    this.assertEqual(count, this.matrix.nzentries)
+        this.assertEqual(index['remarks'][1], 4)
+
+    def testWithoutIndex(this):
+        # files written before the INDEX field are still read
+        libBXF.write(this.matrix, this.filename)
+        with open(this.filename) as fileObject:
+            contents = fileObject.read()
+        with open(this.filename, 'w') as fileObject:
+            fileObject.write(contents[:contents.index(libBXF._INDEX_HEADER)])
+
+        this.assertIsNone(libBXF._readIndex(this.filename))
+        this.assertSameMatrix(libBXF.read(this.filename))
+
+    def testSmallBlocks(this):
+        # fields split across lines, write blocks, and read chunks
+        lines = libBXF._BLOCK_LINES
+        chunk = libBXF._CHUNK_SIZE
+        libBXF._BLOCK_LINES = 2
+        libBXF._CHUNK_SIZE = 7
+        try:
+            libBXF.write(this.matrix, this.filename)
+            this.assertSameMatrix(libBXF.read(this.filename))
+        finally:
+            libBXF._BLOCK_LINES = lines
+            libBXF._CHUNK_SIZE = chunk
+
+    def testStructureOnly(this):
+        libBXF.write(this.matrix, this.filename)
+        matrix = libBXF.read(this.filename, structureOnly=True)
+        this.assertEqual(matrix.elements['row'].tolist(), 
+                         this.matrix.elements['row'].tolist())
+        this.assertEqual(matrix.elements['col'].tolist(), 
+                         this.matrix.elements['col'].tolist())
+        this.assertTrue(numpy.all(matrix.elements['val'] == 1))
+
+
+class testBinary(unittest.TestCase):
+
+    def setUp(this):
+        this.directory = tempfile.TemporaryDirectory()
+        this.filename = os.path.join(this.directory.name, 'matrix.bxfb')
+
+        matrix = libHercMatrix.hercMatrix(valueType=numpy.float32)
+        matrix.height = 10
+        matrix.width = 10
+        matrix.addElements(numpy.arange(10), numpy.arange(10), 
+                           numpy.arange(10) + 1.0)
+        libBXF.writeBinary(matrix, this.filename)
+
+    def tearDown(this):
+        this.directory.cleanup()
+
+    def testMapped(this):
+        # float32 elements are used as they are in the file, not converted
+        matrix = libHercmIO.readMatrix(this.filename, 'bxfb')
+        this.assertIsInstance(matrix._buffer, numpy.memmap)
+        this.assertEqual(matrix.valueType, numpy.float32)
+
+    def testSaveInPlace(this):
+        # the matrix is still mapped from the file it is written back to
+        matrix = libBXF.readBinary(this.filename)
+        this.assertIsInstance(matrix._buffer, numpy.memmap)
+        matrix.setValue(3, 3, -5)
+        libBXF.writeBinary(matrix, this.filename)
+
+        this.assertEqual(os.listdir(this.directory.name), ['matrix.bxfb'])
+        this.assertEqual(matrix.getValue(4, 4), 5)
+        reread = libBXF.readBinary(this.filename)
+        this.assertEqual(reread.getValue(3, 3), -5)
+        this.assertEqual(reread.getValue(4, 4), 5)
+        this.assertEqual(reread.nzentries, 10)
+
+
+class testDuplicates(unittest.TestCase):
+    # every reader gives duplicates the same meaning, see libBXF.read()
+
+    def setUp(this):
+        this.directory = tempfile.TemporaryDirectory()
+
+        matrix = libHercMatrix.hercMatrix()
+        matrix.height = 3
+        matrix.width = 3
+        matrix.addElements([1, 0, 1], [0, 0, 0], [1.0, 2, 3])
+
+        text = os.path.join(this.directory.name, 'matrix.bxf')
+        binary = os.path.join(this.directory.name, 'matrix.bxfb')
+        libBXF.write(matrix, text)
+        libBXF.writeBinary(matrix, binary)
+
+        this.readers = [
+            lambda duplicates: libBXF.read(text, duplicates=duplicates),
+            lambda duplicates: libBXF.readBinary(binary, 
+                                                 duplicates=duplicates),
+            lambda duplicates: libHercmIO.readMatrix(text, 'bxf', 
+                                                     duplicates=duplicates),
+            lambda duplicates: libHercmIO.readMatrix(binary, 'bxfb',
+                                                     duplicates=duplicates)]
+
+    def tearDown(this):
+        this.directory.cleanup()
+
+    def assertElements(this, matrix, expected):
+        this.assertTrue(matrix.isRowMajor)
+        this.assertEqual([(int(row), int(col), float(val)) for 
+                          row, col, val in matrix.elements], expected)
+
+    def testKeep(this):
+        for reader in this.readers:
+            this.assertElements(reader(None), 
+                                [(0, 0, 2), (1, 0, 1), (1, 0, 3)])
+
+    def testSum(this):
+        for reader in this.readers:
+            this.assertElements(reader('sum'), [(0, 0, 2), (1, 0, 4)])
+
+    def testError(this):
+        for reader in this.readers:
+            with this.assertRaises(ValueError):
+                reader('error')
+
+
+if __name__ == '__main__':
+    unittest.main()
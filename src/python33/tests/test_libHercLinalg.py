@@ -0,0 +1,82 @@
+import os
+import sys
+import unittest
+
+import numpy
+import scipy.sparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import libHercLinalg
+import libHercMatrix
+
+
+class testSolvers(unittest.TestCase):
+    # a small symmetric positive definite matrix, stored as SYM
+
+    def setUp(this):
+        n = 50
+        this.dense = 4 * numpy.eye(n) - numpy.eye(n, k=1) - numpy.eye(n, k=-1)
+        this.matrix = libHercMatrix.hercMatrix()
+        this.matrix.height = n
+        this.matrix.width = n
+        this.matrix.symmetry = 'SYM'
+        this.matrix.replaceContents(
+            scipy.sparse.coo_matrix(numpy.tril(this.dense)))
+        this.b = numpy.arange(n, dtype=float)
+
+    def assertReport(this, report):
+        this.assertEqual(sorted(report), ['converged', 'iterations', 
+                                          'matvecs', 'residuals', 'time', 
+                                          'timePerIteration'])
+        this.assertTrue(report['converged'])
+        this.assertGreater(report['iterations'], 0)
+        this.assertGreater(report['matvecs'], 0)
+        this.assertGreaterEqual(report['time'], 0)
+        this.assertAlmostEqual(report['timePerIteration'], 
+                               report['time'] / report['iterations'])
+
+    def testEigsh(this):
+        values, vectors, report = libHercLinalg.eigsh(this.matrix, k=3)
+        this.assertReport(report)
+        this.assertEqual(report['matvecs'], report['iterations'])
+        this.assertTrue(numpy.allclose(
+            numpy.sort(values), numpy.linalg.eigvalsh(this.dense)[-3:]))
+        this.assertEqual(vectors.shape, (50, 3))
+        this.assertEqual(len(report['residuals']), 3)
+        this.assertTrue(numpy.all(numpy.array(report['residuals']) < 1e-8))
+
+    def testCG(this):
+        x, report = libHercLinalg.cg(this.matrix, this.b, rtol=1e-10, 
+                                     history=True)
+        this.assertReport(report)
+        this.assertTrue(numpy.allclose(x, numpy.linalg.solve(this.dense, 
+                                                             this.b)))
+        this.assertEqual(len(report['residuals']), report['iterations'])
+        this.assertLess(report['residuals'][-1], 
+                        1e-10 * numpy.linalg.norm(this.b) * 10)
+
+    def testMinres(this):
+        x, report = libHercLinalg.minres(this.matrix, this.b, rtol=1e-10, 
+                                         shift=1.0)
+        this.assertReport(report)
+        shifted = this.dense - numpy.eye(50)
+        this.assertTrue(numpy.allclose(x, numpy.linalg.solve(shifted, 
+                                                             this.b)))
+        # without history, only the final residual is reported
+        this.assertEqual(len(report['residuals']), 1)
+        this.assertAlmostEqual(report['residuals'][0], 
+                               numpy.linalg.norm(this.b - shifted @ x))
+
+    def testNotSymmetric(this):
+        matrix = libHercMatrix.hercMatrix()
+        matrix.height = 2
+        matrix.width = 2
+        matrix.addElements([0, 1], [1, 1], [1.0, 2.0])
+        with this.assertRaises(ValueError):
+            libHercLinalg.cg(matrix, [1.0, 1.0])
+        with this.assertRaises(ValueError):
+            libHercLinalg.cg(this.matrix, [1.0, 1.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
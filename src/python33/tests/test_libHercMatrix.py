@@ -0,0 +1,521 @@
+import os
+import pickle
+import sys
+import tracemalloc
+import unittest
+
+import numpy
+import scipy.sparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import libHercMatrix
+
+
+class testLargeDimensions(unittest.TestCase):
+    # row * max(height, width) + col overflows int64 above about 3.04e9
+
+    def setUp(this):
+        this.n = 5 * 10**9
+        this.matrix = libHercMatrix.hercMatrix()
+        this.matrix.height = this.n
+        this.matrix.width = this.n
+
+    def testCoalesce(this):
+        n = this.n
+        this.matrix.addElements(numpy.array([n - 2, 3, n - 2, 0]),
+                                numpy.array([3, n - 1, 3, n - 1]),
+                                numpy.array([1.0, 2.0, 4.0, 8.0]),
+                                duplicates='sum')
+
+        elements = this.matrix.elements
+        this.assertEqual(elements['row'].tolist(), [0, 3, n - 2])
+        this.assertEqual(elements['col'].tolist(), [n - 1, n - 1, 3])
+        this.assertEqual(elements['val'].tolist(), [8.0, 2.0, 5.0])
+        this.assertEqual(this.matrix.getValue(n - 2, 3), 5.0)
+
+    def testMakeRowMajor(this):
+        n = this.n
+        this.matrix.addElements(numpy.array([n - 1, 0, n - 1]),
+                                numpy.array([0, n - 1, 1]),
+                                numpy.array([1.0, 2.0, 3.0]),
+                                duplicates=None)
+        this.matrix.makeRowMajor()
+
+        elements = this.matrix.elements
+        this.assertEqual(elements['row'].tolist(), [0, n - 1, n - 1])
+        this.assertEqual(elements['col'].tolist(), [n - 1, 0, 1])
+
+
+
+class testSnapshot(unittest.TestCase):
+    # editing one element of a matrix with snapshots should cost about one
+    # block, not a copy of every element
+
+    def setUp(this):
+        n = 2000
+        length = 10**6
+        random = numpy.random.default_rng(0)
+        this.matrix = libHercMatrix.hercMatrix()
+        this.matrix.height = n
+        this.matrix.width = n
+        this.matrix.addElements(random.integers(0, n, length),
+                                random.integers(0, n, length),
+                                random.random(length) + 1, 
+                                duplicates='sum')
+        this.original = this.matrix.elements.copy()
+        this.slot = 5
+        this.row = int(this.original['row'][this.slot])
+        this.col = int(this.original['col'][this.slot])
+        # build the coordinate index, so it is not counted
+        this.matrix.getValue(this.row, this.col)
+
+    def testSingleElementEdit(this):
+        blockBytes = libHercMatrix._BLOCK_SIZE * this.matrix.dtype.itemsize
+        undoStack = []
+
+        tracemalloc.start()
+        try:
+            for i in range(3):
+                undoStack.append(this.matrix.snapshot())
+                this.matrix.setValue(this.row, this.col, 100.0 + i)
+            allocated = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        # one saved block per edit, far less than one copy of the elements
+        for snapshot in undoStack:
+            this.assertEqual(list(snapshot._savedBlocks), 
+                             [this.slot // libHercMatrix._BLOCK_SIZE])
+        this.assertLess(allocated, 4 * blockBytes)
+        this.assertLess(allocated, this.original.nbytes)
+
+        this.assertEqual(this.matrix.getValue(this.row, this.col), 102.0)
+        this.assertEqual(undoStack[1].getValue(this.row, this.col), 100.0)
+        this.assertEqual(undoStack[2].getValue(this.row, this.col), 101.0)
+        this.assertTrue(numpy.array_equal(undoStack[0].elements, 
+                                          this.original))
+
+    def testRelease(this):
+        snapshot = this.matrix.snapshot()
+        this.assertFalse(this.matrix.elements.flags.writeable)
+        snapshot.release()
+        this.assertTrue(this.matrix.elements.flags.writeable)
+
+
+class testSnapshotLengths(unittest.TestCase):
+    # matrices sharing a buffer may hold different numbers of elements, the
+    # blocks saved for each must hold all of their elements
+
+    def testEditShorterSnapshot(this):
+        matrix = libHercMatrix.hercMatrix()
+        matrix.height = 200
+        matrix.width = 200
+        matrix.reserve(1000)
+        matrix.addElements(numpy.arange(100), numpy.arange(100), 
+                           numpy.arange(100) + 1.0)
+        snapshot = matrix.snapshot()
+        matrix.addElements(numpy.arange(100, 110), numpy.zeros(10), 
+                           numpy.full(10, 7.0))
+
+        snapshot.setValue(5, 5, -1)
+
+        this.assertEqual(matrix.nzentries, 110)
+        this.assertEqual(matrix.getValue(5, 5), 6)
+        this.assertEqual(matrix.getValue(105, 0), 7)
+        this.assertEqual(snapshot.nzentries, 100)
+        this.assertEqual(snapshot.getValue(5, 5), -1)
+
+    def testUndoThenRestore(this):
+        # as HercExplorer does for: init 10 10; touch 0 0 5; touch 1 1 6; 
+        # snapshot foo; undo; touch 0 0 7; undo foo
+        matrix = libHercMatrix.hercMatrix()
+        matrix.height = 10
+        matrix.width = 10
+        matrix.setValue(0, 0, 5)
+        undo = matrix.snapshot()
+        matrix.setValue(1, 1, 6)
+        named = matrix.snapshot()
+
+        matrix = undo
+        matrix.setValue(0, 0, 7)
+
+        restored = named.snapshot()
+        this.assertEqual(restored.getValue(0, 0), 5)
+        this.assertEqual(restored.getValue(1, 1), 6)
+        this.assertEqual(matrix.getValue(0, 0), 7)
+        this.assertEqual(matrix.getValue(1, 1), 0)
+
+
+class testCoordinateIndex(unittest.TestCase):
+
+    def setUp(this):
+        this.matrix = libHercMatrix.hercMatrix()
+        this.matrix.height = 1000
+        this.matrix.width = 1000
+
+    def testMemory(this):
+        # the index is two arrays, not a python object per element
+        length = 10**5
+        random = numpy.random.default_rng(0)
+        this.matrix.addElements(random.integers(0, 1000, length),
+                                random.integers(0, 1000, length),
+                                random.random(length) + 1,
+                                duplicates='sum')
+        # so that building the index sorts the keys
+        this.matrix.isRowMajor = False
+
+        tracemalloc.start()
+        try:
+            this.matrix.getValue(0, 0)
+            allocated = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        this.assertLess(allocated, 32 * length)
+
+    def testDuplicates(this):
+        # the first element storing a coordinate pair is used
+        this.matrix.addElements([3, 1, 3], [2, 1, 2], [5.0, 6, 7])
+        this.assertEqual(this.matrix.getValue(3, 2), 5)
+        this.matrix.addElement([1, 1, 8])
+        this.assertEqual(this.matrix.getValue(1, 1), 6)
+
+    def testAppend(this):
+        # more elements than the index keeps beside its sorted keys
+        count = libHercMatrix._INDEX_APPENDED + 100
+        this.matrix.getValue(0, 0)
+        for i in range(count):
+            this.matrix.setValue(i // 1000, i % 1000, i + 1)
+
+        rows = numpy.arange(count) // 1000
+        cols = numpy.arange(count) % 1000
+        this.assertTrue(numpy.array_equal(
+            this.matrix.getValues(rows, cols), numpy.arange(count) + 1))
+        this.assertEqual(this.matrix.getValue(999, 999), 0)
+
+    def testResize(this):
+        # keys are packed with the dimensions of the matrix
+        this.matrix.setValue(1, 2, 3)
+        this.assertEqual(this.matrix.getValue(1, 2), 3)
+        this.matrix.height = 5000
+        this.matrix.width = 5000
+        this.assertEqual(this.matrix.getValue(1, 2), 3)
+        this.assertEqual(this.matrix.getValue(0, 1002), 0)
+
+
+class testEmptyMatrix(unittest.TestCase):
+    # a matrix with dimensions but no elements, as left by the init command
+
+    def setUp(this):
+        this.matrix = libHercMatrix.hercMatrix()
+        this.matrix.height = 7
+        this.matrix.width = 7
+
+    def testGetRowCol(this):
+        for symmetry in ['ASYM', 'SYM']:
+            this.matrix.symmetry = symmetry
+            for indices, vals in [this.matrix.getRow(3), 
+                                  this.matrix.getCol(3)]:
+                this.assertEqual(len(indices), 0)
+                this.assertEqual(len(vals), 0)
+
+    def testGetValues(this):
+        values = this.matrix.getValues([0, 3, 6], [6, 3, 0])
+        this.assertTrue(numpy.array_equal(values, numpy.zeros(3)))
+        this.assertEqual(this.matrix.getValue(2, 5), 0)
+
+    def testGetBlock(this):
+        block = this.matrix.getBlock(0, 2, 1, 4)
+        this.assertEqual(block.height, 3)
+        this.assertEqual(block.width, 4)
+        this.assertEqual(block.nzentries, 0)
+
+        # reading a block must not initialize the matrix
+        this.assertEqual(this.matrix.height, 7)
+        this.assertEqual(this.matrix.width, 7)
+        this.assertIsNone(this.matrix.elements)
+
+
+## Build a matrix holding the contents of a dense array
+# 
+# @param dense numpy.ndarray
+# @param backend `coo`, `csr`, or `memmap` for `coo` kept out of core
+# @param symmetry `ASYM`, or `SYM` to keep only the lower triangle
+
+def makeMatrix(dense, backend='coo', symmetry='ASYM'):
+    matrix = libHercMatrix.hercMatrix('csr' if backend == 'csr' else 'coo')
+    if backend == 'memmap':
+        matrix.setScratchDirectory('')
+    matrix.height, matrix.width = dense.shape
+    matrix.symmetry = symmetry
+    if symmetry == 'SYM':
+        dense = numpy.tril(dense)
+    matrix.replaceContents(scipy.sparse.coo_matrix(dense))
+    return matrix
+
+
+class testBackends(unittest.TestCase):
+    # the coo, out of core, and csr backends hold the same matrix
+
+    backends = ['coo', 'memmap', 'csr']
+
+    def setUp(this):
+        random = numpy.random.default_rng(0)
+        this.dense = random.random((30, 40))
+        this.dense[this.dense < 0.7] = 0
+        symmetric = random.random((30, 30))
+        symmetric[symmetric < 0.7] = 0
+        this.symmetric = symmetric + symmetric.T
+
+    def assertContents(this, matrix, dense):
+        this.assertEqual((matrix.height, matrix.width), dense.shape)
+        rows, cols = numpy.indices(dense.shape)
+        this.assertTrue(numpy.array_equal(
+            matrix.getValues(rows, cols).reshape(dense.shape), dense))
+
+    def testValues(this):
+        for backend in this.backends:
+            matrix = makeMatrix(this.dense, backend)
+            this.assertContents(matrix, this.dense)
+            this.assertEqual(matrix.getValue(29, 39), this.dense[29, 39])
+
+    def testSlices(this):
+        for backend in this.backends:
+            for dense, symmetry in [(this.dense, 'ASYM'), 
+                                    (this.symmetric, 'SYM')]:
+                matrix = makeMatrix(dense, backend, symmetry)
+                for i in [0, 7, 29]:
+                    indices, vals = matrix.getRow(i)
+                    this.assertEqual(indices.tolist(), 
+                                     numpy.flatnonzero(dense[i]).tolist())
+                    this.assertTrue(numpy.array_equal(
+                        vals, dense[i][indices]))
+                    indices, vals = matrix.getCol(i)
+                    this.assertEqual(indices.tolist(), 
+                                     numpy.flatnonzero(dense[:, i]).tolist())
+
+                block = matrix.getBlock(3, 12, 5, 20)
+                this.assertContents(block, dense[3:13, 5:21])
+
+    def testSetValues(this):
+        # the last write to a coordinate wins, and zero removes the element
+        expected = this.dense.copy()
+        rows = [0, 0, 5, 29, 5]
+        cols = [0, 0, 6, 39, 6]
+        vals = [1.0, 2.0, 3.0, 0.0, 4.0]
+        for row, col, val in zip(rows, cols, vals):
+            expected[row, col] = val
+
+        for backend in this.backends:
+            matrix = makeMatrix(this.dense, backend)
+            matrix.setValues(rows, cols, vals)
+            this.assertContents(matrix, expected)
+            this.assertEqual(matrix.nzentries, numpy.count_nonzero(expected))
+
+    def testMultiply(this):
+        x = numpy.arange(40, dtype=float)
+        X = numpy.arange(80, dtype=float).reshape(40, 2)
+        y = numpy.arange(30, dtype=float)
+        for backend in this.backends:
+            matrix = makeMatrix(this.dense, backend)
+            this.assertTrue(numpy.allclose(matrix.matvec(x), this.dense @ x))
+            this.assertTrue(numpy.allclose(matrix.matmat(X), this.dense @ X))
+
+            # only the lower triangle of a SYM matrix is stored
+            matrix = makeMatrix(this.symmetric, backend, 'SYM')
+            this.assertTrue(matrix.checkUpperTriangle())
+            this.assertTrue(numpy.allclose(matrix.matvec(y), 
+                                           this.symmetric @ y))
+
+    def testTranspose(this):
+        for backend in this.backends:
+            matrix = makeMatrix(this.dense, backend)
+            matrix.transpose(rowMajor=True)
+            this.assertTrue(matrix.isRowMajor)
+            this.assertContents(matrix, this.dense.T)
+
+            # a SYM matrix is its own transpose, and stays lower triangular
+            matrix = makeMatrix(this.symmetric, backend, 'SYM')
+            elements = matrix.elements.copy()
+            matrix.transpose()
+            this.assertTrue(numpy.array_equal(matrix.elements, elements))
+
+    def testRemoveZeros(this):
+        for backend in this.backends:
+            matrix = makeMatrix(this.dense, backend)
+            matrix.addElements([1, 2], [1, 2], [0.0, 0.0])
+            matrix.removeZeros()
+            this.assertEqual(matrix.nzentries, 
+                             numpy.count_nonzero(this.dense))
+            this.assertFalse(numpy.any(matrix.elements['val'] == 0))
+            this.assertContents(matrix, this.dense)
+
+
+class testElements(unittest.TestCase):
+
+    def setUp(this):
+        this.matrix = libHercMatrix.hercMatrix()
+        this.matrix.height = 100
+        this.matrix.width = 100
+
+    def testGrowth(this):
+        # the buffer grows geometrically, so appends rarely reallocate
+        buffers = set()
+        for i in range(1000):
+            this.matrix.addElement([i // 100, i % 100, i + 1])
+            buffers.add(id(this.matrix._buffer))
+        this.assertLessEqual(len(buffers), 8)
+        this.assertLessEqual(len(this.matrix._buffer), 2000)
+        this.assertEqual(this.matrix.nzentries, 1000)
+        this.assertEqual(this.matrix.getValue(9, 99), 1000)
+
+    def testAddElements(this):
+        this.matrix.addElements([2, 0, 1], [0, 1, 1], [3.0, 1.0, 2.0])
+        this.assertEqual(this.matrix.nzentries, 3)
+        this.assertFalse(this.matrix.isRowMajor)
+        this.assertEqual(this.matrix.getValue(2, 0), 3)
+
+        with this.assertRaises(ValueError):
+            this.matrix.addElements([1, 2], [1], [1.0, 2.0])
+        this.assertEqual(this.matrix.nzentries, 3)
+
+    def testSearchRemove(this):
+        this.matrix.addElements([0, 1, 2, 2], [1, 1, 0, 0], 
+                                [3.0, 4.0, 3.0, 3.0])
+        this.assertEqual(list(this.matrix.searchElement([1, 1, 4])), [1])
+        this.assertEqual(list(this.matrix.searchElement([2, 0, 3])), [2, 3])
+
+        # every matching element is removed
+        this.matrix.removeElement([2, 0, 3])
+        this.assertEqual(this.matrix.nzentries, 2)
+        this.assertEqual(this.matrix.getValue(2, 0), 0)
+
+        this.matrix.removeElement(0)
+        this.assertEqual(this.matrix.nzentries, 1)
+        this.assertEqual(this.matrix.getValue(1, 1), 4)
+
+    def testMakeRowMajor(this):
+        random = numpy.random.default_rng(0)
+        order = random.permutation(1000)
+        this.matrix.addElements(order // 100, order % 100, order + 1.0)
+        this.assertFalse(this.matrix.isRowMajor)
+
+        this.matrix.makeRowMajor()
+        this.assertTrue(this.matrix.isRowMajor)
+        elements = this.matrix.elements
+        this.assertEqual((elements['row'] * 100 + elements['col']).tolist(), 
+                         list(range(1000)))
+        this.assertEqual(elements['val'].tolist(), 
+                         list(numpy.arange(1000) + 1.0))
+
+    def testFormatCache(this):
+        # conversions are reused until the matrix is modified
+        this.matrix.addElements([0, 1], [1, 1], [3.0, 4.0])
+        csr = this.matrix.getInFormat('csr')
+        this.assertIs(this.matrix.getInFormat('csr'), csr)
+
+        this.matrix.setValue(0, 1, 5)
+        modified = this.matrix.getInFormat('csr')
+        this.assertIsNot(modified, csr)
+        this.assertEqual(modified[0, 1], 5)
+        this.assertEqual(csr[0, 1], 3)
+
+    def testCoalesce(this):
+        for policy, value in [('sum', 6), ('first', 1), ('last', 3)]:
+            matrix = libHercMatrix.hercMatrix()
+            matrix.height = 3
+            matrix.width = 3
+            matrix.addElements([1, 0, 1, 1], [1, 2, 1, 1], 
+                               [1.0, 5.0, 2.0, 3.0], duplicates=policy)
+            this.assertEqual(matrix.nzentries, 2)
+            this.assertTrue(matrix.isRowMajor)
+            this.assertEqual(matrix.getValue(1, 1), value)
+
+        with this.assertRaises(ValueError):
+            this.matrix.addElements([1, 1], [1, 1], [1.0, 2.0], 
+                                    duplicates='error')
+        this.assertEqual(this.matrix.nzentries, 0)
+        this.assertEqual(len(this.matrix.elements), 0)
+
+    def testTypes(this):
+        matrix = libHercMatrix.hercMatrix(indexType=numpy.int32, 
+                                          valueType=numpy.float32)
+        matrix.height = 10
+        matrix.width = 10
+        matrix.addElements([1], [2], [0.5])
+        this.assertEqual(matrix.elements.dtype['row'], numpy.int32)
+        this.assertEqual(matrix.elements.dtype['val'], numpy.float32)
+
+        with this.assertRaises(ValueError):
+            libHercMatrix.hercMatrix(valueType=numpy.int32)
+        with this.assertRaises(ValueError):
+            libHercMatrix.hercMatrix(indexType=numpy.float64)
+
+
+class testSymmetry(unittest.TestCase):
+
+    def setUp(this):
+        this.dense = numpy.array([[1.0, 2, 0], 
+                                  [4, 0, 5], 
+                                  [0, 0, 6]])
+
+    def testChecks(this):
+        matrix = makeMatrix(this.dense)
+        elements = matrix.elements.copy()
+        this.assertFalse(matrix.checkSymmetry())
+        this.assertFalse(matrix.checkUpperTriangle())
+        this.assertFalse(matrix.checkLowerTriangle())
+        # the checks do not modify the matrix
+        this.assertTrue(numpy.array_equal(matrix.elements, elements))
+
+        symmetric = makeMatrix(this.dense + this.dense.T)
+        this.assertTrue(symmetric.checkSymmetry())
+
+    def testSmart(this):
+        # upper triangle elements are moved down only where the lower 
+        # triangle is zero
+        matrix = makeMatrix(this.dense)
+        matrix.makeSymmetrical('smart')
+        this.assertEqual(matrix.symmetry, 'SYM')
+        this.assertTrue(numpy.array_equal(
+            matrix.getInFormat('coo').toarray(), 
+            numpy.array([[1.0, 0, 0], [4, 0, 0], [0, 5, 6]])))
+
+    def testTruncate(this):
+        matrix = makeMatrix(this.dense)
+        matrix.makeSymmetrical('truncate')
+        this.assertTrue(numpy.array_equal(
+            matrix.getInFormat('coo').toarray(), numpy.tril(this.dense)))
+
+
+class testSharing(unittest.TestCase):
+
+    def setUp(this):
+        this.matrix = makeMatrix(numpy.array([[1.0, 0], [2, 3]]))
+
+    def testPublish(this):
+        descriptor = this.matrix.publish()
+        try:
+            attached = libHercMatrix.attach(descriptor)
+            this.assertTrue(numpy.array_equal(attached.elements, 
+                                              this.matrix.elements))
+
+            # the shared memory is never written
+            attached.setValue(0, 0, 7)
+            this.assertEqual(attached.getValue(0, 0), 7)
+            this.assertEqual(libHercMatrix.attach(descriptor).getValue(0, 0), 
+                             1)
+            del attached
+        finally:
+            this.matrix.unpublish()
+
+    def testPickle(this):
+        for protocol in [4, 5]:
+            copy = pickle.loads(pickle.dumps(this.matrix, protocol=protocol))
+            this.assertTrue(numpy.array_equal(copy.elements, 
+                                              this.matrix.elements))
+            copy.setValue(1, 0, 9)
+            this.assertEqual(this.matrix.getValue(1, 0), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
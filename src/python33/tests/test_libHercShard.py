@@ -0,0 +1,110 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy
+import scipy.sparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import libBXF
+import libCompressedIO
+import libHercMatrix
+import libHercShard
+
+
+class testWriteBXF(unittest.TestCase):
+    # libHercShard.writeBXF() should write the same bytes as libBXF.write()
+
+    def setUp(this):
+        this.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(this):
+        this.directory.cleanup()
+
+    def assertSameFile(this, matrix):
+        serial = os.path.join(this.directory.name, 'serial.bxf')
+        sharded = os.path.join(this.directory.name, 'sharded.bxf')
+        libBXF.write(matrix, serial)
+        libHercShard.writeBXF(matrix, sharded, workers=2)
+
+        with open(serial, 'rb') as serialFile, \
+                open(sharded, 'rb') as shardedFile:
+            this.assertEqual(serialFile.read(), shardedFile.read())
+
+        this.assertEqual(libBXF._readIndex(sharded),
+                         libBXF._readIndex(serial))
+
+    def testMatrix(this):
+        n = 500
+        length = 20000
+        random = numpy.random.default_rng(0)
+        matrix = libHercMatrix.hercMatrix()
+        matrix.height = n
+        matrix.width = n
+        matrix.remarks = ['a remark', 'another']
+        matrix.addElements(random.integers(0, n, length),
+                           random.integers(0, n, length),
+                           random.random(length),
+                           duplicates='sum')
+        this.assertSameFile(matrix)
+
+    def testEmptyMatrix(this):
+        matrix = libHercMatrix.hercMatrix()
+        matrix.height = 4
+        matrix.width = 4
+        this.assertSameFile(matrix)
+
+    def testCompressed(this):
+        matrix = libHercMatrix.hercMatrix()
+        matrix.height = 4
+        matrix.width = 4
+        matrix.addElements([0, 1, 3], [0, 2, 1], [1.5, 2, 3])
+        serial = os.path.join(this.directory.name, 'serial.bxf')
+        sharded = os.path.join(this.directory.name, 'sharded.bxf.gz')
+        libBXF.write(matrix, serial)
+        libHercShard.writeBXF(matrix, sharded, workers=2)
+
+        with open(serial) as serialFile, \
+                libCompressedIO.openFile(sharded) as shardedFile:
+            this.assertEqual(serialFile.read(), shardedFile.read())
+
+
+class testMakeSymmetrical(unittest.TestCase):
+    # the add method folds the upper triangle into the lower triangle, 
+    # leaving the diagonal alone
+
+    def setUp(this):
+        this.dense = numpy.array([[1.0, 2, 0], 
+                                  [4, 0, 5], 
+                                  [0, 3, 6]])
+        # the lower triangle of the symmetric matrix
+        this.expected = numpy.tril(this.dense + this.dense.T - 
+                                   numpy.diag(numpy.diag(this.dense)))
+
+    def makeMatrix(this):
+        matrix = libHercMatrix.hercMatrix()
+        matrix.height = 3
+        matrix.width = 3
+        matrix.replaceContents(scipy.sparse.coo_matrix(this.dense))
+        return matrix
+
+    def assertAdded(this, matrix):
+        this.assertEqual(matrix.symmetry, 'SYM')
+        this.assertTrue(matrix.checkUpperTriangle())
+        this.assertTrue(numpy.array_equal(
+            matrix.getInFormat('coo').toarray(), this.expected))
+
+    def testSerial(this):
+        matrix = this.makeMatrix()
+        matrix.makeSymmetrical('add')
+        this.assertAdded(matrix)
+
+    def testSharded(this):
+        matrix = this.makeMatrix()
+        libHercShard.makeSymmetrical(matrix, 'add', workers=2)
+        this.assertAdded(matrix)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy
+import scipy.sparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import libCompressedIO
+import libHercMatrix
+import libHercmIO
+
+
+class testRoundTrip(unittest.TestCase):
+    # every format reads back what was written, compressed or not
+
+    formats = ['bxf', 'bxfb', 'mat', 'mtx', 'valcol']
+
+    # the first bytes of a file compressed with each compressor
+    magic = {'': None, '.gz': b'\x1f\x8b', '.bz2': b'BZh', 
+             '.xz': b'\xfd7zXZ\x00'}
+
+    def setUp(this):
+        this.directory = tempfile.TemporaryDirectory()
+
+        random = numpy.random.default_rng(0)
+        this.dense = random.random((20, 20))
+        this.dense[this.dense < 0.8] = 0
+        this.matrix = libHercMatrix.hercMatrix()
+        this.matrix.height = 20
+        this.matrix.width = 20
+        this.matrix.replaceContents(scipy.sparse.coo_matrix(this.dense))
+
+    def tearDown(this):
+        this.directory.cleanup()
+
+    def testFormats(this):
+        for form in this.formats:
+            for extension, magic in this.magic.items():
+                with this.subTest(form=form, compression=extension):
+                    filename = os.path.join(this.directory.name, 
+                                            'matrix.' + form + extension)
+                    libHercmIO.writeMatrix(filename, form, this.matrix)
+
+                    if magic is not None:
+                        with open(filename, 'rb') as fileObject:
+                            this.assertEqual(fileObject.read(len(magic)), 
+                                             magic)
+
+                    matrix = libHercmIO.readMatrix(filename, form)
+                    this.assertEqual((matrix.height, matrix.width), 
+                                     (20, 20))
+                    this.assertTrue(numpy.allclose(
+                        matrix.getInFormat('coo').toarray(), this.dense))
+
+    def testCompressionLevel(this):
+        filename = os.path.join(this.directory.name, 'matrix.bxf.gz')
+        with this.assertRaises(ValueError):
+            libHercmIO.writeMatrix(filename, 'bxf', this.matrix, 10)
+
+        libHercmIO.writeMatrix(filename, 'bxf', this.matrix, 1)
+        this.assertEqual(libCompressedIO.compression(filename), '.gz')
+        this.assertEqual(libCompressedIO.stripCompression(filename), 
+                         os.path.join(this.directory.name, 'matrix.bxf'))
+
+
+if __name__ == '__main__':
+    unittest.main()